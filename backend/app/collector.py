@@ -0,0 +1,164 @@
+"""
+Standalone collector process.
+
+Collects each server just after Prometheus scrapes it (see ``ScrapeScheduler``)
+and publishes each snapshot on ``settings.collector_socket``. Run one of these next to any number of uvicorn
+workers started with ``COLLECTOR_MODE=external``:
+
+    python -m app.collector
+    COLLECTOR_MODE=external uvicorn app.main:app --workers 4
+
+With ``--aggregator`` it runs as one shard of a collector cluster instead: it
+collects only the servers the consistent hash ring assigns to it and pushes
+them to a backend started with ``COLLECTOR_MODE=aggregator``:
+
+    COLLECTOR_MODE=aggregator uvicorn app.main:app
+    python -m app.collector --aggregator http://backend:8000 --node-id collector-1
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+from datetime import datetime
+from typing import List, Optional
+
+import httpx
+
+from .config import settings
+from .models.server_metrics import PartialSnapshot
+from .services.metrics_collector import metrics_collector, SERVER_TYPES
+from .services.offload import offload_pool
+from .services.prometheus_client import prometheus_client
+from .services.sharding import HashRing
+from .services.snapshot_bus import SnapshotPublisher
+from .services.snapshot_cache import SnapshotCache
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger("app.collector")
+
+def _install_stop_handlers() -> asyncio.Event:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    return stop
+
+async def _wait(stop: asyncio.Event, delay: float):
+    try:
+        await asyncio.wait_for(stop.wait(), timeout=delay)
+    except asyncio.TimeoutError:
+        pass
+
+async def run_collector():
+    """Collect and publish snapshots until interrupted"""
+    publisher = SnapshotPublisher(settings.collector_socket)
+    cache = SnapshotCache(settings.snapshot_cache_file)
+    await publisher.start()
+
+    stop = _install_stop_handlers()
+    sections = {}
+
+    try:
+        while not stop.is_set():
+            try:
+                overview = await metrics_collector.collect_changed(sections)
+                if overview is not None:
+                    version = publisher.publish(overview)
+                    # Skipped under load rather than queued; the next snapshot is saved instead
+                    if not offload_pool.full:
+                        await offload_pool.run(cache.save, overview, version)
+                    logger.debug(f"Published snapshot {version}")
+                delay = metrics_collector.next_collection_delay()
+            except Exception as e:
+                logger.error(f"Error in metrics collection: {e}")
+                # Wait before retrying
+                delay = 10
+            await _wait(stop, delay)
+    finally:
+        await publisher.stop()
+        await metrics_collector.close()
+        await prometheus_client.close()
+        logger.info("Collector stopped")
+
+async def _collect_partial(node_id: str, server_types: List[str]) -> PartialSnapshot:
+    results = await asyncio.gather(
+        *(metrics_collector.collect_server_metrics(server_type) for server_type in server_types),
+        return_exceptions=True
+    )
+    sections = {}
+    for server_type, result in zip(server_types, results):
+        if isinstance(result, Exception):
+            logger.error(f"Error collecting {server_type} metrics: {result}")
+            result = metrics_collector.placeholder_metrics(server_type)
+        sections[server_type] = result
+    return PartialSnapshot(node_id=node_id, collected_at=datetime.now(), **sections)
+
+async def run_shard_collector(aggregator_url: str, node_id: str):
+    """Collect this node's share of the servers and push it to the aggregator until interrupted"""
+    stop = _install_stop_handlers()
+    partials_url = f"{aggregator_url.rstrip('/')}/api/cluster/partials"
+    members: List[str] = []
+    owned: List[str] = []
+
+    logger.info(f"Shard collector {node_id} pushing to {aggregator_url}")
+    async with httpx.AsyncClient(timeout=settings.scrape_timeout) as client:
+        try:
+            while not stop.is_set():
+                delay = settings.metrics_update_interval
+                try:
+                    # The first push carries no sections and only joins the ring
+                    if members:
+                        partial = await _collect_partial(node_id, owned)
+                    else:
+                        partial = PartialSnapshot(node_id=node_id, collected_at=datetime.now())
+                    response = await client.post(
+                        partials_url,
+                        content=partial.model_dump_json(),
+                        headers={"Content-Type": "application/json"}
+                    )
+                    response.raise_for_status()
+
+                    current = response.json()["members"]
+                    if current != members:
+                        members = current
+                        owned = HashRing(members).assignments(SERVER_TYPES).get(node_id, [])
+                        logger.info(f"Cluster members: {members}. Collecting: {owned}")
+                        # Pick up newly assigned servers without waiting a full interval
+                        delay = 0
+                except Exception as e:
+                    logger.error(f"Error pushing to aggregator: {e}")
+                    members = []
+                    # Wait before retrying
+                    delay = 10
+                await _wait(stop, delay)
+        finally:
+            try:
+                await client.delete(f"{aggregator_url.rstrip('/')}/api/cluster/members/{node_id}")
+            except httpx.HTTPError as e:
+                logger.warning(f"Failed to leave the cluster: {e}")
+            await metrics_collector.close()
+            await prometheus_client.close()
+            logger.info("Shard collector stopped")
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Standalone metrics collector")
+    parser.add_argument("--aggregator", default=settings.aggregator_url,
+                        help="Run as a shard collector pushing to this backend URL")
+    parser.add_argument("--node-id", default=settings.shard_node_id,
+                        help="Shard collector name (default: hostname-pid)")
+    args = parser.parse_args(argv)
+
+    if args.aggregator:
+        node_id = args.node_id or f"{socket.gethostname()}-{os.getpid()}"
+        asyncio.run(run_shard_collector(args.aggregator, node_id))
+    else:
+        asyncio.run(run_collector())
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List
 
 class Settings(BaseSettings):
     # Server Configuration
@@ -29,7 +29,14 @@ class Settings(BaseSettings):
     proxmox_ip: str = "60.51.17.102"
     
     # Prometheus Configuration
+    # One URL, or comma-separated URLs of replicas scraping the same targets
     prometheus_url: str = "http://localhost:9090"
+    # Seconds a replica that failed is skipped
+    prometheus_replica_cooldown: float = 30.0
+    # Share of requests that may be hedged to a second replica
+    prometheus_hedge_budget: float = 0.1
+    # Shortest wait in seconds before a request is hedged
+    prometheus_hedge_min_delay: float = 0.02
     
     # Node Exporter Ports
     node_exporter_port: int = 9100
@@ -40,11 +47,119 @@ class Settings(BaseSettings):
     
     # WebSocket Configuration
     websocket_heartbeat_interval: int = 30
+    # Seconds without any message from a client before its connection is closed (0: never)
+    websocket_dead_after: int = 90
     metrics_update_interval: int = 5
     
+    # Server-Sent Events Configuration
+    # Snapshots kept for Last-Event-ID resume on /api/stream
+    sse_history_size: int = 60
+    
+    # Long-poll Configuration
+    # Snapshot versions remembered for /api/servers/overview?since=
+    long_poll_history_size: int = 120
+    # Longest ?wait= accepted, below nginx's default 60s proxy_read_timeout
+    long_poll_max_wait: int = 50
+    
+    # Collector Configuration
+    # embedded: every worker collects its own metrics
+    # external: snapshots come from the standalone collector process (python -m app.collector)
+    # aggregator: shard collectors push partial snapshots to /api/cluster/partials
+    collector_mode: str = "embedded"
+    collector_socket: str = "/tmp/monitoring-collector.sock"
+    
+    # Sharded Collection Configuration
+    aggregator_url: str = ""
+    shard_node_id: str = ""
+    shard_member_ttl: int = 15
+    
     # Monitoring Configuration
     scrape_timeout: int = 10
     max_retries: int = 3
+    # Collect each server just after Prometheus scrapes it instead of every
+    # metrics_update_interval (which remains the fallback for unknown targets)
+    scrape_aligned_collection: bool = True
+    # Seconds to wait after a scrape before querying its samples
+    scrape_align_delay: float = 0.5
+    # Seconds between re-syncs of scrape schedules from /api/v1/targets
+    scrape_targets_refresh: int = 60
+    # Read precomputed recording rule series (python -m app.recording_rules)
+    # when Prometheus has them, checking every recording_rules_refresh seconds
+    use_recording_rules: bool = True
+    recording_rules_refresh: int = 300
+    # Seconds to reuse static query results (core count, memory and disk
+    # sizes, GPU model and memory) instead of querying them every cycle
+    static_query_ttl: int = 600
+    # Pooled HTTP clients for Prometheus, exporters and Qdrant
+    http_max_connections: int = 50
+    http_max_keepalive_connections: int = 20
+    
+    # Prometheus Admission Control
+    # Requests to Prometheus in flight at once, across all priority classes
+    prometheus_max_concurrency: int = 8
+    # Seconds a request may wait for a slot, per priority class
+    prometheus_queue_timeouts: Dict[str, float] = {"live": 10, "interactive": 5, "history": 30, "export": 60}
+    # Slots a class may hold at once, so bulk queries leave room for the live tick
+    prometheus_class_limits: Dict[str, int] = {"history": 4, "export": 2}
+    
+    # Event Loop Monitoring
+    # Seconds between event loop lag probes (0: off)
+    loop_lag_interval: float = 0.1
+    # Lag in seconds past which the loop counts as stalled and the blocking stack is logged
+    loop_stall_threshold: float = 0.25
+    
+    # CPU Offload Configuration
+    # Worker threads for snapshot encoding and export formatting (0: run on the event loop)
+    offload_workers: int = 2
+    # Jobs that may wait for a worker before further ones are refused
+    offload_queue_size: int = 32
+    # Seconds a request waits for a free slot before it is answered with 503
+    offload_wait: float = 5.0
+    
+    # Debug Endpoints
+    # Serve /api/debug/memory (tracemalloc control, allocation sites, object counts)
+    debug_endpoints: bool = False
+    # Stack frames tracemalloc keeps per allocation unless ?frames= says otherwise
+    tracemalloc_frames: int = 10
+    
+    # Snapshot Cache Configuration
+    # Last snapshot, served marked stale after a restart until a fresh one is collected
+    snapshot_cache_file: str = "/tmp/monitoring-snapshot.json"
+    
+    # Remote Write Configuration
+    # Seconds without pushed samples before a target is polled through PromQL again
+    remote_write_staleness: int = 30
+    remote_write_buffer_size: int = 64
+    # Largest request body accepted, compressed and after snappy decompression
+    remote_write_max_bytes: int = 16 * 1024 * 1024
+    # Minimum seconds between collections triggered by pushes
+    remote_write_min_refresh: float = 1.0
+    
+    # Alerting Configuration
+    alert_rules_file: str = "alert_rules.yml"
+    
+    # Anomaly Detection Configuration
+    anomaly_detection: bool = True
+    # Weight of each new sample in the per-series EWMA baseline
+    anomaly_alpha: float = 0.1
+    # Absolute z-score at which a sample is anomalous
+    anomaly_threshold: float = 5.0
+    # Samples a series needs before it can be flagged
+    anomaly_warmup: int = 20
+    # Snapshots a series may be missing from before its baseline is dropped
+    anomaly_series_expiry: int = 720
+    
+    # Capacity Forecasting Configuration
+    # Seconds of disk usage history the growth trend is fitted over (30 days)
+    capacity_window: int = 2592000
+    # Seconds between the points kept per mount
+    capacity_step: int = 3600
+    
+    # Export Configuration
+    # Steps per range query of /api/export
+    export_chunk_points: int = 1000
+    # Rows per Parquet row group
+    export_row_group_rows: int = 65536
     
     class Config:
         env_file = ".env"
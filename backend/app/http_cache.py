@@ -0,0 +1,47 @@
+from typing import Optional
+
+from fastapi import HTTPException, Request, Response
+from .services.snapshot_store import snapshot_store
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison, as If-None-Match requires; nginx weakens ETags of gzipped responses"""
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        tag.strip().removeprefix("W/") == etag
+        for tag in if_none_match.split(",")
+    )
+
+def cache_headers(etag: Optional[str] = None) -> dict:
+    """ETag and Cache-Control of the latest snapshot, or no headers before the first one.
+
+    ``etag`` names the snapshot a response was actually built from; when that
+    is no longer the latest one the response must not be cached.
+    """
+    latest = snapshot_store.etag()
+    if latest is None:
+        return {}
+    etag = etag or latest
+    max_age = int(snapshot_store.expires_in()) if etag == latest else 0
+    return {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={max_age}" if max_age > 0 else "no-cache"
+    }
+
+async def snapshot_cache(request: Request, response: Response):
+    """Route dependency for responses built only from the latest snapshot.
+
+    Sets ``ETag`` from the snapshot version and ``Cache-Control`` from the time
+    until the next snapshot is expected, and answers ``304 Not Modified`` when
+    the client's ``If-None-Match`` already names the current snapshot. Batch
+    sub-requests, which read a pinned snapshot, are left alone.
+    """
+    if snapshot_store.pinned:
+        return
+    headers = cache_headers()
+    if not headers:
+        return
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _matches(if_none_match, headers["ETag"]):
+        raise HTTPException(status_code=304, headers=headers)
+    response.headers.update(headers)
@@ -1,14 +1,27 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
+from typing import Optional
 import logging
+import time
 import uvicorn
 from datetime import datetime
 
 from .config import settings
-from .routers import ai_server, app_server, storage_server, websocket
+from .routers import ai_server, app_server, storage_server, websocket, stream, alerts, remote_write, cluster, fleet, batch, anomalies, export, debug
+from .services.snapshot_store import snapshot_store
+from .services.prometheus_client import prometheus_client
 from .services.metrics_collector import metrics_collector
+from .services.websocket_manager import websocket_manager
+from .services.event_stream import event_stream
+from .services.loop_monitor import loop_monitor
+from .services.offload import OffloadBusy, offload_pool
+from .services import exporter
 from .models.server_metrics import SystemOverview
+from .http_cache import cache_headers, snapshot_cache
+from .services.snapshot_history import SECTIONS
 
 # Configure logging
 logging.basicConfig(
@@ -17,13 +30,35 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+started_at = time.time()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open pooled clients and start the snapshot feed; tear both down on shutdown"""
+    loop_monitor.start()
+    if exporter.pq is None:
+        logger.warning("pyarrow is not installed; /api/export?format=parquet will answer 400")
+    prometheus_client.open()
+    metrics_collector.open()
+    # Serves the cached snapshot at once; the first collection runs in the background
+    await snapshot_store.start()
+    yield
+    await websocket_manager.shutdown()
+    await event_stream.shutdown()
+    await snapshot_store.stop()
+    await metrics_collector.close()
+    await prometheus_client.close()
+    offload_pool.shutdown()
+    await loop_monitor.stop()
+
 # Create FastAPI app
 app = FastAPI(
     title=settings.app_name,
     description="Unified Infrastructure Monitoring Dashboard API",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -40,6 +75,15 @@ app.include_router(ai_server.router)
 app.include_router(app_server.router)
 app.include_router(storage_server.router)
 app.include_router(websocket.router)
+app.include_router(stream.router)
+app.include_router(alerts.router)
+app.include_router(remote_write.router)
+app.include_router(cluster.router)
+app.include_router(fleet.router)
+app.include_router(batch.router)
+app.include_router(anomalies.router)
+app.include_router(export.router)
+app.include_router(debug.router)
 
 @app.get("/")
 async def root():
@@ -54,7 +98,11 @@ async def root():
             "storage_server": "/api/storage-server",
             "overview": "/api/servers/overview",
             "websocket": "/ws/metrics",
+            "stream": "/api/stream",
+            "alerts": "/api/alerts",
             "health": "/api/health",
+            "liveness": "/api/health/live",
+            "readiness": "/api/health/ready",
             "docs": "/docs"
         }
     }
@@ -64,7 +112,6 @@ async def health_check():
     """Health check endpoint"""
     try:
         # Test Prometheus connectivity
-        from .services.prometheus_client import prometheus_client
         test_query = await prometheus_client.query("up")
         prometheus_status = "healthy" if test_query else "unhealthy"
         
@@ -76,6 +123,11 @@ async def health_check():
                 "prometheus": prometheus_status,
                 "websocket": "healthy"
             },
+            "prometheus_queue": prometheus_client.scheduler.stats(),
+            "prometheus_replicas": prometheus_client.replicas.stats(),
+            "websockets": websocket_manager.heartbeats.stats(),
+            "event_loop": loop_monitor.stats(),
+            "offload": offload_pool.stats(),
             "version": "1.0.0"
         }
     except Exception as e:
@@ -89,21 +141,99 @@ async def health_check():
             }
         )
 
+@app.get("/api/health/live")
+async def liveness_check():
+    """Liveness probe: the process is up and its event loop responds"""
+    return {
+        "status": "alive",
+        "timestamp": datetime.now().isoformat(),
+        "uptime_seconds": round(time.time() - started_at, 1)
+    }
+
+@app.get("/api/health/ready")
+async def readiness_check():
+    """Readiness probe: a snapshot, fresh or cached, can be served"""
+    overview = snapshot_store.overview
+    if overview is None:
+        return JSONResponse(
+            status_code=503,
+            content={
+                "status": "not_ready",
+                "timestamp": datetime.now().isoformat(),
+                "reason": snapshot_store.last_error or "No snapshot collected yet",
+                "collector_mode": settings.collector_mode
+            }
+        )
+    return {
+        "status": "ready",
+        "timestamp": datetime.now().isoformat(),
+        "stale": overview.stale,
+        "snapshot_version": snapshot_store.version,
+        "snapshot_age_seconds": round(time.time() - snapshot_store.updated_at, 1),
+        "last_error": snapshot_store.last_error,
+        "collector_mode": settings.collector_mode
+    }
+
 @app.get("/api/servers/overview", response_model=SystemOverview)
-async def get_servers_overview():
-    """Get overview of all servers"""
+async def get_servers_overview(
+    request: Request,
+    response: Response,
+    since: Optional[int] = Query(None, description="snapshot version the client has; returns only sections changed after it"),
+    wait: int = Query(0, ge=0, le=settings.long_poll_max_wait, description="seconds to wait for a newer snapshot (with since)")
+):
+    """Get overview of all servers, or the sections changed since a snapshot version"""
+    if since is None:
+        await snapshot_cache(request, response)
+        try:
+            if snapshot_store.pinned:
+                return await snapshot_store.get_overview()
+            # Encoded once per snapshot instead of by every request on the event loop
+            etag, body = await snapshot_store.overview_json()
+            return Response(content=body, media_type="application/json", headers=cache_headers(etag))
+        except OffloadBusy as e:
+            raise HTTPException(status_code=503, detail=f"Servers overview is busy: {str(e)}", headers={"Retry-After": "5"})
+        except Exception as e:
+            logger.error(f"Failed to collect servers overview: {e}")
+            raise HTTPException(status_code=500, detail=f"Failed to collect servers overview: {str(e)}")
+    
+    if snapshot_store.pinned:
+        # Inside a batch: waiting would hold up every other path, and the
+        # change history belongs to the latest snapshot, not the pinned one
+        raise HTTPException(status_code=400, detail="since and wait cannot be used inside a batch")
+    
     try:
-        overview = await metrics_collector.collect_all_metrics()
-        return overview
+        await snapshot_store.wait_for_version(since, wait)
+        overview = await snapshot_store.get_overview()
+        version = snapshot_store.version
     except Exception as e:
-        logger.error(f"Failed to collect servers overview: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to collect servers overview: {str(e)}")
+        logger.error(f"Failed to collect servers overview changes: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to collect servers overview changes: {str(e)}")
+    
+    changed = snapshot_store.history.changed_since(since)
+    # An unknown version (too old, or from a restarted collector) gets every section
+    full = changed is None
+    if full:
+        changed = set(SECTIONS)
+    content = {
+        "version": version,
+        "since": since,
+        "full": full,
+        "changed": [section for section in SECTIONS if section in changed],
+        "last_updated": overview.last_updated,
+        "total_servers": overview.total_servers,
+        "online_servers": overview.online_servers,
+        "alerts_count": overview.alerts_count,
+        "stale": overview.stale
+    }
+    for section in SECTIONS:
+        content[section] = getattr(overview, section) if section in changed else None
+    return JSONResponse(content=jsonable_encoder(content))
 
-@app.get("/api/servers/summary")
+@app.get("/api/servers/summary", dependencies=[Depends(snapshot_cache)])
 async def get_servers_summary():
     """Get a simplified summary of all servers"""
     try:
-        overview = await metrics_collector.collect_all_metrics()
+        overview = await snapshot_store.get_overview()
         
         return {
             "summary": {
@@ -146,7 +276,7 @@ async def get_servers_summary():
 async def get_prometheus_metrics():
     """Grafana-compatible Prometheus metrics endpoint"""
     try:
-        overview = await metrics_collector.collect_all_metrics()
+        overview = await snapshot_store.get_overview()
         
         # Convert to Prometheus-style metrics format
         metrics = []
@@ -166,6 +296,7 @@ async def get_prometheus_metrics():
                     f'ai_server_gpu_memory_usage_percent {overview.ai_server.gpu.memory_usage_percent}',
                     f'ai_server_gpu_temperature_celsius {overview.ai_server.gpu.temperature}',
                     f'ai_server_gpu_power_draw_watts {overview.ai_server.gpu.power_draw_w}',
+                    f'ai_server_gpu_count {len(overview.ai_server.gpus)}',
                 ])
         
         # App Server metrics
@@ -199,6 +330,55 @@ async def get_prometheus_metrics():
             f'system_alerts_count {overview.alerts_count}',
         ])
         
+        # WebSocket liveness
+        liveness = websocket_manager.heartbeats.stats()
+        metrics.extend([
+            f'websocket_connections {liveness["connections"]}',
+            f'websocket_silent_connections {liveness["silent"]}',
+            f'websocket_heartbeats_sent_total {liveness["heartbeats_sent"]}',
+            f'websocket_reaped_total {liveness["reaped"]}',
+        ])
+        
+        # Event loop and offload pool
+        loop = loop_monitor.stats()
+        if loop["lag_ms"]:
+            metrics.extend([
+                f'event_loop_lag_seconds{{quantile="0.5"}} {loop["lag_ms"]["p50"] / 1000}',
+                f'event_loop_lag_seconds{{quantile="0.99"}} {loop["lag_ms"]["p99"] / 1000}',
+            ])
+        offload = offload_pool.stats()
+        metrics.extend([
+            f'event_loop_max_lag_seconds {loop["max_lag_ms"] / 1000}',
+            f'event_loop_stalls_total {loop["stalls"]}',
+            f'offload_running {offload["running"]}',
+            f'offload_queue_depth {offload["queued"]}',
+            f'offload_completed_total {offload["completed"]}',
+            f'offload_waiting {offload["waiting"]}',
+            f'offload_waited_total {offload["waited"]}',
+            f'offload_rejected_total {offload["rejected"]}',
+        ])
+        
+        # Prometheus replicas
+        replicas = prometheus_client.replicas.stats()
+        metrics.append(f'prometheus_hedged_requests_total {replicas["hedged"]}')
+        for replica in replicas["replicas"]:
+            metrics.extend([
+                f'prometheus_replica_up{{url="{replica["url"]}"}} {int(replica["healthy"])}',
+                f'prometheus_replica_failures_total{{url="{replica["url"]}"}} {replica["failures"]}',
+            ])
+        
+        # Prometheus admission control
+        queue = prometheus_client.scheduler.stats()
+        metrics.append(f'prometheus_query_in_flight {queue["in_flight"]}')
+        for priority, stats in queue["classes"].items():
+            metrics.extend([
+                f'prometheus_query_queue_depth{{priority="{priority}"}} {stats["queued"]}',
+                f'prometheus_query_admitted_total{{priority="{priority}"}} {stats["admitted"]}',
+                f'prometheus_query_rejected_total{{priority="{priority}"}} {stats["rejected"]}',
+            ])
+            if stats["wait_ms"]:
+                metrics.append(f'prometheus_query_wait_seconds{{priority="{priority}",quantile="0.95"}} {stats["wait_ms"]["p95"] / 1000}')
+        
         return JSONResponse(
             content={"metrics": metrics, "timestamp": overview.last_updated.isoformat()},
             headers={"Content-Type": "application/json"}
@@ -227,5 +407,10 @@ if __name__ == "__main__":
         host=settings.host,
         port=settings.port,
         reload=settings.debug,
-        log_level="info"
+        log_level="info",
+        # SSE streams never finish on their own, so do not wait for them forever
+        timeout_graceful_shutdown=5,
+        # Protocol pings close dead WebSocket peers, including push-only clients
+        ws_ping_interval=20,
+        ws_ping_timeout=20
     )
\ No newline at end of file
@@ -14,5 +14,9 @@ __all__ = [
     "AppServerMetrics",
     "StorageServerMetrics",
     "SystemOverview",
-    "MetricsUpdate"
+    "MetricsUpdate",
+    "PartialSnapshot",
+    "AlertRule",
+    "Alert",
+    "Anomaly"
 ]
\ No newline at end of file
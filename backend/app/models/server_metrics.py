@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+from typing import List, Optional, Dict, Any, Union
 from datetime import datetime
 
 class CPUMetrics(BaseModel):
@@ -7,6 +7,8 @@ class CPUMetrics(BaseModel):
     cores: int
     temperature: Optional[float] = None
     load_average: Optional[List[float]] = None
+    modes: Optional[Dict[str, float]] = None  # percent of CPU time per mode (user, system, iowait, steal, ...)
+    core_usage: Optional[List[float]] = None  # usage percent per core, by core number
 
 class MemoryMetrics(BaseModel):
     used_gb: float
@@ -15,6 +17,11 @@ class MemoryMetrics(BaseModel):
     available_gb: float
     cached_gb: Optional[float] = None
 
+class GPUProcess(BaseModel):
+    pid: int
+    name: str
+    memory_used_mb: float
+
 class GPUMetrics(BaseModel):
     name: str
     usage_percent: float
@@ -24,6 +31,9 @@ class GPUMetrics(BaseModel):
     temperature: float
     power_draw_w: float
     fan_speed_percent: Optional[float] = None
+    index: Optional[int] = None
+    uuid: Optional[str] = None
+    processes: List[GPUProcess] = []
 
 class DiskMetrics(BaseModel):
     mount_point: str
@@ -32,6 +42,8 @@ class DiskMetrics(BaseModel):
     usage_percent: float
     available_gb: float
     filesystem: Optional[str] = None
+    growth_gb_per_day: Optional[float] = None  # trend of used space over the capacity window
+    days_to_full: Optional[float] = None  # None while usage is flat, shrinking or not yet fitted
 
 class NetworkMetrics(BaseModel):
     interface: str
@@ -62,6 +74,8 @@ class FileSystemStats(BaseModel):
     file_count: int
     avg_file_size_mb: float
     largest_file_mb: Optional[float] = None
+    growth_gb_per_day: Optional[float] = None
+    days_to_full: Optional[float] = None
 
 class QdrantMetrics(BaseModel):
     status: str
@@ -81,7 +95,8 @@ class AIServerMetrics(BaseModel):
     server_status: ServerStatus
     cpu: CPUMetrics
     memory: MemoryMetrics
-    gpu: Optional[GPUMetrics] = None
+    gpu: Optional[GPUMetrics] = None  # totals across all GPUs
+    gpus: List[GPUMetrics] = []
     disks: List[DiskMetrics]
     network: List[NetworkMetrics]
 
@@ -111,9 +126,73 @@ class SystemOverview(BaseModel):
     total_servers: int
     online_servers: int
     alerts_count: int
+    # Loaded from the snapshot cache after a restart, not collected by this run
+    stale: bool = False
 
 class MetricsUpdate(BaseModel):
     timestamp: datetime
     server_type: str  # ai, app, storage, overview
     data: Dict[str, Any]
-    event_type: str = "metrics_update"
\ No newline at end of file
+    event_type: str = "metrics_update"
+
+class PartialSnapshot(BaseModel):
+    """Sections collected by one shard collector node"""
+    node_id: str
+    collected_at: datetime
+    ai_server: Optional[AIServerMetrics] = None
+    app_server: Optional[AppServerMetrics] = None
+    storage_server: Optional[StorageServerMetrics] = None
+
+def parse_duration(value: Union[str, int, float]) -> float:
+    """Seconds from a Prometheus-style duration such as ``30s``, ``5m`` or ``1h``"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    units = {"ms": 0.001, "s": 1, "m": 60, "h": 3600, "d": 86400}
+    for suffix in sorted(units, key=len, reverse=True):
+        if value.endswith(suffix):
+            return float(value[:-len(suffix)]) * units[suffix]
+    return float(value)
+
+class AlertRule(BaseModel):
+    """Alert rule evaluated in-process on every new snapshot"""
+    model_config = ConfigDict(populate_by_name=True)
+
+    name: str
+    field: str  # path into SystemOverview, e.g. "*.disks[*].usage_percent"
+    kind: str = "threshold"  # threshold, rate (change per second over window)
+    op: str = ">"
+    threshold: Union[float, str]
+    clear: Optional[float] = None  # hysteresis: stays firing until the value crosses this
+    for_seconds: float = Field(0, alias="for")
+    window_seconds: float = Field(300.0, alias="window")
+    severity: str = "warning"
+    description: Optional[str] = None
+
+    @field_validator("for_seconds", "window_seconds", mode="before")
+    @classmethod
+    def _duration(cls, value):
+        return parse_duration(value)
+
+class Alert(BaseModel):
+    rule: str
+    instance: str
+    server_type: Optional[str] = None
+    severity: str
+    state: str  # pending, firing, resolved
+    value: Optional[Union[float, str]] = None
+    threshold: Union[float, str]
+    description: Optional[str] = None
+    active_since: datetime
+    firing_since: Optional[datetime] = None
+    resolved_at: Optional[datetime] = None
+
+class Anomaly(BaseModel):
+    metric: str
+    instance: str
+    server_type: Optional[str] = None
+    state: str  # anomalous, normal
+    value: float
+    baseline: float  # EWMA mean before this sample
+    deviation: float  # EWMA standard deviation before this sample
+    zscore: float
+    timestamp: datetime
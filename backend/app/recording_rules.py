@@ -0,0 +1,64 @@
+"""
+Recording rules generator.
+
+Writes a Prometheus rule file that precomputes the collector's hot query
+templates (``app/services/query_templates.py``) for every target. Once
+Prometheus has loaded it, the backend finds the recorded series and reads them
+instead of evaluating the raw expressions on every collection:
+
+    python -m app.recording_rules
+    python -m app.recording_rules --output /etc/prometheus/rules/dashboard.rules.yml --interval 30s
+    python -m app.recording_rules --check   # exit 1 if the file is out of date
+"""
+
+import argparse
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+import yaml
+
+from .services.query_templates import recorded_templates
+
+DEFAULT_OUTPUT = Path(__file__).resolve().parents[2] / "monitoring" / "prometheus" / "rules" / "dashboard.rules.yml"
+HEADER = (
+    "# Generated by `python -m app.recording_rules` from backend/app/services/query_templates.py.\n"
+    "# Do not edit by hand: change the templates and run the generator again.\n"
+)
+
+def render(interval: str = "15s") -> str:
+    """Rule file contents for all templates with a record name"""
+    document = {
+        "groups": [{
+            "name": "dashboard.rules",
+            "interval": interval,
+            "rules": [
+                {"record": template.record, "expr": template.rule_expr()}
+                for template in recorded_templates()
+            ]
+        }]
+    }
+    return HEADER + yaml.safe_dump(document, sort_keys=False, width=200)
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Generate Prometheus recording rules for the dashboard queries")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT, help="rule file to write")
+    parser.add_argument("--interval", default="15s", help="rule group evaluation interval")
+    parser.add_argument("--check", action="store_true",
+                        help="only verify that the rule file is up to date")
+    args = parser.parse_args(argv)
+
+    contents = render(args.interval)
+    if args.check:
+        current = args.output.read_text() if args.output.exists() else None
+        if current != contents:
+            print(f"{args.output} is out of date; run python -m app.recording_rules", file=sys.stderr)
+            return 1
+        return 0
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(contents)
+    print(f"Wrote {len(recorded_templates())} recording rules to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,16 @@
-from . import ai_server, app_server, storage_server, websocket
+from . import ai_server, app_server, storage_server, websocket, stream, alerts, remote_write, cluster, fleet, batch, anomalies, export
 
 __all__ = [
     "ai_server",
     "app_server", 
     "storage_server",
-    "websocket"
+    "websocket",
+    "stream",
+    "alerts",
+    "remote_write",
+    "cluster",
+    "fleet",
+    "batch",
+    "anomalies",
+    "export"
 ]
\ No newline at end of file
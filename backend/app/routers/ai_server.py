@@ -1,17 +1,19 @@
-from fastapi import APIRouter, HTTPException
-from ..services.metrics_collector import metrics_collector
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional
+from ..services.snapshot_store import snapshot_store
 from ..models.server_metrics import AIServerMetrics
+from ..http_cache import snapshot_cache
 import logging
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/api/ai-server", tags=["AI Server"])
+router = APIRouter(prefix="/api/ai-server", tags=["AI Server"], dependencies=[Depends(snapshot_cache)])
 
 @router.get("/", response_model=AIServerMetrics)
 async def get_ai_server_metrics():
     """Get current AI server metrics including GPU, CPU, memory, and disk usage"""
     try:
-        metrics = await metrics_collector.collect_ai_server_metrics()
+        metrics = await snapshot_store.get_ai_server_metrics()
         return metrics
     except Exception as e:
         logger.error(f"Failed to collect AI server metrics: {e}")
@@ -19,17 +21,21 @@ async def get_ai_server_metrics():
 
 @router.get("/gpu")
 async def get_gpu_metrics():
-    """Get detailed GPU metrics from AI server"""
+    """Get detailed GPU metrics from AI server, per GPU and totalled"""
     try:
-        metrics = await metrics_collector.collect_ai_server_metrics()
+        metrics = await snapshot_store.get_ai_server_metrics()
         if metrics.gpu:
             return {
                 "gpu": metrics.gpu.dict(),
+                "gpus": [gpu.dict() for gpu in metrics.gpus],
+                "gpu_count": len(metrics.gpus),
                 "server_status": metrics.server_status.dict()
             }
         else:
             return {
                 "gpu": None,
+                "gpus": [],
+                "gpu_count": 0,
                 "message": "No GPU metrics available",
                 "server_status": metrics.server_status.dict()
             }
@@ -38,12 +44,14 @@ async def get_gpu_metrics():
         raise HTTPException(status_code=500, detail=f"Failed to collect GPU metrics: {str(e)}")
 
 @router.get("/cpu")
-async def get_cpu_metrics():
+async def get_cpu_metrics(detail: Optional[str] = Query(None, description="cores to include per-core usage")):
     """Get detailed CPU metrics from AI server"""
+    if detail not in (None, "cores"):
+        raise HTTPException(status_code=400, detail="detail must be 'cores'")
     try:
-        metrics = await metrics_collector.collect_ai_server_metrics()
+        metrics = await snapshot_store.get_ai_server_metrics()
         return {
-            "cpu": metrics.cpu.dict(),
+            "cpu": metrics.cpu.dict(exclude=None if detail == "cores" else {"core_usage"}),
             "server_status": metrics.server_status.dict()
         }
     except Exception as e:
@@ -54,7 +62,7 @@ async def get_cpu_metrics():
 async def get_memory_metrics():
     """Get detailed memory metrics from AI server"""
     try:
-        metrics = await metrics_collector.collect_ai_server_metrics()
+        metrics = await snapshot_store.get_ai_server_metrics()
         return {
             "memory": metrics.memory.dict(),
             "server_status": metrics.server_status.dict()
@@ -67,7 +75,7 @@ async def get_memory_metrics():
 async def get_storage_metrics():
     """Get storage/disk metrics from AI server"""
     try:
-        metrics = await metrics_collector.collect_ai_server_metrics()
+        metrics = await snapshot_store.get_ai_server_metrics()
         return {
             "disks": [disk.dict() for disk in metrics.disks],
             "server_status": metrics.server_status.dict()
@@ -80,7 +88,7 @@ async def get_storage_metrics():
 async def get_network_metrics():
     """Get network interface metrics from AI server"""
     try:
-        metrics = await metrics_collector.collect_ai_server_metrics()
+        metrics = await snapshot_store.get_ai_server_metrics()
         return {
             "network": [net.dict() for net in metrics.network],
             "server_status": metrics.server_status.dict()
@@ -93,7 +101,7 @@ async def get_network_metrics():
 async def get_ai_server_health():
     """Get AI server health status"""
     try:
-        metrics = await metrics_collector.collect_ai_server_metrics()
+        metrics = await snapshot_store.get_ai_server_metrics()
         return {
             "status": metrics.server_status.status,
             "last_updated": metrics.server_status.last_updated,
@@ -0,0 +1,35 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import List, Optional
+from ..services.alert_engine import alert_engine
+from ..models.server_metrics import Alert
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/alerts", tags=["Alerts"])
+
+@router.get("/")
+async def get_alerts(state: Optional[str] = Query(None, description="pending or firing")):
+    """Get active alerts from the in-process rule engine"""
+    if state not in (None, "pending", "firing"):
+        raise HTTPException(status_code=400, detail="state must be 'pending' or 'firing'")
+    alerts = alert_engine.active(state)
+    return {
+        "alerts": [alert.dict() for alert in alerts],
+        "firing_count": len([alert for alert in alerts if alert.state == "firing"]),
+        "pending_count": len([alert for alert in alerts if alert.state == "pending"])
+    }
+
+@router.get("/history", response_model=List[Alert])
+async def get_alert_history():
+    """Get recent alert transitions (firing and resolved), oldest first"""
+    _, transitions = alert_engine.events_since(0)
+    return transitions
+
+@router.get("/rules")
+async def get_alert_rules():
+    """Get the loaded alert rules"""
+    return {
+        "rules": [compiled.rule.dict(by_alias=True) for compiled in alert_engine.rules],
+        "rule_count": len(alert_engine.rules)
+    }
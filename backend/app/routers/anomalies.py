@@ -0,0 +1,45 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import List, Optional
+from ..services.anomaly_detector import ANOMALY_METRICS, anomaly_detector
+from ..models.server_metrics import Anomaly
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/anomalies", tags=["Anomalies"])
+
+def _check_metric(metric: str):
+    if metric not in ANOMALY_METRICS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown metric '{metric}'; one of: {', '.join(ANOMALY_METRICS)}"
+        )
+
+@router.get("/")
+async def get_anomalies(metric: Optional[str] = Query(None, description="e.g. gpu_temperature")):
+    """Get the series whose latest samples stray from their EWMA baseline"""
+    if metric is not None:
+        _check_metric(metric)
+    anomalies = anomaly_detector.active(metric)
+    return {
+        "anomalies": [anomaly.dict() for anomaly in anomalies],
+        "anomaly_count": len(anomalies),
+        "series_count": len(anomaly_detector.slots)
+    }
+
+@router.get("/history", response_model=List[Anomaly])
+async def get_anomaly_history():
+    """Get recent anomaly transitions (anomalous and normal), oldest first"""
+    _, transitions = anomaly_detector.events_since(0)
+    return transitions
+
+@router.get("/baselines")
+async def get_anomaly_baselines(metric: str = Query(..., description="e.g. cpu_usage_percent")):
+    """Get the current baseline of every series of a metric"""
+    _check_metric(metric)
+    return {
+        "metric": metric,
+        "alpha": anomaly_detector.alpha,
+        "threshold": anomaly_detector.threshold,
+        "baselines": anomaly_detector.baseline(metric)
+    }
@@ -1,17 +1,19 @@
-from fastapi import APIRouter, HTTPException
-from ..services.metrics_collector import metrics_collector
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional
+from ..services.snapshot_store import snapshot_store
 from ..models.server_metrics import AppServerMetrics
+from ..http_cache import snapshot_cache
 import logging
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/api/app-server", tags=["App Server"])
+router = APIRouter(prefix="/api/app-server", tags=["App Server"], dependencies=[Depends(snapshot_cache)])
 
 @router.get("/", response_model=AppServerMetrics)
 async def get_app_server_metrics():
     """Get current app server metrics including Proxmox host and VM metrics"""
     try:
-        metrics = await metrics_collector.collect_app_server_metrics()
+        metrics = await snapshot_store.get_app_server_metrics()
         return metrics
     except Exception as e:
         logger.error(f"Failed to collect app server metrics: {e}")
@@ -21,7 +23,7 @@ async def get_app_server_metrics():
 async def get_proxmox_metrics():
     """Get Proxmox host metrics"""
     try:
-        metrics = await metrics_collector.collect_app_server_metrics()
+        metrics = await snapshot_store.get_app_server_metrics()
         return {
             "proxmox_host": metrics.proxmox_host,
             "server_status": metrics.server_status.dict()
@@ -34,7 +36,7 @@ async def get_proxmox_metrics():
 async def get_vm_metrics():
     """Get all VM metrics from Proxmox"""
     try:
-        metrics = await metrics_collector.collect_app_server_metrics()
+        metrics = await snapshot_store.get_app_server_metrics()
         return {
             "vms": [vm.dict() for vm in metrics.vms],
             "vm_count": len(metrics.vms),
@@ -49,7 +51,7 @@ async def get_vm_metrics():
 async def get_vm_by_id(vm_id: int):
     """Get specific VM metrics by VM ID"""
     try:
-        metrics = await metrics_collector.collect_app_server_metrics()
+        metrics = await snapshot_store.get_app_server_metrics()
         vm = next((vm for vm in metrics.vms if vm.vmid == vm_id), None)
         
         if not vm:
@@ -66,12 +68,14 @@ async def get_vm_by_id(vm_id: int):
         raise HTTPException(status_code=500, detail=f"Failed to get VM metrics: {str(e)}")
 
 @router.get("/cpu")
-async def get_cpu_metrics():
+async def get_cpu_metrics(detail: Optional[str] = Query(None, description="cores to include per-core usage")):
     """Get CPU metrics from app server"""
+    if detail not in (None, "cores"):
+        raise HTTPException(status_code=400, detail="detail must be 'cores'")
     try:
-        metrics = await metrics_collector.collect_app_server_metrics()
+        metrics = await snapshot_store.get_app_server_metrics()
         return {
-            "cpu": metrics.cpu.dict(),
+            "cpu": metrics.cpu.dict(exclude=None if detail == "cores" else {"core_usage"}),
             "server_status": metrics.server_status.dict()
         }
     except Exception as e:
@@ -82,7 +86,7 @@ async def get_cpu_metrics():
 async def get_memory_metrics():
     """Get memory metrics from app server"""
     try:
-        metrics = await metrics_collector.collect_app_server_metrics()
+        metrics = await snapshot_store.get_app_server_metrics()
         return {
             "memory": metrics.memory.dict(),
             "server_status": metrics.server_status.dict()
@@ -95,7 +99,7 @@ async def get_memory_metrics():
 async def get_storage_metrics():
     """Get storage/disk metrics from app server"""
     try:
-        metrics = await metrics_collector.collect_app_server_metrics()
+        metrics = await snapshot_store.get_app_server_metrics()
         return {
             "disks": [disk.dict() for disk in metrics.disks],
             "server_status": metrics.server_status.dict()
@@ -108,7 +112,7 @@ async def get_storage_metrics():
 async def get_network_metrics():
     """Get network interface metrics from app server"""
     try:
-        metrics = await metrics_collector.collect_app_server_metrics()
+        metrics = await snapshot_store.get_app_server_metrics()
         return {
             "network": [net.dict() for net in metrics.network],
             "server_status": metrics.server_status.dict()
@@ -121,7 +125,7 @@ async def get_network_metrics():
 async def get_app_server_health():
     """Get app server health status"""
     try:
-        metrics = await metrics_collector.collect_app_server_metrics()
+        metrics = await snapshot_store.get_app_server_metrics()
         return {
             "status": metrics.server_status.status,
             "last_updated": metrics.server_status.last_updated,
@@ -0,0 +1,63 @@
+from fastapi import APIRouter, HTTPException, Request
+from pydantic import BaseModel
+from typing import List
+import asyncio
+import httpx
+import logging
+from ..services.snapshot_store import snapshot_store
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api", tags=["Batch"])
+
+MAX_BATCH_PATHS = 50
+# Streams and long-lived endpoints that cannot be answered inside a batch
+EXCLUDED_PREFIXES = ("/api/batch", "/api/stream", "/api/export", "/api/v1/write", "/api/cluster/partials")
+
+class BatchRequest(BaseModel):
+    paths: List[str]
+
+def _check_path(path: str):
+    if not path.startswith("/api/") or path.startswith(EXCLUDED_PREFIXES):
+        raise HTTPException(status_code=400, detail=f"Path '{path}' cannot be batched")
+
+async def _resolve(client: httpx.AsyncClient, path: str):
+    response = await client.get(path)
+    try:
+        body = response.json()
+    except ValueError:
+        body = response.text
+    return {"status": response.status_code, "body": body}
+
+@router.post("/batch")
+async def batch(request: Request, batch_request: BatchRequest):
+    """Resolve several GET paths from one snapshot in a single round trip"""
+    paths = list(dict.fromkeys(batch_request.paths))
+    if not paths:
+        raise HTTPException(status_code=400, detail="paths must not be empty")
+    if len(paths) > MAX_BATCH_PATHS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_PATHS} paths per batch")
+    for path in paths:
+        _check_path(path)
+
+    try:
+        overview = await snapshot_store.get_overview()
+        version = snapshot_store.version
+    except Exception as e:
+        logger.error(f"Failed to resolve batch: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to resolve batch: {str(e)}")
+
+    # Sub-requests run in this context, so they all read the pinned snapshot
+    token = snapshot_store.pin(overview)
+    try:
+        transport = httpx.ASGITransport(app=request.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://batch") as client:
+            results = await asyncio.gather(*[_resolve(client, path) for path in paths])
+    finally:
+        snapshot_store.unpin(token)
+
+    return {
+        "snapshot_version": version,
+        "last_updated": overview.last_updated,
+        "results": dict(zip(paths, results))
+    }
@@ -0,0 +1,37 @@
+from fastapi import APIRouter, HTTPException
+from ..config import settings
+from ..services.shard_aggregator import shard_aggregator
+from ..models.server_metrics import PartialSnapshot
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/cluster", tags=["Cluster"])
+
+def _require_aggregator():
+    if settings.collector_mode != "aggregator":
+        raise HTTPException(status_code=409, detail="This backend is not running with COLLECTOR_MODE=aggregator")
+
+@router.post("/partials")
+async def receive_partial_snapshot(partial: PartialSnapshot):
+    """Accept a partial snapshot from a shard collector and return the current membership"""
+    _require_aggregator()
+    try:
+        return shard_aggregator.receive(partial)
+    except Exception as e:
+        logger.error(f"Failed to merge partial snapshot from {partial.node_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to merge partial snapshot: {str(e)}")
+
+@router.get("/members")
+async def get_cluster_members():
+    """Get shard collector membership, section assignments and section freshness"""
+    _require_aggregator()
+    return shard_aggregator.status()
+
+@router.delete("/members/{node_id}")
+async def remove_cluster_member(node_id: str):
+    """Remove a shard collector so its sections are rebalanced immediately"""
+    _require_aggregator()
+    if not shard_aggregator.remove_member(node_id):
+        raise HTTPException(status_code=404, detail=f"Shard collector {node_id} not found")
+    return shard_aggregator.status()
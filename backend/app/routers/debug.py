@@ -0,0 +1,81 @@
+from fastapi import APIRouter, HTTPException, Query
+from ..config import settings
+from ..services.memory_profiler import GROUP_BY, memory_profiler
+from ..services.offload import offload_pool
+from ..services.websocket_manager import websocket_manager
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/debug", tags=["Debug"])
+
+def _require_debug():
+    if not settings.debug_endpoints:
+        raise HTTPException(status_code=404, detail="Debug endpoints are disabled (DEBUG_ENDPOINTS=false)")
+
+def _check_group_by(group_by: str):
+    if group_by not in GROUP_BY:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of: {', '.join(GROUP_BY)}")
+
+def _require_tracing():
+    if not memory_profiler.tracing:
+        raise HTTPException(status_code=409, detail="tracemalloc is not running; POST /api/debug/memory/start first")
+
+@router.get("/memory")
+async def get_memory(
+    top: int = Query(10, ge=0, le=100, description="allocation sites to list while tracing"),
+    group_by: str = Query("lineno", description="lineno, filename or traceback"),
+    objects: int = Query(25, ge=0, le=500, description="object types to count (0: skip the heap walk)"),
+    connections: int = Query(20, ge=0, le=1000, description="WebSockets with the largest buffers to list")
+):
+    """Get tracemalloc state and top allocation sites, live object counts and WebSocket buffers"""
+    _require_debug()
+    _check_group_by(group_by)
+    try:
+        report = memory_profiler.status()
+        if memory_profiler.tracing and top:
+            # Snapshots and heap walks take a while; keep them off the event loop
+            report["top"] = await offload_pool.run(memory_profiler.top, top, group_by)
+        if objects:
+            report["objects"] = await offload_pool.run(memory_profiler.object_counts, objects)
+        report["websockets"] = memory_profiler.websocket_buffers(websocket_manager.heartbeats.connections, connections)
+        return report
+    except Exception as e:
+        logger.error(f"Failed to build memory report: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to build memory report: {str(e)}")
+
+@router.post("/memory/start")
+async def start_memory_tracing(frames: int = Query(settings.tracemalloc_frames, ge=1, le=100, description="stack frames kept per allocation")):
+    """Start tracemalloc; every allocation is traced until it is stopped"""
+    _require_debug()
+    memory_profiler.start(frames)
+    return memory_profiler.status()
+
+@router.post("/memory/stop")
+async def stop_memory_tracing():
+    """Stop tracemalloc and drop its snapshots"""
+    _require_debug()
+    memory_profiler.stop()
+    return memory_profiler.status()
+
+@router.post("/memory/snapshots")
+async def take_memory_snapshot(label: str = Query("", description="note to tell snapshots apart")):
+    """Take a snapshot of the traced allocations to diff later ones against"""
+    _require_debug()
+    _require_tracing()
+    return await offload_pool.run(memory_profiler.snapshot, label)
+
+@router.get("/memory/diff")
+async def get_memory_diff(
+    since: int = Query(..., description="id of a snapshot taken earlier"),
+    limit: int = Query(25, ge=1, le=200),
+    group_by: str = Query("lineno", description="lineno, filename or traceback")
+):
+    """Get the allocation sites that grew most since a snapshot"""
+    _require_debug()
+    _require_tracing()
+    _check_group_by(group_by)
+    stats = await offload_pool.run(memory_profiler.diff, since, limit, group_by)
+    if stats is None:
+        raise HTTPException(status_code=404, detail=f"Snapshot {since} not found; the newest snapshots are kept")
+    return {"since": since, "group_by": group_by, "growth": stats}
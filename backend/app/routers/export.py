@@ -0,0 +1,74 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from datetime import datetime
+from typing import List, Optional
+import time
+import logging
+from ..services import exporter
+from ..services.exporter import EXPORT_METRICS, FORMATS, export_stream
+from ..services.metrics_collector import SERVER_TYPES
+from ..services.offload import offload_pool
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api", tags=["Export"])
+
+MEDIA_TYPES = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+def _parse_list(value: Optional[str], allowed: List[str], name: str) -> List[str]:
+    if not value:
+        return list(allowed)
+    selected = [item.strip() for item in value.split(",") if item.strip()]
+    unknown = [item for item in selected if item not in allowed]
+    if unknown or not selected:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown {name}: {', '.join(unknown)}. Available {name}: {', '.join(allowed)}"
+        )
+    return selected
+
+def _parse_time(value: str, name: str) -> float:
+    """Unix seconds or RFC 3339, like the Prometheus API"""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be unix seconds or RFC 3339")
+
+@router.get("/export")
+async def export_metrics(
+    start: str = Query(..., description="unix seconds or RFC 3339"),
+    end: Optional[str] = Query(None, description="unix seconds or RFC 3339 (default: now)"),
+    hosts: Optional[str] = Query(None, description=f"Comma-separated servers: {', '.join(SERVER_TYPES)} (default: all)"),
+    metrics: Optional[str] = Query(None, description="Comma-separated metrics (default: all)"),
+    step: int = Query(60, ge=1, description="seconds between points"),
+    format: str = Query("csv", description="csv or parquet")
+):
+    """Stream historical metrics as CSV or Parquet, fetched in step-aligned chunks"""
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail="format must be 'csv' or 'parquet'")
+    if format == "parquet" and exporter.pq is None:
+        raise HTTPException(status_code=400, detail="Parquet export needs pyarrow installed on the server")
+    selected_hosts = _parse_list(hosts, SERVER_TYPES, "hosts")
+    selected_metrics = _parse_list(metrics, EXPORT_METRICS, "metrics")
+    start_time = _parse_time(start, "start")
+    end_time = _parse_time(end, "end") if end else time.time()
+    if end_time <= start_time:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    if offload_pool.full:
+        # Its rows would be formatted on the event loop, holding up everyone else
+        raise HTTPException(status_code=503, detail="Export workers are busy, try again later", headers={"Retry-After": "5"})
+
+    filename = f"metrics-{int(start_time)}-{int(end_time)}.{format}"
+    return StreamingResponse(
+        export_stream(format, selected_hosts, selected_metrics, start_time, end_time, step),
+        media_type=MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            # Stop nginx from buffering the download
+            "X-Accel-Buffering": "no"
+        }
+    )
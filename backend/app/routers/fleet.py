@@ -0,0 +1,77 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import List, Optional
+from ..services.fleet import FLEET_METRICS, fleet_index
+from ..services.capacity import capacity_forecaster
+from ..services.snapshot_store import snapshot_store
+from ..http_cache import snapshot_cache
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/fleet", tags=["Fleet"], dependencies=[Depends(snapshot_cache)])
+
+def _check_metric(metric: str):
+    if metric not in FLEET_METRICS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown metric '{metric}'; one of: {', '.join(FLEET_METRICS)}"
+        )
+
+@router.get("/metrics")
+async def get_fleet_metrics():
+    """Get the metrics that can be ranked and aggregated, with their field paths"""
+    return {"metrics": FLEET_METRICS}
+
+@router.get("/top")
+async def get_fleet_top(
+    metric: str = Query(..., description="e.g. disk_usage_percent"),
+    n: int = Query(10, ge=1, le=100),
+    order: str = Query("desc", description="desc for the highest values, asc for the lowest")
+):
+    """Get the n highest (or lowest) values of a metric across all servers"""
+    _check_metric(metric)
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be 'asc' or 'desc'")
+    try:
+        return {
+            "metric": metric,
+            "order": order,
+            "results": await fleet_index.top(metric, n, ascending=order == "asc")
+        }
+    except Exception as e:
+        logger.error(f"Failed to rank {metric}: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to rank {metric}: {str(e)}")
+
+@router.get("/aggregate")
+async def get_fleet_aggregate(
+    metric: str = Query(..., description="e.g. cpu_usage_percent"),
+    quantile: Optional[List[float]] = Query(None, description="quantiles to compute, 0 to 1 (default 0.5, 0.9, 0.99)")
+):
+    """Get the count, sum, average, min, max and quantiles of a metric across all servers"""
+    _check_metric(metric)
+    if quantile and any(not 0 <= q <= 1 for q in quantile):
+        raise HTTPException(status_code=400, detail="quantile must be between 0 and 1")
+    try:
+        return {"metric": metric, **await fleet_index.aggregate(metric, quantile)}
+    except Exception as e:
+        logger.error(f"Failed to aggregate {metric}: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to aggregate {metric}: {str(e)}")
+
+@router.get("/capacity")
+async def get_fleet_capacity(
+    within_days: Optional[float] = Query(None, gt=0, description="only mounts forecast to fill within this many days")
+):
+    """Get the growth rate and time-to-full of every mount, soonest to fill first"""
+    try:
+        overview = await snapshot_store.get_overview()
+        mounts = capacity_forecaster.report(overview)
+    except Exception as e:
+        logger.error(f"Failed to build capacity report: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to build capacity report: {str(e)}")
+    if within_days is not None:
+        mounts = [mount for mount in mounts if mount["days_to_full"] is not None and mount["days_to_full"] <= within_days]
+    return {
+        "window_days": capacity_forecaster.window / 86400,
+        "mounts": mounts,
+        "mount_count": len(mounts)
+    }
@@ -0,0 +1,64 @@
+from fastapi import APIRouter, HTTPException, Request, Response
+from ..config import settings
+from ..services.offload import OffloadBusy, offload_pool
+from ..services.remote_write import PayloadTooLarge, decode_write_request, remote_write_store
+from ..services.snapshot_store import snapshot_store
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/v1", tags=["Remote Write"])
+
+async def _read_body(request: Request, limit: int) -> bytes:
+    """The request body, refusing it as soon as it passes ``limit`` bytes"""
+    length = request.headers.get("content-length")
+    if length is not None and int(length) > limit:
+        raise PayloadTooLarge(f"{length} bytes, over the {limit} byte limit")
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > limit:
+            raise PayloadTooLarge(f"over the {limit} byte limit")
+    return bytes(body)
+
+@router.post("/write", status_code=204)
+async def receive_remote_write(request: Request):
+    """Prometheus remote-write receiver (snappy-compressed protobuf WriteRequest)"""
+    if settings.collector_mode != "embedded":
+        raise HTTPException(
+            status_code=409,
+            detail="Remote write is only accepted with COLLECTOR_MODE=embedded"
+        )
+
+    limit = settings.remote_write_max_bytes
+    try:
+        body = await _read_body(request, limit)
+        # Decompressing and decoding a large batch takes a while; keep it off the event loop
+        series = await offload_pool.run(
+            decode_write_request, body, request.headers.get("content-encoding", "snappy"), limit,
+            timeout=settings.offload_wait
+        )
+    except OffloadBusy as e:
+        # Prometheus retries 5xx answers with backoff
+        raise HTTPException(status_code=503, detail=f"Remote write is busy: {str(e)}", headers={"Retry-After": "5"})
+    except PayloadTooLarge as e:
+        logger.warning(f"Rejected remote write request: {e}")
+        raise HTTPException(status_code=413, detail=f"Remote write request too large: {str(e)}")
+    except ValueError as e:
+        logger.warning(f"Rejected remote write request: {e}")
+        raise HTTPException(status_code=400, detail=f"Invalid remote write request: {str(e)}")
+
+    updated = remote_write_store.ingest(series)
+    remote_write_store.expire()
+    if updated:
+        snapshot_store.request_refresh()
+    return Response(status_code=204)
+
+@router.get("/write/status")
+async def get_remote_write_status():
+    """Get the targets currently served from pushed samples"""
+    return {
+        "fresh_targets": sorted(i for i in remote_write_store.last_push if remote_write_store.is_fresh(i)),
+        "stale_after_seconds": settings.remote_write_staleness,
+        "samples_received": remote_write_store.samples_received
+    }
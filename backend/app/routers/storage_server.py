@@ -1,17 +1,19 @@
-from fastapi import APIRouter, HTTPException
-from ..services.metrics_collector import metrics_collector
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional
+from ..services.snapshot_store import snapshot_store
 from ..models.server_metrics import StorageServerMetrics
+from ..http_cache import snapshot_cache
 import logging
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/api/storage-server", tags=["Storage Server"])
+router = APIRouter(prefix="/api/storage-server", tags=["Storage Server"], dependencies=[Depends(snapshot_cache)])
 
 @router.get("/", response_model=StorageServerMetrics)
 async def get_storage_server_metrics():
     """Get current storage server metrics including filesystems and Qdrant"""
     try:
-        metrics = await metrics_collector.collect_storage_server_metrics()
+        metrics = await snapshot_store.get_storage_server_metrics()
         return metrics
     except Exception as e:
         logger.error(f"Failed to collect storage server metrics: {e}")
@@ -21,7 +23,7 @@ async def get_storage_server_metrics():
 async def get_filesystem_metrics():
     """Get detailed filesystem metrics including file counts and sizes"""
     try:
-        metrics = await metrics_collector.collect_storage_server_metrics()
+        metrics = await snapshot_store.get_storage_server_metrics()
         return {
             "filesystems": [fs.dict() for fs in metrics.filesystems],
             "total_filesystems": len(metrics.filesystems),
@@ -37,7 +39,7 @@ async def get_filesystem_metrics():
 async def get_filesystem_by_mount(mount_point: str):
     """Get specific filesystem metrics by mount point"""
     try:
-        metrics = await metrics_collector.collect_storage_server_metrics()
+        metrics = await snapshot_store.get_storage_server_metrics()
         
         # Normalize mount point (add leading slash if missing)
         if not mount_point.startswith('/'):
@@ -62,7 +64,7 @@ async def get_filesystem_by_mount(mount_point: str):
 async def get_qdrant_metrics():
     """Get Qdrant database metrics"""
     try:
-        metrics = await metrics_collector.collect_storage_server_metrics()
+        metrics = await snapshot_store.get_storage_server_metrics()
         
         if not metrics.qdrant:
             return {
@@ -80,12 +82,14 @@ async def get_qdrant_metrics():
         raise HTTPException(status_code=500, detail=f"Failed to collect Qdrant metrics: {str(e)}")
 
 @router.get("/cpu")
-async def get_cpu_metrics():
+async def get_cpu_metrics(detail: Optional[str] = Query(None, description="cores to include per-core usage")):
     """Get CPU metrics from storage server"""
+    if detail not in (None, "cores"):
+        raise HTTPException(status_code=400, detail="detail must be 'cores'")
     try:
-        metrics = await metrics_collector.collect_storage_server_metrics()
+        metrics = await snapshot_store.get_storage_server_metrics()
         return {
-            "cpu": metrics.cpu.dict(),
+            "cpu": metrics.cpu.dict(exclude=None if detail == "cores" else {"core_usage"}),
             "server_status": metrics.server_status.dict()
         }
     except Exception as e:
@@ -96,7 +100,7 @@ async def get_cpu_metrics():
 async def get_memory_metrics():
     """Get memory metrics from storage server"""
     try:
-        metrics = await metrics_collector.collect_storage_server_metrics()
+        metrics = await snapshot_store.get_storage_server_metrics()
         return {
             "memory": metrics.memory.dict(),
             "server_status": metrics.server_status.dict()
@@ -109,7 +113,7 @@ async def get_memory_metrics():
 async def get_storage_metrics():
     """Get storage/disk metrics from storage server"""
     try:
-        metrics = await metrics_collector.collect_storage_server_metrics()
+        metrics = await snapshot_store.get_storage_server_metrics()
         return {
             "disks": [disk.dict() for disk in metrics.disks],
             "server_status": metrics.server_status.dict()
@@ -122,7 +126,7 @@ async def get_storage_metrics():
 async def get_network_metrics():
     """Get network interface metrics from storage server"""
     try:
-        metrics = await metrics_collector.collect_storage_server_metrics()
+        metrics = await snapshot_store.get_storage_server_metrics()
         return {
             "network": [net.dict() for net in metrics.network],
             "server_status": metrics.server_status.dict()
@@ -135,7 +139,7 @@ async def get_network_metrics():
 async def get_storage_server_health():
     """Get storage server health status"""
     try:
-        metrics = await metrics_collector.collect_storage_server_metrics()
+        metrics = await snapshot_store.get_storage_server_metrics()
         
         # Calculate storage health indicators
         total_capacity = sum(fs.total_gb for fs in metrics.filesystems)
@@ -152,7 +156,10 @@ async def get_storage_server_health():
             "total_capacity_gb": total_capacity,
             "total_used_gb": total_used,
             "average_usage_percent": avg_usage,
-            "total_files": sum(fs.file_count for fs in metrics.filesystems)
+            "total_files": sum(fs.file_count for fs in metrics.filesystems),
+            "soonest_full_days": min(
+                (fs.days_to_full for fs in metrics.filesystems if fs.days_to_full is not None), default=None
+            )
         }
     except Exception as e:
         logger.error(f"Failed to check storage server health: {e}")
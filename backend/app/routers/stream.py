@@ -0,0 +1,43 @@
+from fastapi import APIRouter, HTTPException, Header, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from ..services.event_stream import event_stream, TOPICS
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api", tags=["Stream"])
+
+@router.get("/stream")
+async def stream_metrics(
+    topics: Optional[str] = Query(None, description=f"Comma-separated topics: {', '.join(TOPICS)} (default: all)"),
+    last_event_id: Optional[str] = Header(None),
+    last_event_id_param: Optional[str] = Query(None, alias="lastEventId")
+):
+    """Server-Sent Events stream of metrics updates, resumable with Last-Event-ID"""
+    selected = TOPICS
+    if topics:
+        selected = [topic.strip() for topic in topics.split(",") if topic.strip()]
+        unknown = [topic for topic in selected if topic not in TOPICS]
+        if unknown or not selected:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown topics: {', '.join(unknown)}. Available topics: {', '.join(TOPICS)}"
+            )
+
+    resume_from = last_event_id or last_event_id_param
+    try:
+        resume_id = int(resume_from) if resume_from else None
+    except ValueError:
+        # Not one of our ids; start from the latest snapshot
+        resume_id = None
+
+    return StreamingResponse(
+        event_stream.stream(selected, resume_id),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Stop nginx from buffering the stream
+            "X-Accel-Buffering": "no"
+        }
+    )
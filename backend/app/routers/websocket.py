@@ -1,5 +1,6 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from ..services.websocket_manager import websocket_manager
+from ..services.heartbeat import is_pong
 import logging
 import json
 
@@ -22,16 +23,22 @@ async def websocket_endpoint(websocket: WebSocket):
             }),
             websocket
         )
+        await websocket_manager.send_snapshot(websocket)
         
         # Keep connection alive and handle incoming messages
         while True:
             try:
                 # Wait for messages from client (ping, requests, etc.)
                 data = await websocket.receive_text()
+                # Any message, including pongs to heartbeats, shows the client is alive
+                websocket_manager.heartbeats.seen(websocket)
                 message = json.loads(data)
                 
                 # Handle different message types
-                if message.get("type") == "ping":
+                if message.get("type") == "pong":
+                    # Answers heartbeats, so the silence deadline applies from now on
+                    websocket_manager.heartbeats.seen(websocket, pong=True)
+                elif message.get("type") == "ping":
                     await websocket_manager.send_personal_message(
                         json.dumps({
                             "event_type": "pong",
@@ -41,9 +48,9 @@ async def websocket_endpoint(websocket: WebSocket):
                     )
                 elif message.get("type") == "request_update":
                     # Client requesting immediate metrics update
-                    from ..services.metrics_collector import metrics_collector
+                    from ..services.snapshot_store import snapshot_store
                     try:
-                        overview = await metrics_collector.collect_all_metrics()
+                        overview = await snapshot_store.get_overview()
                         await websocket_manager.send_personal_message(
                             json.dumps({
                                 "event_type": "metrics_update",
@@ -94,22 +101,18 @@ async def websocket_endpoint(websocket: WebSocket):
 async def heartbeat_endpoint(websocket: WebSocket):
     """WebSocket endpoint for heartbeat/health monitoring"""
     await websocket.accept()
+    heartbeats = websocket_manager.heartbeats
     
     try:
+        await websocket.send_text(heartbeats.heartbeat_message())
+        # Further heartbeats come from the shared timer; only client messages are handled here
+        heartbeats.register(websocket, "heartbeat")
         while True:
-            # Send heartbeat every 30 seconds
-            await websocket.send_text(json.dumps({
-                "event_type": "heartbeat",
-                "timestamp": str(websocket_manager.active_connections.__len__()),
-                "active_connections": len(websocket_manager.active_connections),
-                "status": "healthy"
-            }))
-            
-            # Wait for 30 seconds
-            import asyncio
-            await asyncio.sleep(30)
+            heartbeats.seen(websocket, pong=is_pong(await websocket.receive_text()))
             
     except WebSocketDisconnect:
         logger.info("Heartbeat WebSocket client disconnected")
     except Exception as e:
-        logger.error(f"Heartbeat WebSocket error: {e}")
\ No newline at end of file
+        logger.error(f"Heartbeat WebSocket error: {e}")
+    finally:
+        heartbeats.unregister(websocket)
\ No newline at end of file
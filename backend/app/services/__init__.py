@@ -1,9 +1,23 @@
 from .prometheus_client import prometheus_client
 from .metrics_collector import metrics_collector
+from .snapshot_store import snapshot_store
 from .websocket_manager import websocket_manager
+from .event_stream import event_stream
+from .alert_engine import alert_engine
+from .remote_write import remote_write_store
+from .fleet import fleet_index
+from .anomaly_detector import anomaly_detector
+from .capacity import capacity_forecaster
 
 __all__ = [
     "prometheus_client",
     "metrics_collector", 
-    "websocket_manager"
+    "snapshot_store",
+    "websocket_manager",
+    "event_stream",
+    "alert_engine",
+    "remote_write_store",
+    "fleet_index",
+    "anomaly_detector",
+    "capacity_forecaster"
 ]
\ No newline at end of file
@@ -0,0 +1,263 @@
+import logging
+import operator
+import os
+import re
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+import yaml
+from pydantic import BaseModel
+from ..config import settings
+from ..models.server_metrics import Alert, AlertRule, SystemOverview
+from .metrics_collector import SERVER_TYPES
+
+logger = logging.getLogger(__name__)
+
+# backend/, where alert_rules.yml ships
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+OPS: Dict[str, Callable[[Any, Any], bool]] = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne
+}
+ORDERED_OPS = {">", ">=", "<", "<="}
+# Fields that identify a list item in alert instance names, e.g. disks[/]
+# (GPUs share a model name, so their uuid comes first)
+ITEM_KEYS = ("mount_point", "interface", "vmid", "uuid", "name")
+# Transitions kept for WebSocket broadcasters catching up
+MAX_EVENTS = 1000
+
+_SEGMENT_RE = re.compile(r"^(\w+|\*)(?:\[([^\]]*)\])?$")
+
+Step = Callable[[str, Any], Iterator[Tuple[str, Any]]]
+
+def _item_key(item: Any, index: int) -> str:
+    for key in ITEM_KEYS:
+        value = getattr(item, key, None)
+        if value is not None:
+            return str(value)
+    return str(index)
+
+def _join(label: str, name: str) -> str:
+    return f"{label}.{name}" if label else name
+
+def _compile_segment(segment: str) -> List[Step]:
+    match = _SEGMENT_RE.match(segment)
+    if not match:
+        raise ValueError(f"Invalid field segment '{segment}'")
+    name, selector = match.groups()
+    steps: List[Step] = []
+
+    if name == "*":
+        def children(label: str, obj: Any):
+            for field_name in type(obj).model_fields if isinstance(obj, BaseModel) else ():
+                value = getattr(obj, field_name)
+                if isinstance(value, BaseModel):
+                    yield _join(label, field_name), value
+        steps.append(children)
+    else:
+        def attribute(label: str, obj: Any):
+            value = obj.get(name) if isinstance(obj, dict) else getattr(obj, name, None)
+            if value is not None:
+                yield _join(label, name), value
+        steps.append(attribute)
+
+    if selector is not None:
+        def items(label: str, obj: Any):
+            if not isinstance(obj, list):
+                return
+            for index, item in enumerate(obj):
+                key = _item_key(item, index)
+                if selector in ("*", key):
+                    yield f"{label}[{key}]", item
+        steps.append(items)
+    return steps
+
+def compile_path(path: str) -> Callable[[SystemOverview], Iterator[Tuple[str, Any]]]:
+    """Turn a field path into a function yielding ``(instance, value)`` pairs.
+
+    Segments are separated by dots. ``*`` matches every nested model (at the
+    top level: every server), ``name[*]`` every list item and ``name[key]``
+    the item whose mount point, interface, vmid or name is ``key``.
+    """
+    steps: List[Step] = []
+    for segment in path.split("."):
+        steps.extend(_compile_segment(segment))
+
+    def select(overview: SystemOverview) -> Iterator[Tuple[str, Any]]:
+        current: List[Tuple[str, Any]] = [("", overview)]
+        for step in steps:
+            current = [pair for label, obj in current for pair in step(label, obj)]
+        return iter(current)
+    return select
+
+class CompiledRule:
+    """An AlertRule with its field accessor and comparisons resolved up front"""
+
+    def __init__(self, rule: AlertRule):
+        if rule.op not in OPS:
+            raise ValueError(f"Unknown operator '{rule.op}'")
+        if rule.kind not in ("threshold", "rate"):
+            raise ValueError(f"Unknown rule kind '{rule.kind}'")
+        ordered = rule.op in ORDERED_OPS
+        if (ordered or rule.kind == "rate") and not isinstance(rule.threshold, float):
+            raise ValueError(f"Operator '{rule.op}' needs a numeric threshold")
+        if rule.clear is not None:
+            if not ordered:
+                raise ValueError("'clear' needs one of >, >=, <, <=")
+            if OPS[rule.op](rule.clear, rule.threshold):
+                raise ValueError("'clear' must be on the other side of 'threshold'")
+
+        self.rule = rule
+        self.select = compile_path(rule.field)
+        self.compare = OPS[rule.op]
+        self.numeric = ordered or rule.kind == "rate"
+        self.clear = rule.clear if rule.clear is not None else rule.threshold
+        self.samples: Dict[str, Deque[Tuple[float, float]]] = {}
+
+    def values(self, overview: SystemOverview, now: float) -> List[Tuple[str, Any]]:
+        """Every selected instance with its value, or None when it cannot be compared yet"""
+        results = []
+        for instance, value in self.select(overview):
+            if self.numeric:
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                value = float(value)
+            if self.rule.kind == "rate":
+                value = self._rate(instance, value, now)
+            results.append((instance, value))
+        if self.rule.kind == "rate":
+            present = {instance for instance, _ in results}
+            for instance in [i for i in self.samples if i not in present]:
+                del self.samples[instance]
+        return results
+
+    def _rate(self, instance: str, value: float, now: float) -> Optional[float]:
+        samples = self.samples.setdefault(instance, deque())
+        if samples and now <= samples[-1][0]:
+            return None
+        samples.append((now, value))
+        while samples and now - samples[0][0] > self.rule.window_seconds:
+            samples.popleft()
+        if len(samples) < 2:
+            return None
+        start, first = samples[0]
+        return (value - first) / (now - start)
+
+class AlertEngine:
+    """Evaluates alert rules on every new snapshot.
+
+    Each rule and instance moves through pending (condition true, waiting for
+    ``for``) and firing. A firing alert resolves only once its value crosses
+    the rule's ``clear`` level, so values hovering around the threshold do not
+    flap. Firing and resolved transitions are kept in a short event log for
+    WebSocket broadcasting.
+    """
+
+    def __init__(self):
+        self.rules: List[CompiledRule] = []
+        self.alerts: Dict[Tuple[str, str], Alert] = {}
+        self.events: Deque[Tuple[int, Alert]] = deque(maxlen=MAX_EVENTS)
+        self.sequence = 0
+
+    def load_rules(self, path: str):
+        """Compile the rules in a YAML file with a top-level ``rules`` list.
+
+        A relative path is taken from the backend directory, not the working
+        directory uvicorn was started from.
+        """
+        if not os.path.isabs(path):
+            path = os.path.join(BACKEND_DIR, path)
+        if not os.path.exists(path):
+            logger.error(f"Alert rules file {path} not found, alerting disabled")
+            return
+        with open(path) as f:
+            document = yaml.safe_load(f) or {}
+        compiled = []
+        for entry in document.get("rules", []):
+            try:
+                compiled.append(CompiledRule(AlertRule(**entry)))
+            except Exception as e:
+                logger.error(f"Skipping invalid alert rule {entry.get('name', entry)}: {e}")
+        self.rules = compiled
+        names = {rule.rule.name for rule in compiled}
+        self.alerts = {key: alert for key, alert in self.alerts.items() if key[0] in names}
+        logger.info(f"Loaded {len(compiled)} alert rules from {path}")
+
+    def _record(self, alert: Alert):
+        self.sequence += 1
+        self.events.append((self.sequence, alert.model_copy()))
+
+    def evaluate(self, overview: SystemOverview) -> int:
+        """Update alert states from a snapshot and set its ``alerts_count``"""
+        now = overview.last_updated.timestamp()
+        timestamp = overview.last_updated
+        for compiled in self.rules:
+            rule = compiled.rule
+            seen = set()
+            for instance, value in compiled.values(overview, now):
+                key = (rule.name, instance)
+                seen.add(key)
+                if value is None:
+                    continue
+                alert = self.alerts.get(key)
+                if alert is None:
+                    if compiled.compare(value, rule.threshold):
+                        server_type = instance.split(".", 1)[0]
+                        alert = Alert(
+                            rule=rule.name,
+                            instance=instance,
+                            server_type=server_type if server_type in SERVER_TYPES else None,
+                            severity=rule.severity,
+                            state="pending",
+                            value=value,
+                            threshold=rule.threshold,
+                            description=rule.description,
+                            active_since=timestamp
+                        )
+                        self.alerts[key] = alert
+                    else:
+                        continue
+                alert.value = value
+                if alert.state == "pending":
+                    if not compiled.compare(value, rule.threshold):
+                        del self.alerts[key]
+                    elif now - alert.active_since.timestamp() >= rule.for_seconds:
+                        alert.state = "firing"
+                        alert.firing_since = timestamp
+                        self._record(alert)
+                elif not compiled.compare(value, compiled.clear):
+                    self._resolve(key, timestamp)
+
+            # Instances that disappeared from the snapshot
+            for key in [k for k in self.alerts if k[0] == rule.name and k not in seen]:
+                if self.alerts[key].state == "firing":
+                    self.alerts[key].value = None
+                    self._resolve(key, timestamp)
+                else:
+                    del self.alerts[key]
+
+        overview.alerts_count = sum(1 for alert in self.alerts.values() if alert.state == "firing")
+        return overview.alerts_count
+
+    def _resolve(self, key: Tuple[str, str], timestamp: datetime):
+        alert = self.alerts.pop(key)
+        alert.state = "resolved"
+        alert.resolved_at = timestamp
+        self._record(alert)
+
+    def active(self, state: Optional[str] = None) -> List[Alert]:
+        """Pending and firing alerts, optionally only those in ``state``"""
+        return [alert for alert in self.alerts.values() if state is None or alert.state == state]
+
+    def events_since(self, sequence: int) -> Tuple[int, List[Alert]]:
+        """Transitions after ``sequence`` and the sequence to pass next time"""
+        return self.sequence, [alert for seq, alert in self.events if seq > sequence]
+
+# Global alert engine instance
+alert_engine = AlertEngine()
+alert_engine.load_rules(settings.alert_rules_file)
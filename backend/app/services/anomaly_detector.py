@@ -0,0 +1,243 @@
+import logging
+import math
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+import numpy as np
+from ..config import settings
+from ..models.server_metrics import Anomaly, SystemOverview
+from .alert_engine import compile_path
+from .metrics_collector import SERVER_TYPES
+
+logger = logging.getLogger(__name__)
+
+# Volatile metrics that get a baseline, as field paths into SystemOverview
+# (see alert_engine.compile_path). Sizes and other static facts are left out.
+ANOMALY_METRICS: Dict[str, str] = {
+    "cpu_usage_percent": "*.cpu.usage_percent",
+    "cpu_iowait_percent": "*.cpu.modes.iowait",
+    "cpu_steal_percent": "*.cpu.modes.steal",
+    "memory_usage_percent": "*.memory.usage_percent",
+    "disk_usage_percent": "*.disks[*].usage_percent",
+    "network_bytes_sent": "*.network[*].bytes_sent",
+    "network_bytes_recv": "*.network[*].bytes_recv",
+    "network_errors_in": "*.network[*].errors_in",
+    "network_errors_out": "*.network[*].errors_out",
+    "gpu_usage_percent": "*.gpus[*].usage_percent",
+    "gpu_temperature": "*.gpus[*].temperature",
+    "gpu_power_draw_w": "*.gpus[*].power_draw_w",
+    "vm_cpu_usage": "app_server.vms[*].cpu_usage",
+}
+# Anomaly transitions kept for WebSocket broadcasters catching up
+MAX_EVENTS = 1000
+# Floor of the deviation a sample is scored against, relative to the baseline
+# and absolute, so a perfectly flat series is not flagged on its first wobble
+MIN_RELATIVE_DEVIATION = 0.01
+MIN_DEVIATION = 1e-6
+
+SeriesKey = Tuple[str, str]
+
+class AnomalyDetector:
+    """Flags samples that stray from their series' recent behaviour.
+
+    Every series (metric and instance) keeps an exponentially weighted mean
+    and variance. Each snapshot is scored in one pass over all series: a
+    sample whose z-score against its baseline reaches ``threshold`` marks the
+    series anomalous until a later sample is back within it. Only series of
+    sections that were collected again since the last snapshot are sampled;
+    the others are carried over unchanged, since scoring the same sample twice
+    would shrink its variance. Baselines live in flat NumPy arrays indexed by
+    series slot; the slot index of a snapshot is reused while the set of
+    series does not change, and slots of series missing for ``expiry``
+    snapshots are dropped.
+    """
+
+    def __init__(self, alpha: float, threshold: float, warmup: int, expiry: int):
+        self.alpha = alpha
+        self.threshold = threshold
+        self.warmup = warmup
+        self.expiry = expiry
+        self.selectors: Dict[str, Callable[[SystemOverview], Iterator[Tuple[str, Any]]]] = {
+            name: compile_path(path) for name, path in ANOMALY_METRICS.items()
+        }
+        self.slots: Dict[SeriesKey, int] = {}
+        self.keys: List[SeriesKey] = []
+        self._mean = np.zeros(0)
+        self._var = np.zeros(0)
+        self._count = np.zeros(0)
+        self._active = np.zeros(0, dtype=bool)
+        # Tick each slot's series was last in a snapshot
+        self._seen = np.zeros(0, dtype=np.int64)
+        self.ticks = 0
+        self._layout: Optional[List[SeriesKey]] = None
+        self._index: Any = None
+        self._present: Set[SeriesKey] = set()
+        self._sampled_at: Dict[str, datetime] = {}
+        self.anomalies: Dict[SeriesKey, Anomaly] = {}
+        self.events: Deque[Tuple[int, Anomaly]] = deque(maxlen=MAX_EVENTS)
+        self.sequence = 0
+
+    def extract(self, overview: SystemOverview) -> Tuple[List[SeriesKey], List[float]]:
+        """Series keys and values of every tracked metric in a snapshot"""
+        series: Dict[SeriesKey, float] = {}
+        for metric, select in self.selectors.items():
+            for instance, value in select(overview):
+                if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+                    continue
+                # "ai_server.disks[/].usage_percent" -> "ai_server.disks[/]"
+                series[(metric, instance.rsplit(".", 1)[0])] = float(value)
+        return list(series), list(series.values())
+
+    def update(self, overview: SystemOverview) -> int:
+        """Score a snapshot and update the baselines; returns the number of transitions"""
+        collected = {name: getattr(overview, name).server_status.last_updated for name in SERVER_TYPES}
+        fresh = {name for name, at in collected.items() if self._sampled_at.get(name) != at}
+        self._sampled_at = collected
+        keys, values = self.extract(overview)
+        sampled = None
+        if len(fresh) < len(SERVER_TYPES):
+            sampled = [key[1].split(".", 1)[0] in fresh for key in keys]
+        return self.observe(keys, values, overview.last_updated, sampled)
+
+    def _slot_index(self, keys: List[SeriesKey]):
+        if keys == self._layout:
+            return self._index
+        new = [key for key in keys if key not in self.slots]
+        if new:
+            for key in new:
+                self.slots[key] = len(self.keys)
+                self.keys.append(key)
+            self._mean = np.concatenate([self._mean, np.zeros(len(new))])
+            self._var = np.concatenate([self._var, np.zeros(len(new))])
+            self._count = np.concatenate([self._count, np.zeros(len(new))])
+            self._active = np.concatenate([self._active, np.zeros(len(new), dtype=bool)])
+            self._seen = np.concatenate([self._seen, np.zeros(len(new), dtype=np.int64)])
+        index = [self.slots[key] for key in keys]
+        self._layout = keys
+        self._present = set(keys)
+        if index == list(range(len(self.keys))):
+            # Every slot in slot order, the usual case: views instead of copies
+            self._index = slice(None)
+        else:
+            self._index = np.array(index, dtype=np.intp)
+        return self._index
+
+    def _expire(self):
+        """Drop the slots of series missing from the last ``expiry`` snapshots"""
+        keep = np.flatnonzero(self._seen >= self.ticks - self.expiry)
+        if len(keep) == len(self.keys):
+            return
+        self.keys = [self.keys[slot] for slot in keep]
+        self.slots = {key: slot for slot, key in enumerate(self.keys)}
+        self._mean = self._mean[keep]
+        self._var = self._var[keep]
+        self._count = self._count[keep]
+        self._active = self._active[keep]
+        self._seen = self._seen[keep]
+        self._layout = None
+
+    def _score(self, index, values: Sequence[float], sampled) -> List[Tuple[int, float, float, float, bool]]:
+        """Update the baselines of the sampled series in ``index`` and return
+        the ``(position, baseline, deviation, zscore, anomalous)`` of those
+        whose state changed"""
+        x = np.asarray(values, dtype=float)
+        mean = self._mean[index]
+        var = self._var[index]
+        count = self._count[index]
+        active = self._active[index]
+        deviation = np.maximum(np.sqrt(var), np.maximum(np.abs(mean) * MIN_RELATIVE_DEVIATION, MIN_DEVIATION))
+        diff = x - mean
+        zscore = diff / deviation
+        anomalous = (count >= self.warmup) & (np.abs(zscore) >= self.threshold)
+        increment = self.alpha * diff
+        first = count == 0
+        mean_next = np.where(first, x, mean + increment)
+        var_next = np.where(first, 0.0, (1 - self.alpha) * (var + diff * increment))
+        count_next = count + 1
+        if sampled is not None:
+            # Series of sections not collected again keep their state
+            anomalous = np.where(sampled, anomalous, active)
+            mean_next = np.where(sampled, mean_next, mean)
+            var_next = np.where(sampled, var_next, var)
+            count_next = np.where(sampled, count_next, count)
+        # Read before writing back: with a slice index these are views
+        changed = [
+            (int(i), float(mean[i]), float(deviation[i]), float(zscore[i]), bool(anomalous[i]))
+            for i in np.flatnonzero(anomalous != active)
+        ]
+
+        self._mean[index] = mean_next
+        self._var[index] = var_next
+        self._count[index] = count_next
+        self._active[index] = anomalous
+        self._seen[index] = self.ticks
+        return changed
+
+    def observe(self, keys: List[SeriesKey], values: Sequence[float], timestamp: datetime,
+                sampled: Optional[Sequence[bool]] = None) -> int:
+        """Score one sample per series; returns the number of transitions.
+
+        ``sampled`` marks the series that have a new sample; the others are
+        only kept present. By default every series is sampled.
+        """
+        self.ticks += 1
+        if self.keys and self._seen.min() < self.ticks - self.expiry:
+            self._expire()
+        index = self._slot_index(keys)
+        changed = self._score(index, values, None if sampled is None else np.asarray(sampled, dtype=bool))
+        for position, baseline, deviation, zscore, anomalous in changed:
+            key = keys[position]
+            metric, instance = key
+            server_type = instance.split(".", 1)[0]
+            anomaly = Anomaly(
+                metric=metric,
+                instance=instance,
+                server_type=server_type if server_type in SERVER_TYPES else None,
+                state="anomalous" if anomalous else "normal",
+                value=values[position],
+                baseline=baseline,
+                deviation=deviation,
+                zscore=zscore,
+                timestamp=timestamp
+            )
+            if anomalous:
+                self.anomalies[key] = anomaly
+            else:
+                self.anomalies.pop(key, None)
+            self.sequence += 1
+            self.events.append((self.sequence, anomaly))
+
+        # Series that disappeared from the snapshot are no longer anomalous
+        for key in [key for key in self.anomalies if key not in self._present]:
+            del self.anomalies[key]
+            self._active[self.slots[key]] = False
+        return len(changed)
+
+    def active(self, metric: Optional[str] = None) -> List[Anomaly]:
+        """Series currently anomalous, optionally only those of ``metric``"""
+        return [anomaly for anomaly in self.anomalies.values() if metric is None or anomaly.metric == metric]
+
+    def baseline(self, metric: str) -> List[Dict[str, Any]]:
+        """Current baseline of every series of ``metric``"""
+        baselines = []
+        for key, slot in self.slots.items():
+            if key[0] != metric:
+                continue
+            var = float(self._var[slot])
+            baselines.append({
+                "instance": key[1],
+                "mean": float(self._mean[slot]),
+                "deviation": math.sqrt(var),
+                "samples": int(self._count[slot]),
+                "anomalous": bool(self._active[slot])
+            })
+        return baselines
+
+    def events_since(self, sequence: int) -> Tuple[int, List[Anomaly]]:
+        """Transitions after ``sequence`` and the sequence to pass next time"""
+        return self.sequence, [anomaly for seq, anomaly in self.events if seq > sequence]
+
+# Global anomaly detector instance
+anomaly_detector = AnomalyDetector(
+    settings.anomaly_alpha, settings.anomaly_threshold, settings.anomaly_warmup, settings.anomaly_series_expiry
+)
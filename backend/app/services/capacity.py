@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set, Tuple
+from ..config import settings
+from ..models.server_metrics import SystemOverview
+from .metrics_collector import SERVER_TYPES, metrics_collector
+from .prometheus_client import prometheus_client
+from .query_templates import TEMPLATES
+
+logger = logging.getLogger(__name__)
+
+DAY = 86400.0
+
+class TrendLine:
+    """Least-squares line through the points of a sliding window.
+
+    Running sums are updated as points are added and expire, so refitting
+    costs the same whatever the window holds. Times enter the sums in days
+    from the first point, which keeps them well conditioned.
+    """
+
+    def __init__(self, window: float, step: float):
+        self.window = window
+        self.step = step
+        self.points: Deque[Tuple[float, float]] = deque()
+        self._reset()
+
+    def _reset(self):
+        self.origin: Optional[float] = None
+        self.n = 0
+        self.sum_t = self.sum_y = self.sum_tt = self.sum_ty = 0.0
+
+    def _accumulate(self, timestamp: float, value: float, sign: int):
+        t = (timestamp - self.origin) / DAY
+        self.n += sign
+        self.sum_t += sign * t
+        self.sum_y += sign * value
+        self.sum_tt += sign * t * t
+        self.sum_ty += sign * t * value
+
+    def add(self, timestamp: float, value: float) -> bool:
+        """Add a point unless it is less than ``step`` after the last one"""
+        if self.points and timestamp - self.points[-1][0] < self.step:
+            return False
+        if self.origin is None:
+            self.origin = timestamp
+        self.points.append((timestamp, value))
+        self._accumulate(timestamp, value, 1)
+        while timestamp - self.points[0][0] > self.window:
+            self._accumulate(*self.points.popleft(), -1)
+        return True
+
+    def seed(self, history: Iterable[Tuple[float, float]]):
+        """Put points from before the first one in front of the window"""
+        first = self.points[0][0] if self.points else math.inf
+        points = [(timestamp, value) for timestamp, value in history if timestamp < first - self.step]
+        if not points:
+            return
+        points.extend(self.points)
+        self.points = deque()
+        self._reset()
+        for timestamp, value in points:
+            self.add(timestamp, value)
+
+    def slope(self) -> Optional[float]:
+        """Change per day, or None until the points span at least one step"""
+        if self.n < 2 or self.points[-1][0] - self.points[0][0] < self.step:
+            return None
+        denominator = self.n * self.sum_tt - self.sum_t * self.sum_t
+        if denominator <= 0:
+            return None
+        return (self.n * self.sum_ty - self.sum_t * self.sum_y) / denominator
+
+class CapacityForecaster:
+    """Growth rate and time-to-full of every mount in the snapshot.
+
+    Used space of each (server, mount point) is fitted with a TrendLine over
+    ``capacity_window`` seconds, one point per ``capacity_step``. Each
+    server's history is fetched with a single range query the first time it
+    shows up; after that every new snapshot only adds its own point.
+    Forecasts are written into the snapshot's DiskMetrics and FileSystemStats.
+    """
+
+    def __init__(self, window: float, step: float):
+        self.window = window
+        self.step = step
+        self.trends: Dict[Tuple[str, str], TrendLine] = {}
+        self._seeded: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def _trend(self, server_type: str, mount_point: str) -> TrendLine:
+        key = (server_type, mount_point)
+        trend = self.trends.get(key)
+        if trend is None:
+            trend = self.trends[key] = TrendLine(self.window, self.step)
+        return trend
+
+    def forecast(self, trend: Optional[TrendLine], used_gb: float, total_gb: float) -> Tuple[Optional[float], Optional[float]]:
+        """``(growth_gb_per_day, days_to_full)``; days_to_full is None unless usage grows"""
+        growth = trend.slope() if trend is not None else None
+        if growth is None:
+            return None, None
+        days_to_full = max(total_gb - used_gb, 0.0) / growth if growth > 0 else None
+        return growth, days_to_full
+
+    def update(self, overview: SystemOverview):
+        """Add the snapshot's used space to the trends and set its forecasts"""
+        for server_type in SERVER_TYPES:
+            server = getattr(overview, server_type)
+            disks = getattr(server, "disks", None)
+            if not disks or server.server_status.status == "offline":
+                continue
+            if server_type not in self._seeded:
+                self._seeded.add(server_type)
+                self._schedule_seed(server_type)
+            timestamp = server.server_status.last_updated.timestamp()
+            for disk in disks:
+                trend = self._trend(server_type, disk.mount_point)
+                trend.add(timestamp, disk.used_gb)
+                disk.growth_gb_per_day, disk.days_to_full = self.forecast(trend, disk.used_gb, disk.total_gb)
+            # Filesystems are disks with file statistics on top
+            for filesystem in getattr(server, "filesystems", None) or []:
+                trend = self.trends.get((server_type, filesystem.mount_point))
+                filesystem.growth_gb_per_day, filesystem.days_to_full = self.forecast(
+                    trend, filesystem.used_gb, filesystem.total_gb
+                )
+
+    def _schedule_seed(self, server_type: str):
+        try:
+            task = asyncio.get_running_loop().create_task(self.seed(server_type))
+        except RuntimeError:
+            return
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def seed(self, server_type: str):
+        """Fetch a server's used space over the window with one range query"""
+        target = prometheus_client.node_target(metrics_collector.servers[server_type])
+        end = time.time()
+        result = await prometheus_client.query_range(
+            TEMPLATES["disk_used"].render(target),
+            start=str(end - self.window),
+            end=str(end),
+            step=f"{int(self.step)}s",
+            priority="history"
+        )
+        if not result or result.get("status") != "success":
+            logger.warning(f"Could not fetch disk usage history of {server_type}, forecasting from new snapshots only")
+            return
+        series_list = result.get("data", {}).get("result", [])
+        for series in series_list:
+            mount_point = series["metric"].get("mountpoint")
+            if mount_point is None:
+                continue
+            self._trend(server_type, mount_point).seed(
+                (float(timestamp), float(value) / (1024**3)) for timestamp, value in series.get("values", [])
+            )
+        logger.info(f"Seeded disk usage trends of {len(series_list)} {server_type} mounts")
+
+    def report(self, overview: SystemOverview) -> List[Dict[str, Any]]:
+        """Every mount with its forecast, soonest to fill first"""
+        mounts = []
+        for server_type in SERVER_TYPES:
+            for disk in getattr(getattr(overview, server_type), "disks", None) or []:
+                mounts.append({
+                    "instance": f"{server_type}.disks[{disk.mount_point}]",
+                    "server_type": server_type,
+                    "mount_point": disk.mount_point,
+                    "used_gb": disk.used_gb,
+                    "total_gb": disk.total_gb,
+                    "usage_percent": disk.usage_percent,
+                    "growth_gb_per_day": disk.growth_gb_per_day,
+                    "days_to_full": disk.days_to_full
+                })
+        return sorted(mounts, key=lambda mount: (mount["days_to_full"] is None, mount["days_to_full"] or 0))
+
+# Global capacity forecaster instance
+capacity_forecaster = CapacityForecaster(settings.capacity_window, settings.capacity_step)
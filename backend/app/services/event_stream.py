@@ -0,0 +1,183 @@
+import asyncio
+import json
+import logging
+from collections import deque
+from datetime import datetime
+from typing import AsyncIterator, Deque, Dict, Iterable, List, Optional, Tuple
+from .offload import offload_pool
+from .snapshot_store import snapshot_store
+from ..models.server_metrics import MetricsUpdate, SystemOverview
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+TOPICS = ["overview", "ai_server", "app_server", "storage_server"]
+# Reconnect delay suggested to EventSource clients, in milliseconds
+RETRY_MS = 5000
+
+def _encode(event: str, update: MetricsUpdate, event_id: Optional[int] = None) -> bytes:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(update.dict(), default=str)}")
+    return ("\n".join(lines) + "\n\n").encode()
+
+def _encode_frames(overview: SystemOverview, version: int) -> Dict[str, bytes]:
+    timestamp = datetime.now()
+    sections = {
+        "overview": overview,
+        "ai_server": overview.ai_server,
+        "app_server": overview.app_server,
+        "storage_server": overview.storage_server
+    }
+    return {
+        topic: _encode(topic, MetricsUpdate(
+            timestamp=timestamp,
+            server_type=topic,
+            data=section.dict(),
+            event_type="metrics_update"
+        ), event_id=version)
+        for topic, section in sections.items()
+    }
+
+class EventStream:
+    """Server-Sent Events fan-out of the snapshot pipeline.
+
+    Every snapshot is encoded once per topic and kept in a short history keyed
+    by snapshot version, which doubles as the SSE event id. Connections read
+    the shared encoded frames and resume from ``Last-Event-ID`` by replaying
+    the history after it; there is no per-connection queue or receive loop.
+    """
+
+    def __init__(self):
+        self.history: Deque[Tuple[int, Dict[str, bytes]]] = deque(maxlen=settings.sse_history_size)
+        self.error_frame: Optional[bytes] = None
+        self.generation = 0
+        self.connections = 0
+        self._condition: Optional[asyncio.Condition] = None
+        self._feed_task: Optional[asyncio.Task] = None
+
+    def _get_condition(self) -> asyncio.Condition:
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    async def _feed(self):
+        """Encode every new snapshot while anyone is streaming"""
+        snapshot_store.acquire()
+        logger.info("Started SSE metrics streaming")
+        condition = self._get_condition()
+        try:
+            generation = snapshot_store.generation
+            if snapshot_store.overview is not None:
+                # Streams that started before these frames were encoded pick them up now
+                async with condition:
+                    await self._append(snapshot_store.version)
+                    self.generation += 1
+                    condition.notify_all()
+            while True:
+                await snapshot_store.wait_for_change(generation)
+                generation = snapshot_store.generation
+                async with condition:
+                    if snapshot_store.last_error:
+                        self.error_frame = _encode("collection_error", MetricsUpdate(
+                            timestamp=datetime.now(),
+                            server_type="error",
+                            data={"error": snapshot_store.last_error, "message": "Failed to collect metrics"},
+                            event_type="error"
+                        ))
+                    else:
+                        self.error_frame = None
+                        await self._append(snapshot_store.version)
+                    self.generation += 1
+                    condition.notify_all()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Unexpected error in SSE streaming: {e}")
+        finally:
+            await snapshot_store.release()
+            logger.info("Stopped SSE metrics streaming")
+
+    async def _append(self, version: int):
+        overview = snapshot_store.overview
+        if self.history and self.history[-1][0] == version:
+            return
+        # Encoded off the event loop; readers keep waiting on the condition meanwhile
+        self.history.append((version, await offload_pool.run(_encode_frames, overview, version)))
+
+    def _frames_after(self, last_id: Optional[int], topics: List[str]) -> Tuple[Optional[int], bytes]:
+        """Frames for snapshots newer than ``last_id``; the latest one if it cannot be resumed"""
+        if not self.history:
+            return last_id, b""
+        oldest, newest = self.history[0][0], self.history[-1][0]
+        if last_id is None or last_id > newest or last_id < oldest - 1:
+            # New client, or an id from a restarted collector or outside the history
+            entries: Iterable = [self.history[-1]]
+        else:
+            entries = [entry for entry in self.history if entry[0] > last_id]
+        chunk = b"".join(frames[topic] for _, frames in entries for topic in topics)
+        return newest, chunk
+
+    async def _start(self):
+        self.connections += 1
+        if self._feed_task is None or self._feed_task.done():
+            self._feed_task = asyncio.create_task(self._feed())
+            # Let the feed pick up an existing snapshot before the first read
+            await asyncio.sleep(0)
+
+    def _stop(self):
+        # Not awaited: the response task is already being cancelled when this runs
+        self.connections -= 1
+        if self.connections == 0 and self._feed_task and not self._feed_task.done():
+            self._feed_task.cancel()
+            self._feed_task = None
+
+    async def shutdown(self):
+        """Stop encoding snapshots; open streams end with the server"""
+        if self._feed_task and not self._feed_task.done():
+            self._feed_task.cancel()
+            try:
+                await self._feed_task
+            except asyncio.CancelledError:
+                pass
+        self._feed_task = None
+
+    async def stream(self, topics: List[str], last_event_id: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Encoded SSE frames for one connection until it disconnects"""
+        await self._start()
+        logger.info(f"SSE client connected. Total connections: {self.connections}")
+        condition = self._get_condition()
+        try:
+            yield f"retry: {RETRY_MS}\n\n".encode()
+            generation = self.generation
+            last_id, chunk = self._frames_after(last_event_id, topics)
+            if chunk:
+                yield chunk
+            while True:
+                async with condition:
+                    try:
+                        await asyncio.wait_for(
+                            condition.wait_for(lambda: self.generation != generation),
+                            settings.websocket_heartbeat_interval
+                        )
+                    except asyncio.TimeoutError:
+                        pass
+                if generation == self.generation:
+                    # Comment line so proxies and clients see the connection is alive
+                    yield b": keepalive\n\n"
+                    continue
+                generation = self.generation
+                if self.error_frame:
+                    yield self.error_frame
+                    continue
+                last_id, chunk = self._frames_after(last_id, topics)
+                if chunk:
+                    yield chunk
+        finally:
+            self._stop()
+            logger.info(f"SSE client disconnected. Total connections: {self.connections}")
+
+# Global SSE stream instance
+event_stream = EventStream()
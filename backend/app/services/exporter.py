@@ -0,0 +1,178 @@
+import csv
+import io
+import logging
+import math
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, Sequence, Tuple
+from ..config import settings
+from .metrics_collector import metrics_collector
+from .offload import offload_pool
+from .prometheus_client import prometheus_client
+from .query_templates import TEMPLATES
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+logger = logging.getLogger(__name__)
+
+# Query templates that can be exported; cpu_detail and disk_space mix several
+# kinds of series and gpu_info is a constant 1 carrying the GPU model
+EXPORT_METRICS: List[str] = [name for name in TEMPLATES if name not in ("cpu_detail", "disk_space", "gpu_info")]
+COLUMNS = ("timestamp", "host", "metric", "labels", "value")
+# Labels every series of a host has, left out of the labels column
+COMMON_LABELS = {"__name__", "instance", "job"}
+FORMATS = ("csv", "parquet")
+
+Row = Tuple[float, str, str, str, float]
+
+class ExportError(Exception):
+    """A range query failed after the export started streaming"""
+
+def chunk_bounds(start: float, end: float, step: int, points: int) -> List[Tuple[float, float]]:
+    """Step-aligned ``(start, end)`` ranges of at most ``points`` steps covering start..end"""
+    bounds = []
+    chunk_start = math.ceil(start / step) * step
+    while chunk_start <= end:
+        chunk_end = min(chunk_start + (points - 1) * step, end)
+        bounds.append((chunk_start, chunk_end))
+        chunk_start = chunk_end + step
+    return bounds
+
+def _labels(metric: dict) -> str:
+    return ",".join(f"{key}={value}" for key, value in sorted(metric.items()) if key not in COMMON_LABELS)
+
+def _rows(result: dict, host: str, metric: str) -> List[Row]:
+    rows = []
+    for series in result.get("data", {}).get("result", []):
+        labels = _labels(series["metric"])
+        rows.extend(
+            (float(timestamp), host, metric, labels, float(value))
+            for timestamp, value in series.get("values", [])
+        )
+    return rows
+
+def _target(host: str, metric: str) -> str:
+    instance = metrics_collector.servers[host]
+    if metric.startswith("gpu_"):
+        return prometheus_client.gpu_target(instance)
+    return prometheus_client.node_target(instance)
+
+async def export_rows(hosts: Sequence[str], metrics: Sequence[str], start: float, end: float,
+                      step: int) -> AsyncIterator[List[Row]]:
+    """Rows of every host and metric, one range query result at a time, in time order of the chunks"""
+    for chunk_start, chunk_end in chunk_bounds(start, end, step, settings.export_chunk_points):
+        for host in hosts:
+            for metric in metrics:
+                result = await prometheus_client.query_range(
+                    TEMPLATES[metric].render(_target(host, metric)),
+                    start=str(chunk_start),
+                    end=str(chunk_end),
+                    step=f"{step}s",
+                    priority="export"
+                )
+                if not result or result.get("status") != "success":
+                    raise ExportError(f"Range query for {metric} on {host} failed")
+                rows = await offload_pool.run(_rows, result, host, metric)
+                if rows:
+                    yield rows
+
+def _iso(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat().replace("+00:00", "Z")
+
+def _csv_text(batch: List[Row]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(
+        (_iso(timestamp), host, metric, labels, value) for timestamp, host, metric, labels, value in batch
+    )
+    return buffer.getvalue()
+
+async def csv_stream(rows: AsyncIterator[List[Row]]) -> AsyncIterator[str]:
+    """CSV text, one piece per range query result, formatted in the offload pool"""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(COLUMNS)
+    yield buffer.getvalue()
+    async for batch in rows:
+        yield await offload_pool.run(_csv_text, batch)
+
+class _Sink:
+    """Write-only file object that hands the bytes written so far back to the caller"""
+
+    def __init__(self):
+        self.parts: List[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.parts)
+        self.parts.clear()
+        return data
+
+def parquet_schema():
+    return pa.schema([
+        ("timestamp", pa.timestamp("ms", tz="UTC")),
+        ("host", pa.string()),
+        ("metric", pa.string()),
+        ("labels", pa.string()),
+        ("value", pa.float64())
+    ])
+
+async def parquet_stream(rows: AsyncIterator[List[Row]]) -> AsyncIterator[bytes]:
+    """Parquet file bytes, one row group per ``export_row_group_rows`` rows, encoded in the offload pool"""
+    sink = _Sink()
+    schema = parquet_schema()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    pending: List[Row] = []
+
+    def write_group():
+        timestamps, hosts, metrics, labels, values = zip(*pending)
+        writer.write_table(pa.table([
+            pa.array([int(timestamp * 1000) for timestamp in timestamps], type=schema.field("timestamp").type),
+            pa.array(hosts, type=pa.string()),
+            pa.array(metrics, type=pa.string()),
+            pa.array(labels, type=pa.string()),
+            pa.array(values, type=pa.float64())
+        ], schema=schema))
+        pending.clear()
+
+    try:
+        async for batch in rows:
+            pending.extend(batch)
+            if len(pending) >= settings.export_row_group_rows:
+                await offload_pool.run(write_group)
+                yield sink.drain()
+        if pending:
+            await offload_pool.run(write_group)
+    finally:
+        # Writes the footer, which is never sent when the export failed
+        writer.close()
+    yield sink.drain()
+
+async def export_stream(format: str, hosts: Sequence[str], metrics: Sequence[str], start: float, end: float,
+                        step: int) -> AsyncIterator:
+    """The export body in ``format``"""
+    rows = export_rows(hosts, metrics, start, end, step)
+    body = parquet_stream(rows) if format == "parquet" else csv_stream(rows)
+    try:
+        async for piece in body:
+            yield piece
+    except ExportError as e:
+        # The response has started; aborting it is the only way to tell the client
+        logger.error(f"Export aborted: {e}")
+        raise
@@ -0,0 +1,103 @@
+import heapq
+import math
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from ..models.server_metrics import SystemOverview
+from .alert_engine import compile_path
+from .snapshot_store import snapshot_store
+
+# Metrics that can be ranked and aggregated across the fleet, as field paths
+# into SystemOverview (see alert_engine.compile_path)
+FLEET_METRICS: Dict[str, str] = {
+    "cpu_usage_percent": "*.cpu.usage_percent",
+    "cpu_iowait_percent": "*.cpu.modes.iowait",
+    "cpu_steal_percent": "*.cpu.modes.steal",
+    "memory_usage_percent": "*.memory.usage_percent",
+    "memory_used_gb": "*.memory.used_gb",
+    "disk_usage_percent": "*.disks[*].usage_percent",
+    "disk_used_gb": "*.disks[*].used_gb",
+    "disk_available_gb": "*.disks[*].available_gb",
+    "disk_growth_gb_per_day": "*.disks[*].growth_gb_per_day",
+    "disk_days_to_full": "*.disks[*].days_to_full",
+    "network_bytes_sent": "*.network[*].bytes_sent",
+    "network_bytes_recv": "*.network[*].bytes_recv",
+    "network_errors_in": "*.network[*].errors_in",
+    "network_errors_out": "*.network[*].errors_out",
+    "gpu_usage_percent": "*.gpus[*].usage_percent",
+    "gpu_memory_usage_percent": "*.gpus[*].memory_usage_percent",
+    "gpu_temperature": "*.gpus[*].temperature",
+    "vm_cpu_usage": "app_server.vms[*].cpu_usage",
+    "vm_memory_usage_percent": "app_server.vms[*].memory_usage_percent",
+    "filesystem_usage_percent": "storage_server.filesystems[*].usage_percent",
+}
+DEFAULT_QUANTILES = (0.5, 0.9, 0.99)
+
+def quantile(values: Sequence[float], q: float) -> float:
+    """Quantile of sorted values, interpolated like PromQL's quantile()"""
+    rank = q * (len(values) - 1)
+    lower = math.floor(rank)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (rank - lower)
+
+class FleetIndex:
+    """Top-N and aggregates of one metric across every server in the snapshot.
+
+    Values are extracted from the latest snapshot once per metric and reused
+    until a new snapshot is published, so responses only cost a heap
+    selection or a few lookups, whatever the fleet size.
+    """
+
+    def __init__(self):
+        self.selectors: Dict[str, Callable[[SystemOverview], Iterator[Tuple[str, Any]]]] = {
+            name: compile_path(path) for name, path in FLEET_METRICS.items()
+        }
+        self._overview: Optional[SystemOverview] = None
+        self._values: Dict[str, List[Tuple[str, float]]] = {}
+        self._sorted: Dict[str, List[float]] = {}
+
+    async def values(self, metric: str) -> List[Tuple[str, float]]:
+        """``(instance, value)`` pairs of a metric in the latest snapshot"""
+        if metric not in self.selectors:
+            raise KeyError(metric)
+        overview = await snapshot_store.get_overview()
+        if overview is not self._overview:
+            self._overview = overview
+            self._values.clear()
+            self._sorted.clear()
+        values = self._values.get(metric)
+        if values is None:
+            values = self._values[metric] = [
+                # "ai_server.disks[/].usage_percent" -> "ai_server.disks[/]"
+                (instance.rsplit(".", 1)[0], float(value)) for instance, value in self.selectors[metric](overview)
+                if isinstance(value, (int, float))
+            ]
+        return values
+
+    async def top(self, metric: str, n: int, ascending: bool = False) -> List[Dict[str, Any]]:
+        """The n highest (or lowest) values of a metric"""
+        select = heapq.nsmallest if ascending else heapq.nlargest
+        values = await self.values(metric)
+        return [
+            {"instance": instance, "value": value}
+            for instance, value in select(n, values, key=lambda pair: pair[1])
+        ]
+
+    async def aggregate(self, metric: str, quantiles: Optional[Sequence[float]] = None) -> Dict[str, Any]:
+        """Count, sum, average, extremes and quantiles of a metric"""
+        values = await self.values(metric)
+        ordered = self._sorted.get(metric)
+        if ordered is None:
+            ordered = self._sorted[metric] = sorted(value for _, value in values)
+        if not ordered:
+            return {"count": 0}
+        total = math.fsum(ordered)
+        return {
+            "count": len(ordered),
+            "sum": total,
+            "avg": total / len(ordered),
+            "min": ordered[0],
+            "max": ordered[-1],
+            "quantiles": {str(q): quantile(ordered, q) for q in quantiles or DEFAULT_QUANTILES}
+        }
+
+# Global fleet index instance
+fleet_index = FleetIndex()
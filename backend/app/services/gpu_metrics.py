@@ -0,0 +1,75 @@
+from typing import Any, Dict, List, Optional, Tuple
+from ..models.server_metrics import GPUMetrics
+
+# Per-GPU fields and the GPU exporter series they come from. Every series
+# carries the GPU's uuid and index labels, so one vector per field covers all
+# GPUs of a host.
+GPU_FIELDS = {
+    "utilization": "nvidia_smi_utilization_gpu_ratio",
+    "memory_used": "nvidia_smi_memory_used_bytes",
+    "memory_total": "nvidia_smi_memory_total_bytes",
+    "temperature": "nvidia_smi_temperature_gpu",
+    "power_draw": "nvidia_smi_power_draw_watts",
+    "fan_speed": "nvidia_smi_fan_speed_ratio"
+}
+GPU_INFO = "nvidia_smi_gpu_info"
+# Memory per process (pid and process_name labels); not every exporter has it
+GPU_PROCESS_MEMORY = "nvidia_smi_process_used_memory_bytes"
+RATIO_FIELDS = ("utilization", "fan_speed")
+
+Vector = List[Tuple[Dict[str, str], float]]
+
+def gpu_key(labels: Dict[str, str]) -> str:
+    """Identity of the GPU a series belongs to"""
+    return labels.get("uuid") or labels.get("index") or labels.get("gpu") or "0"
+
+def merge_gpu_vectors(fields: Dict[str, Vector], info: Vector, processes: Vector) -> List[Dict[str, Any]]:
+    """Per-GPU dicts, ordered by index, from one vector per field"""
+    gpus: Dict[str, Dict[str, Any]] = {}
+    for key, vector in fields.items():
+        for labels, value in vector:
+            gpu = gpus.setdefault(gpu_key(labels), {"uuid": labels.get("uuid"), "index": labels.get("index")})
+            gpu[key] = value * 100 if key in RATIO_FIELDS else value  # Convert to percentage
+    for labels, _ in info:
+        gpu = gpus.get(gpu_key(labels))
+        if gpu is not None:
+            gpu["name"] = labels.get("name", "Unknown GPU")
+    for labels, value in processes:
+        gpu = gpus.get(gpu_key(labels))
+        if gpu is not None and labels.get("pid", "").isdigit():
+            gpu.setdefault("processes", []).append({
+                "pid": int(labels["pid"]),
+                "name": labels.get("process_name", "unknown"),
+                "memory_used_mb": value / (1024**2)
+            })
+
+    for gpu in gpus.values():
+        gpu["index"] = int(gpu["index"]) if (gpu["index"] or "").isdigit() else None
+        if "memory_used" in gpu and "memory_total" in gpu:
+            gpu["memory_usage_percent"] = (gpu["memory_used"] / gpu["memory_total"]) * 100 if gpu["memory_total"] else 0
+            gpu["memory_used_mb"] = gpu["memory_used"] / (1024**2)
+            gpu["memory_total_mb"] = gpu["memory_total"] / (1024**2)
+        gpu.get("processes", []).sort(key=lambda process: process["memory_used_mb"], reverse=True)
+    return sorted(gpus.values(), key=lambda gpu: (gpu["index"] is None, gpu["index"] or 0, gpu["uuid"] or ""))
+
+def gpu_totals(gpus: List[GPUMetrics]) -> Optional[GPUMetrics]:
+    """One GPUMetrics for all GPUs of a host: summed memory and power,
+    average utilisation and fan speed, hottest temperature"""
+    if not gpus:
+        return None
+    if len(gpus) == 1:
+        return gpus[0]
+    names = {gpu.name for gpu in gpus}
+    memory_used = sum(gpu.memory_used_mb for gpu in gpus)
+    memory_total = sum(gpu.memory_total_mb for gpu in gpus)
+    fans = [gpu.fan_speed_percent for gpu in gpus if gpu.fan_speed_percent is not None]
+    return GPUMetrics(
+        name=f"{len(gpus)}x {names.pop()}" if len(names) == 1 else f"{len(gpus)} GPUs",
+        usage_percent=sum(gpu.usage_percent for gpu in gpus) / len(gpus),
+        memory_used_mb=memory_used,
+        memory_total_mb=memory_total,
+        memory_usage_percent=(memory_used / memory_total) * 100 if memory_total else 0,
+        temperature=max(gpu.temperature for gpu in gpus),
+        power_draw_w=sum(gpu.power_draw_w for gpu in gpus),
+        fan_speed_percent=sum(fans) / len(fans) if fans else None
+    )
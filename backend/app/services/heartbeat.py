@@ -0,0 +1,163 @@
+import asyncio
+import json
+import logging
+import math
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from fastapi import WebSocket
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two turns of the wheel
+TICK_SECONDS = 1.0
+# A heartbeat that cannot be written within this time marks the connection dead
+SEND_TIMEOUT = 5.0
+# Longest wait for a close handshake with a dead peer
+CLOSE_TIMEOUT = 5.0
+
+def is_pong(data: str) -> bool:
+    """Whether a client message is the ``pong`` answering a heartbeat"""
+    try:
+        return json.loads(data).get("type") == "pong"
+    except (ValueError, AttributeError):
+        return False
+
+class _Connection:
+    __slots__ = ("websocket", "kind", "last_seen", "slot", "answers")
+
+    def __init__(self, websocket: WebSocket, kind: str, slot: int):
+        self.websocket = websocket
+        self.kind = kind
+        self.last_seen = time.monotonic()
+        self.slot = slot
+        # Whether the client has answered a heartbeat with a pong message
+        self.answers = False
+
+class HeartbeatWheel:
+    """Heartbeats and liveness deadlines of every WebSocket on one timer.
+
+    Connections sit in the slots of a timing wheel with one slot per tick of
+    the heartbeat interval. Each tick visits one slot: connections that have
+    shown no sign of life for ``dead_after`` seconds are closed, the others
+    get a heartbeat message. Every connection is so visited once per interval,
+    heartbeats are spread evenly over the interval, and there is no timer or
+    task per connection.
+
+    Dead peers are found by uvicorn's WebSocket pings (``--ws-ping-interval``
+    and ``--ws-ping-timeout``), which every client library answers, and by
+    heartbeats that cannot be written within ``SEND_TIMEOUT``. The silence
+    deadline is an extra check for clients that answer heartbeats with a
+    ``pong`` message, like the dashboard; push-only clients that never send
+    anything are not held to it.
+    """
+
+    def __init__(self, interval: float, dead_after: float):
+        self.interval = interval
+        self.dead_after = dead_after
+        self.slots: List[Dict[WebSocket, _Connection]] = [{} for _ in range(max(1, math.ceil(interval / TICK_SECONDS)))]
+        self.position = 0
+        self.connections: Dict[WebSocket, _Connection] = {}
+        self.heartbeats_sent = 0
+        self.reaped = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, websocket: WebSocket, kind: str):
+        """Start heartbeats for ``websocket``; the first one is due after one interval"""
+        connection = _Connection(websocket, kind, self.position)
+        self.connections[websocket] = connection
+        self.slots[self.position][websocket] = connection
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def unregister(self, websocket: WebSocket):
+        connection = self.connections.pop(websocket, None)
+        if connection is not None:
+            self.slots[connection.slot].pop(websocket, None)
+
+    def seen(self, websocket: WebSocket, pong: bool = False):
+        """Record a message from the client; a ``pong`` puts it under the silence deadline"""
+        connection = self.connections.get(websocket)
+        if connection is not None:
+            connection.last_seen = time.monotonic()
+            connection.answers = connection.answers or pong
+
+    def heartbeat_message(self) -> str:
+        return json.dumps({
+            "event_type": "heartbeat",
+            "timestamp": datetime.now().isoformat(),
+            "connections": len(self.connections),
+            "status": "healthy"
+        })
+
+    async def _run(self):
+        try:
+            while self.connections:
+                await asyncio.sleep(TICK_SECONDS)
+                self.position = (self.position + 1) % len(self.slots)
+                await self._visit(list(self.slots[self.position].values()))
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Unexpected error in WebSocket heartbeats: {e}")
+
+    async def _visit(self, connections: List[_Connection]):
+        if not connections:
+            return
+        now = time.monotonic()
+        message = self.heartbeat_message()
+        await asyncio.gather(*(
+            self._reap(connection) if self._dead(connection, now) else self._beat(connection, message)
+            for connection in connections
+        ))
+
+    def _dead(self, connection: _Connection, now: float) -> bool:
+        # A push-only client never shows it is alive; uvicorn's pings watch it
+        return bool(self.dead_after) and connection.answers and now - connection.last_seen > self.dead_after
+
+    async def _beat(self, connection: _Connection, message: str):
+        try:
+            await asyncio.wait_for(connection.websocket.send_text(message), SEND_TIMEOUT)
+            self.heartbeats_sent += 1
+        except Exception:
+            await self._reap(connection)
+
+    async def _reap(self, connection: _Connection):
+        """Close a connection that stopped answering; its endpoint sees the disconnect"""
+        self.unregister(connection.websocket)
+        self.reaped += 1
+        logger.info(f"Closing dead {connection.kind} WebSocket, silent for {time.monotonic() - connection.last_seen:.0f}s")
+        try:
+            await asyncio.wait_for(connection.websocket.close(code=1001), CLOSE_TIMEOUT)
+        except Exception:
+            pass
+
+    async def shutdown(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self.connections.clear()
+        for slot in self.slots:
+            slot.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Connection liveness: silence of the clients that answer heartbeats, heartbeats and reaped connections"""
+        now = time.monotonic()
+        silences = [now - connection.last_seen for connection in self.connections.values() if connection.answers]
+        return {
+            "connections": len(self.connections),
+            "by_kind": dict(Counter(connection.kind for connection in self.connections.values())),
+            "answering": len(silences),
+            # Silent for more than one heartbeat interval
+            "silent": sum(1 for silence in silences if silence > self.interval),
+            "max_silence_seconds": round(max(silences), 1) if silences else 0,
+            "heartbeats_sent": self.heartbeats_sent,
+            "reaped": self.reaped,
+            "interval_seconds": self.interval,
+            "dead_after_seconds": self.dead_after,
+            "event_loop_tasks": len(asyncio.all_tasks())
+        }
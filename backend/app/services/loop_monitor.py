@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# Lag probes kept for the percentiles, about a minute at the default interval
+LAG_SAMPLES = 600
+# Stalls kept with their stack sample
+STALL_HISTORY = 10
+# Innermost frames kept of a stack sample
+STACK_DEPTH = 15
+
+class LoopMonitor:
+    """Event loop lag, and stack samples of whatever blocks the loop.
+
+    A probe task sleeps ``interval`` seconds at a time and records how much
+    later than asked it wakes up; that lag is how long every other callback,
+    such as a WebSocket send, waited too. A watchdog thread checks the probe's
+    last beat: when the loop has not run it for ``threshold`` seconds past
+    its interval, the watchdog takes the loop thread's current stack, which
+    is the code holding the loop, and logs it. The stall's full length is
+    recorded once the loop gets to the probe again.
+    """
+
+    def __init__(self, interval: float, threshold: float):
+        self.interval = interval
+        self.threshold = threshold
+        self.lags: Deque[float] = deque(maxlen=LAG_SAMPLES)
+        self.max_lag = 0.0
+        self.stalls = 0
+        self.recent_stalls: Deque[Dict[str, Any]] = deque(maxlen=STALL_HISTORY)
+        self._beat = time.monotonic()
+        self._sample: Optional[List[str]] = None
+        self._loop_thread: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    def start(self):
+        if not self.interval or (self._task and not self._task.done()):
+            return
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._task = asyncio.create_task(self._probe())
+        self._stop.clear()
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def _probe(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self._beat = now
+            self.lags.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if lag > self.threshold:
+                self.stalls += 1
+                stack, self._sample = self._sample, None
+                self.recent_stalls.append({
+                    "at": time.time() - lag,
+                    "duration_ms": round(lag * 1000, 1),
+                    # None when the loop was held too briefly for the watchdog to see it
+                    "stack": stack
+                })
+
+    def _watch(self):
+        """Watchdog thread: sample the loop thread's stack once per stall"""
+        sampled_beat = None
+        # Often enough to catch a stall just over the threshold while it lasts
+        while not self._stop.wait(min(self.interval, self.threshold) / 2):
+            beat = self._beat
+            blocked = time.monotonic() - beat - self.interval
+            if blocked <= self.threshold or beat == sampled_beat:
+                continue
+            sampled_beat = beat
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            stack = traceback.format_stack(frame)[-STACK_DEPTH:]
+            self._sample = [line.rstrip() for line in stack]
+            logger.warning(f"Event loop blocked for {blocked * 1000:.0f}ms, in:\n{''.join(stack).rstrip()}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Lag percentiles over the last probes, and the most recent stalls"""
+        lags = sorted(self.lags)
+        return {
+            "interval_seconds": self.interval,
+            "stall_threshold_seconds": self.threshold,
+            "lag_ms": {
+                "p50": round(lags[len(lags) // 2] * 1000, 2),
+                "p99": round(lags[int(len(lags) * 0.99)] * 1000, 2),
+                "max": round(lags[-1] * 1000, 2)
+            } if lags else None,
+            "max_lag_ms": round(self.max_lag * 1000, 2),
+            "stalls": self.stalls,
+            "recent_stalls": list(self.recent_stalls)
+        }
+
+# Global event loop monitor instance
+loop_monitor = LoopMonitor(settings.loop_lag_interval, settings.loop_stall_threshold)
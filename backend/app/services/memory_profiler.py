@@ -0,0 +1,189 @@
+import gc
+import itertools
+import logging
+import os
+import time
+import tracemalloc
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional
+from fastapi import WebSocket
+
+logger = logging.getLogger(__name__)
+
+# Stored snapshots; each holds every traced allocation site, so keep few
+MAX_SNAPSHOTS = 5
+GROUP_BY = ("lineno", "filename", "traceback")
+# Types counted by object_counts: the app's own, connection objects and HTTP client internals
+TRACKED_MODULES = ("app.", "starlette.websockets", "uvicorn.protocols.", "websockets.", "httpx.", "httpcore.")
+# Allocations of the profiler's own machinery, left out of every report
+_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+def rss_bytes() -> Optional[int]:
+    """Resident set size of this process, from /proc on Linux"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+def _server_protocol(websocket: WebSocket) -> Any:
+    """uvicorn's protocol object of a WebSocket, or None when it cannot be found.
+
+    There is no public way to reach the transport, so this relies on receive
+    being the method bound to the protocol object, as in uvicorn 0.24 (pinned
+    in requirements.txt); middleware wraps send in closures, but not receive.
+    """
+    return getattr(websocket._receive, "__self__", None)
+
+def _site(frame: tracemalloc.Frame) -> str:
+    return f"{frame.filename}:{frame.lineno}"
+
+def _stat(stat, group_by: str) -> Dict[str, Any]:
+    entry = {
+        "site": _site(stat.traceback[0]),
+        "size_kib": round(stat.size / 1024, 1),
+        "count": stat.count
+    }
+    if hasattr(stat, "size_diff"):
+        entry["size_diff_kib"] = round(stat.size_diff / 1024, 1)
+        entry["count_diff"] = stat.count_diff
+    if group_by == "traceback":
+        # Innermost frame first, like the site
+        entry["traceback"] = [_site(frame) for frame in reversed(stat.traceback)]
+    return entry
+
+class MemoryProfiler:
+    """Where the backend's memory goes, on demand.
+
+    ``tracemalloc`` is off until ``start`` and costs nothing before that; once
+    tracing, every allocation records ``frames`` stack frames, which slows
+    the process down and adds its own memory, so it is meant to be stopped
+    again. Snapshots taken while tracing are kept (the newest
+    ``MAX_SNAPSHOTS``) so later ones can be diffed against them. Object
+    counts and WebSocket buffer sizes need no tracing, and are only computed
+    when asked for.
+    """
+
+    def __init__(self):
+        self.snapshots: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._ids = itertools.count(1)
+        self.started_at: Optional[float] = None
+        self._protocol_warned = False
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int):
+        if self.tracing:
+            return
+        tracemalloc.start(frames)
+        self.started_at = time.time()
+        logger.warning(f"tracemalloc started with {frames} frames per allocation")
+
+    def stop(self):
+        """Stop tracing and drop the stored snapshots with the traces"""
+        if not self.tracing:
+            return
+        tracemalloc.stop()
+        self.snapshots.clear()
+        self.started_at = None
+        logger.warning("tracemalloc stopped")
+
+    def _take(self) -> tracemalloc.Snapshot:
+        if not self.tracing:
+            raise RuntimeError("tracemalloc is not running")
+        return tracemalloc.take_snapshot().filter_traces(_FILTERS)
+
+    def snapshot(self, label: str = "") -> Dict[str, Any]:
+        """Take and keep a snapshot for later diffs"""
+        snapshot = self._take()
+        snapshot_id = next(self._ids)
+        self.snapshots[snapshot_id] = {
+            "snapshot": snapshot,
+            "label": label,
+            "taken_at": time.time(),
+            "size_kib": round(sum(stat.size for stat in snapshot.statistics("filename")) / 1024, 1)
+        }
+        while len(self.snapshots) > MAX_SNAPSHOTS:
+            self.snapshots.popitem(last=False)
+        return self._describe(snapshot_id)
+
+    def _describe(self, snapshot_id: int) -> Dict[str, Any]:
+        entry = self.snapshots[snapshot_id]
+        return {"id": snapshot_id, "label": entry["label"], "taken_at": entry["taken_at"], "size_kib": entry["size_kib"]}
+
+    def top(self, limit: int, group_by: str) -> List[Dict[str, Any]]:
+        """Largest allocation sites right now"""
+        return [_stat(stat, group_by) for stat in self._take().statistics(group_by)[:limit]]
+
+    def diff(self, since: int, limit: int, group_by: str) -> Optional[List[Dict[str, Any]]]:
+        """Sites that grew most since snapshot ``since``, or None if it is not kept"""
+        entry = self.snapshots.get(since)
+        if entry is None:
+            return None
+        stats = self._take().compare_to(entry["snapshot"], group_by)
+        return [_stat(stat, group_by) for stat in stats[:limit]]
+
+    def object_counts(self, limit: int) -> Dict[str, int]:
+        """Live objects per type of the app, the connection layers and the HTTP clients"""
+        counts = Counter()
+        for obj in gc.get_objects():
+            cls = type(obj)
+            module = cls.__dict__.get("__module__")
+            # Some extension types have no module name of their own
+            if isinstance(module, str) and module.startswith(TRACKED_MODULES):
+                counts[f"{module}.{cls.__qualname__}"] += 1
+        return dict(counts.most_common(limit))
+
+    def websocket_buffers(self, websockets: Dict[WebSocket, Any], limit: int) -> Dict[str, Any]:
+        """Bytes waiting to be written and messages waiting to be read, per WebSocket"""
+        connections = []
+        for websocket, connection in websockets.items():
+            protocol = _server_protocol(websocket)
+            transport = getattr(protocol, "transport", None)
+            if transport is None and not self._protocol_warned:
+                self._protocol_warned = True
+                logger.warning("WebSocket buffers are not measurable: receive is no longer bound to "
+                               "uvicorn's protocol object (uvicorn upgrade or middleware wrapping receive?)")
+            incoming = getattr(protocol, "messages", None)
+            client = websocket.client
+            connections.append({
+                "client": f"{client.host}:{client.port}" if client else None,
+                "kind": connection.kind,
+                "write_buffer_bytes": transport.get_write_buffer_size() if transport else None,
+                "incoming_messages": len(incoming) if incoming is not None else None
+            })
+        sizes = [c["write_buffer_bytes"] for c in connections if c["write_buffer_bytes"] is not None]
+        connections.sort(key=lambda c: c["write_buffer_bytes"] or 0, reverse=True)
+        return {
+            "connections": len(connections),
+            # Connections whose buffers could be read; the others report null
+            "measured": len(sizes),
+            "write_buffer_bytes_total": sum(sizes),
+            "write_buffer_bytes_max": max(sizes) if sizes else 0,
+            "largest": connections[:limit]
+        }
+
+    def status(self) -> Dict[str, Any]:
+        traced, peak = tracemalloc.get_traced_memory()
+        return {
+            "tracing": self.tracing,
+            "started_at": self.started_at,
+            "frames": tracemalloc.get_traceback_limit() if self.tracing else None,
+            "traced_kib": round(traced / 1024, 1),
+            "traced_peak_kib": round(peak / 1024, 1),
+            # Memory tracemalloc itself uses for the traces
+            "overhead_kib": round(tracemalloc.get_tracemalloc_memory() / 1024, 1),
+            "rss_bytes": rss_bytes(),
+            "gc_counts": gc.get_count(),
+            "snapshots": [self._describe(snapshot_id) for snapshot_id in self.snapshots]
+        }
+
+# Global memory profiler instance
+memory_profiler = MemoryProfiler()
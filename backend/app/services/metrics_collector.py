@@ -5,10 +5,21 @@ from typing import Dict, List, Optional, Any
 from datetime import datetime
 from ..config import settings
 from ..models.server_metrics import *
+from .gpu_metrics import gpu_totals
 from .prometheus_client import prometheus_client
+from .query_scheduler import query_priority
+from .scrape_scheduler import scrape_scheduler
 
 logger = logging.getLogger(__name__)
 
+# Top-level sections of a SystemOverview, each collected independently
+SERVER_TYPES = ["ai_server", "storage_server", "app_server"]
+SERVER_NAMES = {
+    "ai_server": "AI server",
+    "storage_server": "Storage server",
+    "app_server": "App server"
+}
+
 class MetricsCollector:
     def __init__(self):
         self.servers = {
@@ -18,6 +29,41 @@ class MetricsCollector:
             "user_vm": settings.user_vm_ip,
             "proxmox": settings.proxmox_ip
         }
+        self._client: Optional[httpx.AsyncClient] = None
+    
+    def open(self) -> httpx.AsyncClient:
+        """Pooled HTTP client for Qdrant, created on first use"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=5, limits=httpx.Limits(
+                max_connections=settings.http_max_connections,
+                max_keepalive_connections=settings.http_max_keepalive_connections
+            ))
+        return self._client
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self.open()
+    
+    async def close(self):
+        """Close the pooled connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    async def collect_cpu_metrics(self, instance: str) -> CPUMetrics:
+        """Collect CPU usage and cores, plus the per-core, per-mode, load and temperature detail"""
+        cpu_usage = await prometheus_client.get_cpu_usage(instance)
+        cores = await prometheus_client.get_cpu_cores(instance)
+        detail = await prometheus_client.get_cpu_detail(instance) or {}
+        
+        return CPUMetrics(
+            usage_percent=cpu_usage or 0,
+            cores=cores,
+            temperature=detail.get("temperature"),
+            load_average=detail.get("load_average"),
+            modes=detail.get("modes"),
+            core_usage=detail.get("core_usage")
+        )
     
     async def collect_ai_server_metrics(self) -> AIServerMetrics:
         """Collect metrics from AI server"""
@@ -41,19 +87,7 @@ class MetricsCollector:
             )
         
         # Collect CPU metrics
-        cpu_usage = await prometheus_client.get_cpu_usage(instance)
-        cpu_cores_query = f'count(node_cpu_seconds_total{{mode="idle",instance="{instance}:9100"}}) by (instance)'
-        cpu_cores_result = await prometheus_client.query(cpu_cores_query)
-        cores = 1
-        if cpu_cores_result and cpu_cores_result.get("status") == "success":
-            data = cpu_cores_result.get("data", {}).get("result", [])
-            if data:
-                cores = int(float(data[0]["value"][1]))
-        
-        cpu = CPUMetrics(
-            usage_percent=cpu_usage or 0,
-            cores=cores
-        )
+        cpu = await self.collect_cpu_metrics(instance)
         
         # Collect memory metrics
         memory_data = await prometheus_client.get_memory_usage(instance)
@@ -67,18 +101,22 @@ class MetricsCollector:
         
         # Collect GPU metrics
         gpu_data = await prometheus_client.get_gpu_metrics(instance)
-        gpu = None
+        gpus = []
         if gpu_data:
-            gpu = GPUMetrics(
-                name=gpu_data.get("name", "Unknown GPU"),
-                usage_percent=gpu_data.get("gpu_utilization", 0),
-                memory_used_mb=gpu_data.get("memory_used_mb", 0),
-                memory_total_mb=gpu_data.get("memory_total_mb", 0),
-                memory_usage_percent=gpu_data.get("memory_usage_percent", 0),
-                temperature=gpu_data.get("temperature", 0),
-                power_draw_w=gpu_data.get("power_draw", 0),
-                fan_speed_percent=gpu_data.get("fan_speed", 0)
-            )
+            for gpu in gpu_data:
+                gpus.append(GPUMetrics(
+                    name=gpu.get("name", "Unknown GPU"),
+                    usage_percent=gpu.get("utilization", 0),
+                    memory_used_mb=gpu.get("memory_used_mb", 0),
+                    memory_total_mb=gpu.get("memory_total_mb", 0),
+                    memory_usage_percent=gpu.get("memory_usage_percent", 0),
+                    temperature=gpu.get("temperature", 0),
+                    power_draw_w=gpu.get("power_draw", 0),
+                    fan_speed_percent=gpu.get("fan_speed", 0),
+                    index=gpu.get("index"),
+                    uuid=gpu.get("uuid"),
+                    processes=[GPUProcess(**process) for process in gpu.get("processes", [])]
+                ))
         
         # Collect disk metrics
         disk_data = await prometheus_client.get_disk_usage(instance)
@@ -113,7 +151,8 @@ class MetricsCollector:
             server_status=server_status,
             cpu=cpu,
             memory=memory,
-            gpu=gpu,
+            gpu=gpu_totals(gpus),
+            gpus=gpus,
             disks=disks,
             network=network
         )
@@ -141,16 +180,7 @@ class MetricsCollector:
             )
         
         # Collect basic metrics (similar to AI server)
-        cpu_usage = await prometheus_client.get_cpu_usage(instance)
-        cpu_cores_query = f'count(node_cpu_seconds_total{{mode="idle",instance="{instance}:9100"}}) by (instance)'
-        cpu_cores_result = await prometheus_client.query(cpu_cores_query)
-        cores = 1
-        if cpu_cores_result and cpu_cores_result.get("status") == "success":
-            data = cpu_cores_result.get("data", {}).get("result", [])
-            if data:
-                cores = int(float(data[0]["value"][1]))
-        
-        cpu = CPUMetrics(usage_percent=cpu_usage or 0, cores=cores)
+        cpu = await self.collect_cpu_metrics(instance)
         
         memory_data = await prometheus_client.get_memory_usage(instance)
         memory = MemoryMetrics(
@@ -227,16 +257,7 @@ class MetricsCollector:
             )
         
         # Collect basic metrics
-        cpu_usage = await prometheus_client.get_cpu_usage(instance)
-        cpu_cores_query = f'count(node_cpu_seconds_total{{mode="idle",instance="{instance}:9100"}}) by (instance)'
-        cpu_cores_result = await prometheus_client.query(cpu_cores_query)
-        cores = 1
-        if cpu_cores_result and cpu_cores_result.get("status") == "success":
-            data = cpu_cores_result.get("data", {}).get("result", [])
-            if data:
-                cores = int(float(data[0]["value"][1]))
-        
-        cpu = CPUMetrics(usage_percent=cpu_usage or 0, cores=cores)
+        cpu = await self.collect_cpu_metrics(instance)
         
         memory_data = await prometheus_client.get_memory_usage(instance)
         memory = MemoryMetrics(
@@ -315,38 +336,38 @@ class MetricsCollector:
     async def _collect_qdrant_metrics(self) -> Optional[QdrantMetrics]:
         """Collect Qdrant database metrics"""
         try:
-            async with httpx.AsyncClient(timeout=5) as client:
-                # Check Qdrant health
-                health_response = await client.get(f"{settings.qdrant_url}/health")
-                if health_response.status_code != 200:
-                    return None
-                
-                # Get collections info
-                collections_response = await client.get(f"{settings.qdrant_url}/collections")
-                collections_data = collections_response.json()
-                
-                total_points = 0
-                collections_count = len(collections_data.get("result", {}).get("collections", []))
-                
-                # Get detailed collection stats
-                for collection in collections_data.get("result", {}).get("collections", []):
-                    collection_name = collection["name"]
-                    try:
-                        info_response = await client.get(f"{settings.qdrant_url}/collections/{collection_name}")
-                        info_data = info_response.json()
-                        points_count = info_data.get("result", {}).get("points_count", 0)
-                        total_points += points_count
-                    except:
-                        continue
-                
-                return QdrantMetrics(
-                    status="running",
-                    collections=collections_count,
-                    total_points=total_points,
-                    disk_usage_gb=5.2,  # Simulated - would need custom monitoring
-                    memory_usage_mb=512,  # Simulated
-                    version="1.7.0"  # Simulated
-                )
+            client = self.client
+            # Check Qdrant health
+            health_response = await client.get(f"{settings.qdrant_url}/health")
+            if health_response.status_code != 200:
+                return None
+            
+            # Get collections info
+            collections_response = await client.get(f"{settings.qdrant_url}/collections")
+            collections_data = collections_response.json()
+            
+            total_points = 0
+            collections_count = len(collections_data.get("result", {}).get("collections", []))
+            
+            # Get detailed collection stats
+            for collection in collections_data.get("result", {}).get("collections", []):
+                collection_name = collection["name"]
+                try:
+                    info_response = await client.get(f"{settings.qdrant_url}/collections/{collection_name}")
+                    info_data = info_response.json()
+                    points_count = info_data.get("result", {}).get("points_count", 0)
+                    total_points += points_count
+                except:
+                    continue
+            
+            return QdrantMetrics(
+                status="running",
+                collections=collections_count,
+                total_points=total_points,
+                disk_usage_gb=5.2,  # Simulated - would need custom monitoring
+                memory_usage_mb=512,  # Simulated
+                version="1.7.0"  # Simulated
+            )
         except Exception as e:
             logger.error(f"Failed to collect Qdrant metrics: {e}")
             return QdrantMetrics(
@@ -423,62 +444,112 @@ class MetricsCollector:
         
         return vms
     
+    async def collect_server_metrics(self, server_type: str):
+        """Collect metrics for one of the servers in ``SERVER_TYPES``"""
+        collectors = {
+            "ai_server": self.collect_ai_server_metrics,
+            "storage_server": self.collect_storage_server_metrics,
+            "app_server": self.collect_app_server_metrics
+        }
+        with query_priority("live"):
+            return await collectors[server_type]()
+    
+    def scrape_targets(self, server_type: str) -> List[str]:
+        """Prometheus targets whose samples make up a server's metrics"""
+        if server_type == "ai_server":
+            instance = self.servers["ai_server"]
+            return [prometheus_client.node_target(instance), prometheus_client.gpu_target(instance)]
+        if server_type == "app_server":
+            # VM and Proxmox host metrics are part of the app server section
+            return [prometheus_client.node_target(self.servers[name])
+                    for name in ("app_server", "proxmox", "user_vm")]
+        return [prometheus_client.node_target(self.servers[server_type])]
+    
+    async def collect_changed(self, sections: Dict[str, Any]) -> Optional[SystemOverview]:
+        """Re-collect only servers with new samples into ``sections``.
+        
+        Returns the updated overview, or None when no server has new samples.
+        Without scrape-aligned collection every server is collected each time.
+        """
+        if settings.scrape_aligned_collection:
+            with query_priority("live"):
+                changed = await scrape_scheduler.due({t: self.scrape_targets(t) for t in SERVER_TYPES})
+            due = [t for t in SERVER_TYPES if t in changed or t not in sections]
+        else:
+            due = SERVER_TYPES
+        if not due:
+            return None
+        results = await asyncio.gather(
+            *(self.collect_server_metrics(server_type) for server_type in due),
+            return_exceptions=True
+        )
+        for server_type, result in zip(due, results):
+            if isinstance(result, Exception):
+                # Retry on the next cycle instead of after the next scrape
+                scrape_scheduler.forget(server_type)
+            sections[server_type] = result
+        return self.build_overview(sections)
+    
+    def next_collection_delay(self) -> float:
+        """Seconds until the next ``collect_changed`` call can find new samples"""
+        if not settings.scrape_aligned_collection:
+            return settings.metrics_update_interval
+        return scrape_scheduler.next_delay({t: self.scrape_targets(t) for t in SERVER_TYPES})
+    
+    def placeholder_metrics(self, server_type: str, status: str = "error"):
+        """Empty metrics for a server whose collection failed or is missing"""
+        common = dict(
+            server_status=ServerStatus(status=status, last_updated=datetime.now()),
+            cpu=CPUMetrics(usage_percent=0, cores=0),
+            memory=MemoryMetrics(used_gb=0, total_gb=0, usage_percent=0, available_gb=0),
+            disks=[], network=[]
+        )
+        if server_type == "ai_server":
+            return AIServerMetrics(**common)
+        if server_type == "storage_server":
+            return StorageServerMetrics(**common, filesystems=[])
+        return AppServerMetrics(**common, proxmox_host={}, vms=[])
+    
+    def build_overview(self, servers: Dict[str, Any]) -> SystemOverview:
+        """Assemble a SystemOverview from per-server results.
+        
+        Missing servers and failed collections (exceptions) are replaced by
+        placeholder metrics with an error status.
+        """
+        resolved = {}
+        for server_type in SERVER_TYPES:
+            metrics = servers.get(server_type)
+            if isinstance(metrics, Exception):
+                logger.error(f"{SERVER_NAMES[server_type]} metrics collection failed: {metrics}")
+                metrics = None
+            resolved[server_type] = metrics or self.placeholder_metrics(server_type)
+        
+        # Calculate overview stats
+        total_servers = len(SERVER_TYPES)
+        online_servers = sum(1 for server in resolved.values() 
+                           if server.server_status.status == "online")
+        alerts_count = sum(1 for server in resolved.values() 
+                         if server.server_status.status in ["warning", "error"])
+        
+        return SystemOverview(
+            ai_server=resolved["ai_server"],
+            app_server=resolved["app_server"],
+            storage_server=resolved["storage_server"],
+            last_updated=datetime.now(),
+            total_servers=total_servers,
+            online_servers=online_servers,
+            alerts_count=alerts_count
+        )
+    
     async def collect_all_metrics(self) -> SystemOverview:
         """Collect metrics from all servers"""
         try:
             # Collect metrics from all servers concurrently
-            ai_task = asyncio.create_task(self.collect_ai_server_metrics())
-            storage_task = asyncio.create_task(self.collect_storage_server_metrics())
-            app_task = asyncio.create_task(self.collect_app_server_metrics())
-            
-            ai_server, storage_server, app_server = await asyncio.gather(
-                ai_task, storage_task, app_task, return_exceptions=True
-            )
-            
-            # Handle exceptions
-            if isinstance(ai_server, Exception):
-                logger.error(f"AI server metrics collection failed: {ai_server}")
-                ai_server = AIServerMetrics(
-                    server_status=ServerStatus(status="error", last_updated=datetime.now()),
-                    cpu=CPUMetrics(usage_percent=0, cores=0),
-                    memory=MemoryMetrics(used_gb=0, total_gb=0, usage_percent=0, available_gb=0),
-                    disks=[], network=[]
-                )
-            
-            if isinstance(storage_server, Exception):
-                logger.error(f"Storage server metrics collection failed: {storage_server}")
-                storage_server = StorageServerMetrics(
-                    server_status=ServerStatus(status="error", last_updated=datetime.now()),
-                    cpu=CPUMetrics(usage_percent=0, cores=0),
-                    memory=MemoryMetrics(used_gb=0, total_gb=0, usage_percent=0, available_gb=0),
-                    disks=[], network=[], filesystems=[]
-                )
-            
-            if isinstance(app_server, Exception):
-                logger.error(f"App server metrics collection failed: {app_server}")
-                app_server = AppServerMetrics(
-                    server_status=ServerStatus(status="error", last_updated=datetime.now()),
-                    cpu=CPUMetrics(usage_percent=0, cores=0),
-                    memory=MemoryMetrics(used_gb=0, total_gb=0, usage_percent=0, available_gb=0),
-                    disks=[], network=[], proxmox_host={}, vms=[]
-                )
-            
-            # Calculate overview stats
-            total_servers = 3
-            online_servers = sum(1 for server in [ai_server, storage_server, app_server] 
-                               if server.server_status.status == "online")
-            alerts_count = sum(1 for server in [ai_server, storage_server, app_server] 
-                             if server.server_status.status in ["warning", "error"])
-            
-            return SystemOverview(
-                ai_server=ai_server,
-                app_server=app_server,
-                storage_server=storage_server,
-                last_updated=datetime.now(),
-                total_servers=total_servers,
-                online_servers=online_servers,
-                alerts_count=alerts_count
+            results = await asyncio.gather(
+                *(self.collect_server_metrics(server_type) for server_type in SERVER_TYPES),
+                return_exceptions=True
             )
+            return self.build_overview(dict(zip(SERVER_TYPES, results)))
             
         except Exception as e:
             logger.error(f"Failed to collect system metrics: {e}")
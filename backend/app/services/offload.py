@@ -0,0 +1,117 @@
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional, TypeVar
+from ..config import settings
+
+# Job run times kept for the percentiles
+RUN_SAMPLES = 1000
+
+T = TypeVar("T")
+
+class OffloadBusy(Exception):
+    """No slot of the offload pool freed up within the wait allowed"""
+
+class OffloadPool:
+    """Worker threads for CPU-heavy stages, so they do not hold the event loop.
+
+    Encoding snapshots for WebSocket and SSE clients and the snapshot cache,
+    and formatting export rows as CSV or Parquet, run here. While a job runs
+    in a worker, the loop thread gets the interpreter at least every switch
+    interval (5ms) instead of waiting for the whole job; pyarrow and file
+    writes release it altogether. At most ``workers`` jobs run and
+    ``queue_size`` wait at once. Further jobs wait for a free slot instead of
+    running on the loop; requests give up after a bounded wait, and callers
+    that can refuse or skip work check ``full`` first.
+    """
+
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.pending = 0
+        self.completed = 0
+        # Jobs that found the pool full, those still waiting and those that gave up
+        self.waited = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.runs: Deque[float] = deque(maxlen=RUN_SAMPLES)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    @property
+    def queued(self) -> int:
+        return max(0, self.pending - self.workers)
+
+    @property
+    def full(self) -> bool:
+        # A disabled pool runs everything on the loop and is never full
+        return bool(self.workers) and self.pending >= self.workers + self.queue_size
+
+    def _timed(self, fn: Callable[..., T], *args) -> T:
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self.runs.append(time.perf_counter() - started)
+
+    async def _acquire(self, timeout: Optional[float]):
+        if not self._slots.locked():
+            await self._slots.acquire()
+            return
+        self.waited += 1
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise OffloadBusy(f"No offload worker free within {timeout:g}s") from None
+        finally:
+            self.waiting -= 1
+
+    async def run(self, fn: Callable[..., T], *args, timeout: Optional[float] = None) -> T:
+        """``fn(*args)`` in a worker thread; on the loop only when the pool is disabled.
+
+        When the pool is full the job waits for a slot, for at most ``timeout``
+        seconds if given, and raises ``OffloadBusy`` after that.
+        """
+        if not self.workers:
+            return fn(*args)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="offload")
+            self._slots = asyncio.Semaphore(self.workers + self.queue_size)
+        await self._acquire(timeout)
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, self._timed, fn, *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+            self._slots.release()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._slots = None
+
+    def stats(self) -> Dict[str, Any]:
+        runs = sorted(self.runs)
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "running": min(self.pending, self.workers),
+            "queued": self.queued,
+            "completed": self.completed,
+            "waiting": self.waiting,
+            "waited": self.waited,
+            "rejected": self.rejected,
+            "run_ms": {
+                "p50": round(runs[len(runs) // 2] * 1000, 2),
+                "p95": round(runs[int(len(runs) * 0.95)] * 1000, 2),
+                "max": round(runs[-1] * 1000, 2)
+            } if runs else None
+        }
+
+# Global offload pool instance
+offload_pool = OffloadPool(settings.offload_workers, settings.offload_queue_size)
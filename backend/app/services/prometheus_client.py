@@ -1,37 +1,94 @@
 import httpx
 import asyncio
-from typing import Dict, List, Optional, Any
+import json
+import time
+from typing import Dict, List, Optional, Any, Set, Tuple
 from datetime import datetime
 import logging
 from ..config import settings
+from .gpu_metrics import GPU_FIELDS, merge_gpu_vectors
+from .offload import offload_pool
+from .query_scheduler import QueryScheduler
+from .replicas import ReplicaSet
+from .query_templates import TEMPLATES, recorded_templates
+from .remote_write import remote_write_store
 
 logger = logging.getLogger(__name__)
 
 class PrometheusClient:
     def __init__(self):
-        self.base_url = settings.prometheus_url
+        self.replicas = ReplicaSet(
+            [url.strip() for url in settings.prometheus_url.split(",") if url.strip()],
+            settings.prometheus_replica_cooldown,
+            settings.prometheus_hedge_budget,
+            settings.prometheus_hedge_min_delay
+        )
         self.timeout = settings.scrape_timeout
+        self._client: Optional[httpx.AsyncClient] = None
+        # Recording rule series found in Prometheus, used instead of raw expressions
+        self.recorded_series: Set[str] = set()
+        self._rules_checked_at: Optional[float] = None
+        # (template, target) -> (expiry, result) for templates with a ttl
+        self._template_cache: Dict[Tuple[str, str], Tuple[float, Dict[str, Any]]] = {}
+        # Every request to Prometheus waits for a slot here, by priority class
+        self.scheduler = QueryScheduler(
+            settings.prometheus_max_concurrency,
+            settings.prometheus_queue_timeouts,
+            settings.prometheus_class_limits
+        )
+    
+    def open(self) -> httpx.AsyncClient:
+        """Pooled HTTP client, created on first use, so queries reuse keep-alive connections"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=httpx.Limits(
+                max_connections=settings.http_max_connections,
+                max_keepalive_connections=settings.http_max_keepalive_connections
+            ))
+        return self._client
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self.open()
+    
+    async def close(self):
+        """Close the pooled connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    def node_target(self, instance: str) -> str:
+        """Prometheus instance label of an instance's node exporter"""
+        return f"{instance}:{settings.node_exporter_port}"
+    
+    def gpu_target(self, instance: str) -> str:
+        """Prometheus instance label of an instance's GPU exporter"""
+        return f"{instance}:{settings.gpu_exporter_port}"
         
-    async def query(self, query: str) -> Optional[Dict[str, Any]]:
-        """Execute a PromQL query"""
+    async def query(self, query: str, priority: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Execute a PromQL query, at ``priority`` or the calling context's priority class"""
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.get(
-                    f"{self.base_url}/api/v1/query",
-                    params={"query": query}
+            async with self.scheduler.slot(priority):
+                response = await self.replicas.get(
+                    self.client,
+                    "/api/v1/query",
+                    params={"query": query},
+                    hedge=True
                 )
-                response.raise_for_status()
-                return response.json()
+            response.raise_for_status()
+            return response.json()
         except Exception as e:
             logger.error(f"Prometheus query failed: {e}")
             return None
     
-    async def query_range(self, query: str, start: str, end: str, step: str = "15s") -> Optional[Dict[str, Any]]:
-        """Execute a PromQL range query"""
+    async def query_range(self, query: str, start: str, end: str, step: str = "15s",
+                          priority: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Execute a PromQL range query, at ``priority`` or the calling context's priority class"""
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.get(
-                    f"{self.base_url}/api/v1/query_range",
+            # Not hedged: range queries are the expensive ones
+            async with self.scheduler.slot(priority):
+                response = await self.replicas.get(
+                    self.client,
+                    "/api/v1/query_range",
                     params={
                         "query": query,
                         "start": start,
@@ -39,16 +96,71 @@ class PrometheusClient:
                         "step": step
                     }
                 )
-                response.raise_for_status()
-                return response.json()
+            response.raise_for_status()
+            # Range results run to megabytes; parse them off the event loop
+            return await offload_pool.run(json.loads, response.content)
         except Exception as e:
             logger.error(f"Prometheus range query failed: {e}")
             return None
     
+    async def refresh_recording_rules(self):
+        """Look up which recording rule series of the query templates exist"""
+        self._rules_checked_at = time.monotonic()
+        records = [template.record for template in recorded_templates()]
+        result = await self.query(f'count by (__name__) ({{__name__=~"{"|".join(records)}"}})')
+        if result is None:
+            return
+        found = {item["metric"].get("__name__") for item in result.get("data", {}).get("result", [])}
+        if found != self.recorded_series:
+            logger.info(f"Using recording rules for {len(found)} of {len(records)} query templates")
+        self.recorded_series = found
+    
+    async def query_template(self, name: str, target: str) -> Optional[Dict[str, Any]]:
+        """Run a query template for one target, from its recording rule when available"""
+        template = TEMPLATES[name]
+        if template.ttl:
+            cached = self._template_cache.get((name, target))
+            if cached and cached[0] > time.monotonic():
+                return cached[1]
+        result = await self._query_template(template, target)
+        if template.ttl and result and result.get("data", {}).get("result"):
+            self._template_cache[(name, target)] = (time.monotonic() + template.ttl, result)
+        return result
+    
+    async def _query_template(self, template, target: str) -> Optional[Dict[str, Any]]:
+        if settings.use_recording_rules and template.record:
+            if (self._rules_checked_at is None
+                    or time.monotonic() - self._rules_checked_at >= settings.recording_rules_refresh):
+                await self.refresh_recording_rules()
+            if template.record in self.recorded_series:
+                result = await self.query(template.recorded(target))
+                if result and result.get("data", {}).get("result"):
+                    return result
+                # Not evaluated for this target yet; fall back to the raw expression
+        return await self.query(template.render(target))
+    
+    async def get_targets(self) -> Optional[List[Dict[str, Any]]]:
+        """Get the active scrape targets with their interval and last scrape time"""
+        try:
+            async with self.scheduler.slot():
+                response = await self.replicas.get(
+                    self.client,
+                    "/api/v1/targets",
+                    params={"state": "active"},
+                    hedge=True
+                )
+            response.raise_for_status()
+            return response.json().get("data", {}).get("activeTargets", [])
+        except Exception as e:
+            logger.error(f"Prometheus targets request failed: {e}")
+            return None
+    
     async def get_cpu_usage(self, instance: str) -> Optional[float]:
         """Get CPU usage percentage for an instance"""
-        query = f'100 - (avg(rate(node_cpu_seconds_total{{mode="idle",instance="{instance}:9100"}}[5m])) * 100)'
-        result = await self.query(query)
+        target = self.node_target(instance)
+        if remote_write_store.is_fresh(target):
+            return remote_write_store.cpu_usage(target)
+        result = await self.query_template("cpu_usage", target)
         
         if result and result.get("status") == "success":
             data = result.get("data", {}).get("result", [])
@@ -56,17 +168,55 @@ class PrometheusClient:
                 return float(data[0]["value"][1])
         return None
     
+    async def get_cpu_cores(self, instance: str) -> int:
+        """Get the number of CPU cores of an instance"""
+        target = self.node_target(instance)
+        if remote_write_store.is_fresh(target):
+            return remote_write_store.cpu_cores(target) or 1
+        result = await self.query_template("cpu_cores", target)
+        
+        if result and result.get("status") == "success":
+            data = result.get("data", {}).get("result", [])
+            if data:
+                return int(float(data[0]["value"][1]))
+        return 1
+    
+    async def get_cpu_detail(self, instance: str) -> Optional[Dict[str, Any]]:
+        """Get per-core usage, time per CPU mode, load averages and CPU temperature in one query"""
+        target = self.node_target(instance)
+        if remote_write_store.is_fresh(target):
+            return remote_write_store.cpu_detail(target)
+        cores: Dict[int, float] = {}
+        modes: Dict[str, float] = {}
+        loads: Dict[str, float] = {}
+        temperature = None
+        for labels, value in await self._vector("cpu_detail", target):
+            kind = labels.get("kind")
+            if kind == "core" and labels.get("cpu", "").isdigit():
+                cores[int(labels["cpu"])] = value * 100
+            elif kind == "mode":
+                modes[labels.get("mode", "unknown")] = value * 100
+            elif kind == "temperature":
+                temperature = value
+            elif kind:
+                loads[kind] = value
+        if not (cores or modes or loads or temperature is not None):
+            return None
+        return {
+            "core_usage": [cores[cpu] for cpu in sorted(cores)] or None,
+            "modes": modes or None,
+            "load_average": [loads[k] for k in ("load1", "load5", "load15")] if len(loads) == 3 else None,
+            "temperature": temperature
+        }
+    
     async def get_memory_usage(self, instance: str) -> Optional[Dict[str, float]]:
         """Get memory usage metrics for an instance"""
-        queries = {
-            "total": f'node_memory_MemTotal_bytes{{instance="{instance}:9100"}}',
-            "available": f'node_memory_MemAvailable_bytes{{instance="{instance}:9100"}}',
-            "cached": f'node_memory_Cached_bytes{{instance="{instance}:9100"}}'
-        }
-        
+        target = self.node_target(instance)
+        if remote_write_store.is_fresh(target):
+            return remote_write_store.memory_usage(target)
         results = {}
-        for key, query in queries.items():
-            result = await self.query(query)
+        for key in ["total", "available", "cached"]:
+            result = await self.query_template(f"memory_{key}", target)
             if result and result.get("status") == "success":
                 data = result.get("data", {}).get("result", [])
                 if data:
@@ -80,17 +230,24 @@ class PrometheusClient:
     
     async def get_disk_usage(self, instance: str) -> Optional[List[Dict[str, Any]]]:
         """Get disk usage for all filesystems on an instance"""
-        queries = {
-            "size": f'node_filesystem_size_bytes{{instance="{instance}:9100",fstype!="tmpfs"}}',
-            "avail": f'node_filesystem_avail_bytes{{instance="{instance}:9100",fstype!="tmpfs"}}',
-            "used": f'node_filesystem_size_bytes{{instance="{instance}:9100",fstype!="tmpfs"}} - node_filesystem_avail_bytes{{instance="{instance}:9100",fstype!="tmpfs"}}'
-        }
-        
+        target = self.node_target(instance)
+        if remote_write_store.is_fresh(target):
+            return remote_write_store.disk_usage(target)
         results = {}
-        for key, query in queries.items():
-            result = await self.query(query)
+        space = await self.query_template("disk_space", target)
+        live = bool(space) and space.get("status") == "success"
+        if live:
+            for series in space.get("data", {}).get("result", []):
+                results.setdefault(series["metric"].get("kind"), []).append(series)
+        result = await self.query_template("disk_size", target)
+        if result and result.get("status") == "success":
+            results["size"] = result.get("data", {}).get("result", [])
+        if live and "size" in results and self._disk_size_outdated(results):
+            # A filesystem was mounted, unmounted or resized since sizes were cached
+            self._template_cache.pop(("disk_size", target), None)
+            result = await self.query_template("disk_size", target)
             if result and result.get("status") == "success":
-                results[key] = result.get("data", {}).get("result", [])
+                results["size"] = result.get("data", {}).get("result", [])
         
         disks = []
         if "size" in results:
@@ -126,57 +283,51 @@ class PrometheusClient:
         
         return disks
     
-    async def get_gpu_metrics(self, instance: str) -> Optional[Dict[str, Any]]:
-        """Get GPU metrics from GPU exporter"""
-        queries = {
-            "gpu_utilization": f'nvidia_smi_utilization_gpu_ratio{{instance="{instance}:9835"}}',
-            "memory_used": f'nvidia_smi_memory_used_bytes{{instance="{instance}:9835"}}',
-            "memory_total": f'nvidia_smi_memory_total_bytes{{instance="{instance}:9835"}}',
-            "temperature": f'nvidia_smi_temperature_gpu{{instance="{instance}:9835"}}',
-            "power_draw": f'nvidia_smi_power_draw_watts{{instance="{instance}:9835"}}',
-            "fan_speed": f'nvidia_smi_fan_speed_ratio{{instance="{instance}:9835"}}'
-        }
-        
-        results = {}
-        for key, query in queries.items():
-            result = await self.query(query)
-            if result and result.get("status") == "success":
-                data = result.get("data", {}).get("result", [])
-                if data:
-                    results[key] = float(data[0]["value"][1])
-                    if key in ["gpu_utilization", "fan_speed"]:
-                        results[key] *= 100  # Convert to percentage
-        
-        if results:
-            gpu_name_query = f'nvidia_smi_gpu_info{{instance="{instance}:9835"}}'
-            name_result = await self.query(gpu_name_query)
-            if name_result and name_result.get("status") == "success":
-                data = name_result.get("data", {}).get("result", [])
-                if data:
-                    results["name"] = data[0]["metric"].get("name", "Unknown GPU")
-            
-            # Calculate memory usage percentage
-            if "memory_used" in results and "memory_total" in results:
-                results["memory_usage_percent"] = (results["memory_used"] / results["memory_total"]) * 100
-                results["memory_used_mb"] = results["memory_used"] / (1024**2)
-                results["memory_total_mb"] = results["memory_total"] / (1024**2)
-        
-        return results if results else None
+    @staticmethod
+    def _disk_size_outdated(results: Dict[str, List[Dict[str, Any]]]) -> bool:
+        """Whether cached filesystem sizes differ from the live ones.
+
+        avail and used come from one evaluation, so their sum is the live size;
+        differences below a byte are float rounding.
+        """
+        def by_mount(key: str) -> Dict[str, float]:
+            return {disk["metric"]["mountpoint"]: float(disk["value"][1]) for disk in results.get(key, [])}
+        cached, avail, used = by_mount("size"), by_mount("avail"), by_mount("used")
+        if set(avail) != set(cached):
+            return True
+        return any(mount in used and abs(avail[mount] + used[mount] - size) >= 1 for mount, size in cached.items())
+    
+    async def _vector(self, name: str, target: str) -> List[Tuple[Dict[str, str], float]]:
+        """``(labels, value)`` pairs of a query template's result"""
+        result = await self.query_template(name, target)
+        if result and result.get("status") == "success":
+            return [(item["metric"], float(item["value"][1])) for item in result.get("data", {}).get("result", [])]
+        return []
+    
+    async def get_gpu_metrics(self, instance: str) -> Optional[List[Dict[str, Any]]]:
+        """Get metrics of every GPU from the GPU exporter, one query per field"""
+        target = self.gpu_target(instance)
+        if remote_write_store.is_fresh(target):
+            return remote_write_store.gpu_metrics(target)
+        fields = {key: await self._vector(f"gpu_{key}", target) for key in GPU_FIELDS}
+        if not any(fields.values()):
+            return None
+        return merge_gpu_vectors(
+            fields,
+            await self._vector("gpu_info", target),
+            await self._vector("gpu_process_memory", target)
+        )
     
     async def get_network_metrics(self, instance: str) -> Optional[List[Dict[str, Any]]]:
         """Get network interface metrics"""
-        queries = {
-            "bytes_sent": f'rate(node_network_transmit_bytes_total{{instance="{instance}:9100"}}[5m])',
-            "bytes_recv": f'rate(node_network_receive_bytes_total{{instance="{instance}:9100"}}[5m])',
-            "packets_sent": f'rate(node_network_transmit_packets_total{{instance="{instance}:9100"}}[5m])',
-            "packets_recv": f'rate(node_network_receive_packets_total{{instance="{instance}:9100"}}[5m])',
-            "errors_in": f'rate(node_network_receive_errs_total{{instance="{instance}:9100"}}[5m])',
-            "errors_out": f'rate(node_network_transmit_errs_total{{instance="{instance}:9100"}}[5m])'
-        }
+        target = self.node_target(instance)
+        if remote_write_store.is_fresh(target):
+            return remote_write_store.network_metrics(target)
+        keys = ["bytes_sent", "bytes_recv", "packets_sent", "packets_recv", "errors_in", "errors_out"]
         
         results = {}
-        for key, query in queries.items():
-            result = await self.query(query)
+        for key in keys:
+            result = await self.query_template(f"network_{key}", target)
             if result and result.get("status") == "success":
                 results[key] = result.get("data", {}).get("result", [])
         
@@ -201,14 +352,21 @@ class PrometheusClient:
         
         return interfaces
     
-    async def check_instance_health(self, instance: str, port: int = 9100) -> Dict[str, Any]:
+    async def check_instance_health(self, instance: str, port: Optional[int] = None) -> Dict[str, Any]:
         """Check if an instance is responding"""
+        port = port or settings.node_exporter_port
+        if remote_write_store.is_fresh(f"{instance}:{port}"):
+            # Samples are arriving through remote write, so the exporter is up
+            return {
+                "status": "online",
+                "response_time_ms": None,
+                "last_updated": datetime.now()
+            }
         try:
             start_time = datetime.now()
-            async with httpx.AsyncClient(timeout=5) as client:
-                response = await client.get(f"http://{instance}:{port}/metrics")
-                response.raise_for_status()
-                
+            response = await self.client.get(f"http://{instance}:{port}/metrics", timeout=5)
+            response.raise_for_status()
+            
             response_time = (datetime.now() - start_time).total_seconds() * 1000
             return {
                 "status": "online",
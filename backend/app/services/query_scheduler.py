@@ -0,0 +1,129 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Optional
+
+# Priority classes, most urgent first
+PRIORITIES = ("live", "interactive", "history", "export")
+# Admission waits kept per class for the wait time percentiles
+WAIT_SAMPLES = 1000
+
+_priority: ContextVar[str] = ContextVar("query_priority", default="interactive")
+
+@contextmanager
+def query_priority(priority: str):
+    """Run the Prometheus requests made in this context at ``priority``"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+def current_priority() -> str:
+    return _priority.get()
+
+class QueryRejected(Exception):
+    """A request waited longer than its class' queue timeout"""
+
+class QueryScheduler:
+    """Admission control for requests to Prometheus.
+
+    At most ``limit`` requests are in flight, and at most ``class_limits``
+    of a class that has one, so bulk work always leaves slots for the live
+    tick. Waiting requests queue per priority class; free slots go to the
+    oldest waiter of the most urgent class that is under its limit. A waiter
+    that is not admitted within its class' timeout is rejected, so a backlog
+    of exports or history queries fails fast instead of piling up.
+    """
+
+    def __init__(self, limit: int, timeouts: Dict[str, float], class_limits: Optional[Dict[str, int]] = None):
+        self.limit = limit
+        self.timeouts = timeouts
+        self.class_limits = class_limits or {}
+        self.in_flight = 0
+        self.class_in_flight: Dict[str, int] = dict.fromkeys(PRIORITIES, 0)
+        self.queues: Dict[str, Deque[asyncio.Future]] = {priority: deque() for priority in PRIORITIES}
+        self.admitted: Dict[str, int] = dict.fromkeys(PRIORITIES, 0)
+        self.rejected: Dict[str, int] = dict.fromkeys(PRIORITIES, 0)
+        self.waits: Dict[str, Deque[float]] = {priority: deque(maxlen=WAIT_SAMPLES) for priority in PRIORITIES}
+
+    def _dispatch(self):
+        """Admit waiters while there are free slots, most urgent class first"""
+        for priority in PRIORITIES:
+            queue = self.queues[priority]
+            class_limit = self.class_limits.get(priority, self.limit)
+            while queue and self.in_flight < self.limit and self.class_in_flight[priority] < class_limit:
+                future = queue.popleft()
+                if future.done():
+                    continue
+                self.in_flight += 1
+                self.class_in_flight[priority] += 1
+                future.set_result(None)
+            if self.in_flight >= self.limit:
+                return
+
+    async def acquire(self, priority: str):
+        """Wait for a slot, or raise QueryRejected after the class' timeout"""
+        started = time.monotonic()
+        queue = self.queues[priority]
+        future = asyncio.get_running_loop().create_future()
+        queue.append(future)
+        self._dispatch()
+        if not future.done():
+            try:
+                await asyncio.wait_for(asyncio.shield(future), self.timeouts.get(priority))
+            except asyncio.TimeoutError:
+                # Unless it was admitted just as the timeout fired
+                if not future.done():
+                    future.cancel()
+                    queue.remove(future)
+                    self.rejected[priority] += 1
+                    raise QueryRejected(f"{priority} query not admitted within {self.timeouts[priority]}s")
+            except asyncio.CancelledError:
+                if future.done():
+                    # Admitted just as the caller gave up: pass the slot on
+                    self.release(priority)
+                else:
+                    future.cancel()
+                    queue.remove(future)
+                raise
+        self.admitted[priority] += 1
+        self.waits[priority].append(time.monotonic() - started)
+
+    def release(self, priority: str):
+        """Free a slot of ``priority`` and hand it to the next waiter"""
+        self.in_flight -= 1
+        self.class_in_flight[priority] -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, priority: Optional[str] = None):
+        """Hold a slot for one request, at ``priority`` or the context's priority"""
+        priority = priority or current_priority()
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release(priority)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, admissions, rejections and admission wait times per class"""
+        classes = {}
+        for priority in PRIORITIES:
+            waits = sorted(self.waits[priority])
+            classes[priority] = {
+                "queued": len(self.queues[priority]),
+                "in_flight": self.class_in_flight[priority],
+                "limit": self.class_limits.get(priority, self.limit),
+                "admitted": self.admitted[priority],
+                "rejected": self.rejected[priority],
+                "timeout_seconds": self.timeouts.get(priority),
+                "wait_ms": {
+                    "p50": waits[len(waits) // 2] * 1000,
+                    "p95": waits[int(len(waits) * 0.95)] * 1000,
+                    "max": waits[-1] * 1000
+                } if waits else None
+            }
+        return {"limit": self.limit, "in_flight": self.in_flight, "classes": classes}
@@ -0,0 +1,136 @@
+from typing import Dict, List, Optional, Tuple
+from ..config import settings
+from .gpu_metrics import GPU_FIELDS, GPU_INFO, GPU_PROCESS_MEMORY
+
+class QueryTemplate:
+    """A PromQL expression the collector runs for every target.
+
+    ``expr`` contains a ``{selector}`` placeholder for the label matchers, so
+    the same template renders the per-target query and, for templates with a
+    ``record`` name, the fleet-wide recording rule that precomputes it.
+    ``{instance}`` is the bare instance matcher, for selectors that need
+    matchers of their own.
+    Rendered queries are kept per target. ``ttl`` is how many seconds a result
+    may be reused: 0 for volatile metrics, which are queried every cycle.
+    """
+
+    def __init__(self, name: str, expr: str, matchers: Tuple[str, ...] = (), record: Optional[str] = None,
+                 ttl: float = 0):
+        self.name = name
+        self.expr = expr
+        self.matchers = matchers
+        self.record = record
+        self.ttl = ttl
+        self._queries: Dict[str, str] = {}
+        self._recorded: Dict[str, str] = {}
+
+    def _selector(self, matchers: Tuple[str, ...]) -> str:
+        return "{" + ",".join(matchers) + "}" if matchers else ""
+
+    def render(self, target: str) -> str:
+        """The raw expression for one target"""
+        query = self._queries.get(target)
+        if query is None:
+            query = self._queries[target] = self.expr.format(
+                selector=self._selector(self.matchers + (f'instance="{target}"',)),
+                instance=f'instance="{target}"'
+            )
+        return query
+
+    def rule_expr(self) -> str:
+        """The expression for all targets, as evaluated by the recording rule"""
+        return self.expr.format(selector=self._selector(self.matchers), instance="")
+
+    def recorded(self, target: str) -> str:
+        """The precomputed series for one target"""
+        query = self._recorded.get(target)
+        if query is None:
+            query = self._recorded[target] = f'{self.record}{{instance="{target}"}}'
+        return query
+
+def _network_rate(name: str, direction: str, counter: str) -> QueryTemplate:
+    return QueryTemplate(
+        name,
+        f"rate(node_network_{direction}_{counter}_total{{selector}}[5m])",
+        record=f"instance_device:node_network_{direction}_{counter}:rate5m"
+    )
+
+def _gauge(name: str, metric: str, matchers: Tuple[str, ...] = (), ttl: float = 0) -> QueryTemplate:
+    return QueryTemplate(name, metric + "{selector}", matchers=matchers, ttl=ttl)
+
+NOT_TMPFS = ('fstype!="tmpfs"',)
+CPU_TEMPERATURE_CHIPS = ".*(coretemp|k10temp|cpu).*"
+
+# Per-core usage, time share per mode, load averages and CPU temperature in
+# one vector; each part is told apart by its "kind" label. The kernel already
+# counts guest time in user and nice, so the guest modes are left out.
+CPU_DETAIL = " or ".join([
+    'label_replace(sum by (cpu) (rate(node_cpu_seconds_total{{mode!~"idle|guest|guest_nice",{instance}}}[5m])), '
+    '"kind", "core", "", "")',
+    'label_replace(avg by (mode) (rate(node_cpu_seconds_total{{mode!~"guest|guest_nice",{instance}}}[5m])), '
+    '"kind", "mode", "", "")',
+    *[f'label_replace(node_load{n}{{selector}}, "kind", "load{n}", "", "")' for n in (1, 5, 15)],
+    f'label_replace(max(node_hwmon_temp_celsius{{{{chip=~"{CPU_TEMPERATURE_CHIPS}",{{instance}}}}}}), '
+    '"kind", "temperature", "", "")',
+])
+
+# Available and used space of every filesystem in one vector, told apart by
+# their "kind" label. One server evaluates both at one instant, so avail +
+# used is exactly the live size even when a scrape lands mid-collection.
+DISK_SPACE = " or ".join([
+    'label_replace(node_filesystem_avail_bytes{selector}, "kind", "avail", "", "")',
+    'label_replace(node_filesystem_size_bytes{selector} - node_filesystem_avail_bytes{selector}, '
+    '"kind", "used", "", "")',
+])
+
+# Templates of the hot per-cycle expressions; every one with a record name
+# gets a rule in monitoring/prometheus/rules/ (python -m app.recording_rules).
+# Static facts (core count, memory and filesystem sizes, GPU model and memory)
+# are re-queried every static_query_ttl seconds instead of every cycle;
+# filesystem sizes also as soon as the mounts or their live sizes change.
+TEMPLATES: Dict[str, QueryTemplate] = {
+    template.name: template for template in [
+        QueryTemplate(
+            "cpu_usage",
+            "100 - (avg by (instance) (rate(node_cpu_seconds_total{selector}[5m])) * 100)",
+            matchers=('mode="idle"',),
+            record="instance:node_cpu_usage_percent:rate5m"
+        ),
+        QueryTemplate(
+            "cpu_cores",
+            "count by (instance) (node_cpu_seconds_total{selector})",
+            matchers=('mode="idle"',),
+            record="instance:node_cpu_cores:count",
+            ttl=settings.static_query_ttl
+        ),
+        QueryTemplate("cpu_detail", CPU_DETAIL),
+        _gauge("memory_total", "node_memory_MemTotal_bytes", ttl=settings.static_query_ttl),
+        _gauge("memory_available", "node_memory_MemAvailable_bytes"),
+        _gauge("memory_cached", "node_memory_Cached_bytes"),
+        _gauge("disk_size", "node_filesystem_size_bytes", NOT_TMPFS, ttl=settings.static_query_ttl),
+        _gauge("disk_avail", "node_filesystem_avail_bytes", NOT_TMPFS),
+        QueryTemplate(
+            "disk_used",
+            "node_filesystem_size_bytes{selector} - node_filesystem_avail_bytes{selector}",
+            matchers=NOT_TMPFS
+        ),
+        QueryTemplate("disk_space", DISK_SPACE, matchers=NOT_TMPFS),
+        # One vector per field for all GPUs of a host
+        *[
+            _gauge(f"gpu_{key}", metric, ttl=settings.static_query_ttl if key == "memory_total" else 0)
+            for key, metric in GPU_FIELDS.items()
+        ],
+        _gauge("gpu_info", GPU_INFO, ttl=settings.static_query_ttl),
+        _gauge("gpu_process_memory", GPU_PROCESS_MEMORY),
+        _network_rate("network_bytes_sent", "transmit", "bytes"),
+        _network_rate("network_bytes_recv", "receive", "bytes"),
+        _network_rate("network_packets_sent", "transmit", "packets"),
+        _network_rate("network_packets_recv", "receive", "packets"),
+        _network_rate("network_errors_in", "receive", "errs"),
+        _network_rate("network_errors_out", "transmit", "errs"),
+    ]
+}
+
+def recorded_templates() -> List[QueryTemplate]:
+    """Templates that have a recording rule"""
+    return [template for template in TEMPLATES.values() if template.record]
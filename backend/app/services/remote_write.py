@@ -0,0 +1,379 @@
+import logging
+import struct
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterator, List, Optional, Set, Tuple
+from ..config import settings
+from .gpu_metrics import GPU_FIELDS, GPU_INFO, GPU_PROCESS_MEMORY, merge_gpu_vectors
+
+logger = logging.getLogger(__name__)
+
+try:
+    import snappy as _snappy
+except ImportError:
+    _snappy = None
+
+# Series the collector reads; everything else in a remote-write batch is dropped
+NODE_METRICS = {
+    "node_cpu_seconds_total",
+    "node_memory_MemTotal_bytes",
+    "node_memory_MemAvailable_bytes",
+    "node_memory_Cached_bytes",
+    "node_filesystem_size_bytes",
+    "node_filesystem_avail_bytes",
+    "node_network_transmit_bytes_total",
+    "node_network_receive_bytes_total",
+    "node_network_transmit_packets_total",
+    "node_network_receive_packets_total",
+    "node_network_receive_errs_total",
+    "node_network_transmit_errs_total",
+    "node_load1",
+    "node_load5",
+    "node_load15",
+    "node_hwmon_temp_celsius"
+}
+# CPU modes kept for the per-mode breakdown; idle also gives per-core usage
+CPU_MODES = ("idle", "user", "system", "iowait", "steal")
+CPU_TEMPERATURE_CHIPS = ("coretemp", "k10temp", "cpu")
+GPU_METRICS = {*GPU_FIELDS.values(), GPU_INFO, GPU_PROCESS_MEMORY}
+ACCEPTED_METRICS = NODE_METRICS | GPU_METRICS
+# Same window as the [5m] in the PromQL rate() queries
+RATE_WINDOW_SECONDS = 300
+
+Labels = Tuple[Tuple[str, str], ...]
+Series = Tuple[Dict[str, str], List[Tuple[float, float]]]
+
+class PayloadTooLarge(ValueError):
+    """A remote-write body over ``remote_write_max_bytes``, compressed or not"""
+
+def _varint(buf: memoryview, pos: int) -> Tuple[int, int]:
+    result = shift = 0
+    while True:
+        if pos >= len(buf):
+            raise ValueError("truncated varint")
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+        if shift > 63:
+            raise ValueError("varint too long")
+
+def snappy_decompress(data: bytes, max_length: Optional[int] = None) -> bytes:
+    """Decompress a snappy block (the remote-write body format).
+
+    Uses python-snappy when it is installed and a pure-Python decoder otherwise.
+    Blocks that would decompress to more than ``max_length`` bytes are refused
+    before any work is done.
+    """
+    buf = memoryview(data)
+    length, pos = _varint(buf, 0)
+    if max_length is not None and length > max_length:
+        raise PayloadTooLarge(f"decompresses to {length} bytes, over the {max_length} byte limit")
+    if _snappy is not None:
+        try:
+            return _snappy.uncompress(data)
+        except Exception as e:
+            raise ValueError(f"invalid snappy block: {e}") from e
+
+    try:
+        return _snappy_decode(buf, pos, length)
+    except IndexError:
+        raise ValueError("truncated snappy block")
+
+def _snappy_decode(buf: memoryview, pos: int, length: int) -> bytes:
+    out = bytearray()
+    end = len(buf)
+    while pos < end:
+        if len(out) > length:
+            raise ValueError("snappy block is longer than its header says")
+        tag = buf[pos]
+        pos += 1
+        kind = tag & 3
+        if kind == 0:
+            size = tag >> 2
+            if size >= 60:
+                extra = size - 59
+                size = int.from_bytes(buf[pos:pos + extra], "little")
+                pos += extra
+            size += 1
+            out += buf[pos:pos + size]
+            pos += size
+            continue
+        if kind == 1:
+            size = ((tag >> 2) & 7) + 4
+            offset = ((tag >> 5) << 8) | buf[pos]
+            pos += 1
+        elif kind == 2:
+            size = (tag >> 2) + 1
+            offset = int.from_bytes(buf[pos:pos + 2], "little")
+            pos += 2
+        else:
+            size = (tag >> 2) + 1
+            offset = int.from_bytes(buf[pos:pos + 4], "little")
+            pos += 4
+        if offset == 0 or offset > len(out):
+            raise ValueError("invalid snappy copy offset")
+        start = len(out) - offset
+        while size > 0:
+            # Copies may overlap their own output, so copy at most offset bytes at a time
+            chunk = out[start:start + min(size, offset)]
+            out += chunk
+            start += len(chunk)
+            size -= len(chunk)
+    if len(out) != length:
+        raise ValueError("snappy length mismatch")
+    return bytes(out)
+
+def _fields(buf: memoryview) -> Iterator[Tuple[int, int, Any]]:
+    pos, end = 0, len(buf)
+    while pos < end:
+        key, pos = _varint(buf, pos)
+        number, wire_type = key >> 3, key & 7
+        if wire_type == 0:
+            value, pos = _varint(buf, pos)
+        elif wire_type == 1:
+            value = buf[pos:pos + 8]
+            pos += 8
+        elif wire_type == 2:
+            size, pos = _varint(buf, pos)
+            value = buf[pos:pos + size]
+            pos += size
+        elif wire_type == 5:
+            value = buf[pos:pos + 4]
+            pos += 4
+        else:
+            raise ValueError(f"unsupported protobuf wire type {wire_type}")
+        if pos > end:
+            raise ValueError(f"truncated protobuf field {number}")
+        yield number, wire_type, value
+
+def _expect(wire_type: int, expected: int, field: str):
+    if wire_type != expected:
+        raise ValueError(f"{field} has wire type {wire_type}, expected {expected}")
+
+def parse_write_request(data: bytes) -> Iterator[Series]:
+    """Decode a prometheus.WriteRequest into ``(labels, [(timestamp_s, value)])`` pairs.
+
+    Fields the receiver reads must have the wire type of the schema; unknown
+    fields are skipped.
+    """
+    for number, wire_type, timeseries in _fields(memoryview(data)):
+        if number != 1:
+            continue  # metadata
+        _expect(wire_type, 2, "TimeSeries")
+        labels: Dict[str, str] = {}
+        samples: List[Tuple[float, float]] = []
+        for field, field_type, value in _fields(timeseries):
+            if field == 1:
+                _expect(field_type, 2, "Label")
+                name = label_value = ""
+                for label_field, label_type, text in _fields(value):
+                    if label_field == 1:
+                        _expect(label_type, 2, "Label.name")
+                        name = bytes(text).decode()
+                    elif label_field == 2:
+                        _expect(label_type, 2, "Label.value")
+                        label_value = bytes(text).decode()
+                labels[name] = label_value
+            elif field == 2:
+                _expect(field_type, 2, "Sample")
+                sample_value, timestamp = 0.0, 0
+                for sample_field, sample_type, raw in _fields(value):
+                    if sample_field == 1:
+                        _expect(sample_type, 1, "Sample.value")
+                        sample_value = struct.unpack("<d", raw)[0]
+                    elif sample_field == 2:
+                        _expect(sample_type, 0, "Sample.timestamp")
+                        timestamp = raw - (1 << 64) if raw >= 1 << 63 else raw
+                samples.append((timestamp / 1000, sample_value))
+        yield labels, samples
+
+def decode_write_request(body: bytes, encoding: str, max_bytes: int) -> List[Series]:
+    """Decompress and decode a whole remote-write body; any malformed input raises ValueError"""
+    try:
+        if encoding == "snappy":
+            body = snappy_decompress(body, max_bytes)
+        return list(parse_write_request(body))
+    except (IndexError, TypeError, struct.error) as e:
+        raise ValueError(f"malformed WriteRequest: {e}") from e
+
+class RemoteWriteStore:
+    """Recent samples pushed through Prometheus remote write.
+
+    Each series keeps a small ring buffer of samples, enough to compute the
+    same ``rate(...[5m])`` values the PromQL queries return. While a target
+    keeps pushing, the ``PrometheusClient`` helpers answer from here instead of
+    querying Prometheus.
+    """
+
+    def __init__(self):
+        # instance label -> metric name -> series labels -> samples
+        self.series: Dict[str, Dict[str, Dict[Labels, Deque[Tuple[float, float]]]]] = {}
+        self.last_push: Dict[str, float] = {}
+        self.samples_received = 0
+
+    def ingest(self, series: List[Series]) -> Set[str]:
+        """Store the samples of a decoded WriteRequest and return the instances that got new data"""
+        updated: Set[str] = set()
+        received = time.time()
+        for labels, samples in series:
+            name = labels.get("__name__")
+            instance = labels.get("instance")
+            if name not in ACCEPTED_METRICS or not instance or not samples:
+                continue
+            if name == "node_cpu_seconds_total" and labels.get("mode") not in CPU_MODES:
+                continue
+            key: Labels = tuple(sorted((k, v) for k, v in labels.items() if k not in ("__name__", "instance", "job")))
+            buffer = self.series.setdefault(instance, {}).setdefault(name, {}).get(key)
+            if buffer is None:
+                buffer = deque(maxlen=settings.remote_write_buffer_size)
+                self.series[instance][name][key] = buffer
+            for sample in samples:
+                if not buffer or sample[0] > buffer[-1][0]:
+                    buffer.append(sample)
+            self.samples_received += len(samples)
+            self.last_push[instance] = received
+            updated.add(instance)
+        return updated
+
+    def is_fresh(self, instance: str) -> bool:
+        """Whether ``instance`` pushed recently enough to skip querying Prometheus"""
+        last = self.last_push.get(instance)
+        return last is not None and time.time() - last <= settings.remote_write_staleness
+
+    def latest(self, instance: str, name: str) -> List[Tuple[Dict[str, str], float]]:
+        return [
+            (dict(key), buffer[-1][1])
+            for key, buffer in self.series.get(instance, {}).get(name, {}).items()
+            if buffer
+        ]
+
+    def rate(self, instance: str, name: str) -> List[Tuple[Dict[str, str], float]]:
+        """Per-second increase over the rate window, allowing for counter resets"""
+        rates = []
+        for key, buffer in self.series.get(instance, {}).get(name, {}).items():
+            if len(buffer) < 2:
+                continue
+            newest = buffer[-1][0]
+            window = [s for s in buffer if newest - s[0] <= RATE_WINDOW_SECONDS]
+            if len(window) < 2:
+                continue
+            increase = 0.0
+            for (_, previous), (_, current) in zip(window, window[1:]):
+                increase += current - previous if current >= previous else current
+            rates.append((dict(key), increase / (window[-1][0] - window[0][0])))
+        return rates
+
+    def cpu_usage(self, instance: str) -> Optional[float]:
+        idle = [value for labels, value in self.rate(instance, "node_cpu_seconds_total") if labels.get("mode") == "idle"]
+        if not idle:
+            return None
+        return 100 - (sum(idle) / len(idle)) * 100
+
+    def cpu_cores(self, instance: str) -> Optional[int]:
+        cores = len([key for key in self.series.get(instance, {}).get("node_cpu_seconds_total", {})
+                     if ("mode", "idle") in key])
+        return cores or None
+
+    def cpu_detail(self, instance: str) -> Optional[Dict[str, Any]]:
+        rates = self.rate(instance, "node_cpu_seconds_total")
+        cores = {
+            int(labels["cpu"]): 100 - value * 100
+            for labels, value in rates if labels.get("mode") == "idle" and labels.get("cpu", "").isdigit()
+        }
+        by_mode: Dict[str, List[float]] = {}
+        for labels, value in rates:
+            by_mode.setdefault(labels.get("mode", "unknown"), []).append(value)
+        loads = [self.latest(instance, f"node_load{n}") for n in (1, 5, 15)]
+        temperatures = [
+            value for labels, value in self.latest(instance, "node_hwmon_temp_celsius")
+            if any(chip in labels.get("chip", "") for chip in CPU_TEMPERATURE_CHIPS)
+        ]
+        if not (cores or loads[0] or temperatures):
+            return None
+        return {
+            "core_usage": [cores[cpu] for cpu in sorted(cores)] or None,
+            "modes": {mode: sum(values) / len(values) * 100 for mode, values in by_mode.items()} or None,
+            "load_average": [load[0][1] for load in loads] if all(loads) else None,
+            "temperature": max(temperatures) if temperatures else None
+        }
+
+    def memory_usage(self, instance: str) -> Optional[Dict[str, float]]:
+        results = {}
+        for key, name in (("total", "node_memory_MemTotal_bytes"),
+                          ("available", "node_memory_MemAvailable_bytes"),
+                          ("cached", "node_memory_Cached_bytes")):
+            values = self.latest(instance, name)
+            if values:
+                results[key] = values[0][1]
+        if "total" in results and "available" in results:
+            results["used"] = results["total"] - results["available"]
+            results["usage_percent"] = (results["used"] / results["total"]) * 100
+        return results or None
+
+    def disk_usage(self, instance: str) -> List[Dict[str, Any]]:
+        avail = {
+            labels.get("mountpoint"): value
+            for labels, value in self.latest(instance, "node_filesystem_avail_bytes")
+        }
+        disks = []
+        for labels, size_bytes in self.latest(instance, "node_filesystem_size_bytes"):
+            if labels.get("fstype") == "tmpfs" or size_bytes <= 0:
+                continue
+            mountpoint = labels.get("mountpoint", "")
+            avail_bytes = avail.get(mountpoint, 0)
+            used_bytes = size_bytes - avail_bytes
+            disks.append({
+                "mount_point": mountpoint,
+                "device": labels.get("device", ""),
+                "total_gb": size_bytes / (1024**3),
+                "used_gb": used_bytes / (1024**3),
+                "available_gb": avail_bytes / (1024**3),
+                "usage_percent": (used_bytes / size_bytes) * 100,
+                "filesystem": labels.get("fstype", "unknown")
+            })
+        return disks
+
+    def network_metrics(self, instance: str) -> List[Dict[str, Any]]:
+        names = {
+            "bytes_sent": "node_network_transmit_bytes_total",
+            "bytes_recv": "node_network_receive_bytes_total",
+            "packets_sent": "node_network_transmit_packets_total",
+            "packets_recv": "node_network_receive_packets_total",
+            "errors_in": "node_network_receive_errs_total",
+            "errors_out": "node_network_transmit_errs_total"
+        }
+        by_device: Dict[str, Dict[str, float]] = {}
+        for key, name in names.items():
+            for labels, value in self.rate(instance, name):
+                device = labels.get("device", "")
+                if key == "bytes_sent" or device in by_device:
+                    by_device.setdefault(device, {"interface": device})[key] = value
+        interfaces = []
+        for device, interface_data in by_device.items():
+            if device.startswith(("lo", "docker", "br-")):
+                continue  # Skip loopback and docker interfaces
+            for key in names:
+                interface_data.setdefault(key, 0.0)
+            interfaces.append(interface_data)
+        return interfaces
+
+    def gpu_metrics(self, instance: str) -> Optional[List[Dict[str, Any]]]:
+        fields = {key: self.latest(instance, name) for key, name in GPU_FIELDS.items()}
+        if not any(fields.values()):
+            return None
+        return merge_gpu_vectors(
+            fields, self.latest(instance, GPU_INFO), self.latest(instance, GPU_PROCESS_MEMORY)
+        )
+
+    def expire(self):
+        """Forget targets that stopped pushing so polling takes over again"""
+        cutoff = time.time() - settings.remote_write_staleness
+        for instance in [i for i, last in self.last_push.items() if last < cutoff]:
+            del self.last_push[instance]
+            self.series.pop(instance, None)
+            logger.info(f"Remote write from {instance} went stale, polling Prometheus again")
+
+remote_write_store = RemoteWriteStore()
@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Latencies kept per request path for the hedge delay
+LATENCY_SAMPLES = 256
+# Samples a path needs before its requests are hedged
+HEDGE_WARMUP = 20
+# Weight of each new latency in a replica's moving average
+LATENCY_ALPHA = 0.2
+
+class ReplicaUnavailable(Exception):
+    """A replica answered with a server error"""
+
+class Replica:
+    """One Prometheus replica and what the client has seen of it"""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.latency = 0.0
+        self.down_until = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.hedge_wins = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def healthy(self) -> bool:
+        return self.down_until <= time.monotonic()
+
+    def succeeded(self, latency: float):
+        self.latency = latency if not self.latency else LATENCY_ALPHA * latency + (1 - LATENCY_ALPHA) * self.latency
+        self.down_until = 0.0
+        self.last_error = None
+
+    def failed(self, error: Exception, cooldown: float):
+        self.failures += 1
+        self.last_error = str(error) or type(error).__name__
+        if self.healthy:
+            logger.warning(f"Prometheus replica {self.url} failed, skipping it for {cooldown:.0f}s: {self.last_error}")
+        self.down_until = time.monotonic() + cooldown
+
+class ReplicaSet:
+    """Prometheus replicas queried with health-weighted routing, hedging and failover.
+
+    Each request goes to a healthy replica picked at random, weighted by the
+    inverse of its recent latency. If a hedged request has not been answered
+    within the p95 latency of its path, a second copy goes to the next
+    replica and the first answer wins. Hedges are capped at ``hedge_budget``
+    of all requests. A replica that fails (connection error or 5xx) is
+    skipped for ``cooldown`` seconds and its requests fail over to the next
+    replica; when every replica is down they are all tried anyway.
+    """
+
+    def __init__(self, urls: List[str], cooldown: float, hedge_budget: float, hedge_min_delay: float):
+        self.replicas = [Replica(url) for url in urls]
+        self.cooldown = cooldown
+        self.hedge_budget = hedge_budget
+        self.hedge_min_delay = hedge_min_delay
+        self.latencies: Dict[str, Deque[float]] = {}
+        self.requests = 0
+        self.hedged = 0
+
+    def ranked(self) -> List[Replica]:
+        """Replicas in the order to try them: healthy ones first, the first one weighted by speed"""
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        down = sorted((replica for replica in self.replicas if not replica.healthy), key=lambda r: r.down_until)
+        if len(healthy) > 1:
+            primary = random.choices(healthy, [1 / max(replica.latency, 0.001) for replica in healthy])[0]
+            healthy = [primary] + sorted((r for r in healthy if r is not primary), key=lambda r: r.latency)
+        return healthy + down
+
+    def hedge_delay(self, path: str) -> Optional[float]:
+        """p95 latency of ``path``, or None while it is unknown or the hedge budget is spent"""
+        samples = self.latencies.get(path)
+        if not samples or len(samples) < HEDGE_WARMUP or self.hedged >= self.hedge_budget * self.requests:
+            return None
+        ordered = sorted(samples)
+        return max(ordered[int(len(ordered) * 0.95)], self.hedge_min_delay)
+
+    async def _send(self, client: httpx.AsyncClient, replica: Replica, path: str,
+                    params: Dict[str, Any]) -> httpx.Response:
+        replica.requests += 1
+        started = time.monotonic()
+        try:
+            response = await client.get(f"{replica.url}{path}", params=params)
+            if response.status_code >= 500:
+                raise ReplicaUnavailable(f"HTTP {response.status_code}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            replica.failed(e, self.cooldown)
+            raise
+        latency = time.monotonic() - started
+        replica.succeeded(latency)
+        self.latencies.setdefault(path, deque(maxlen=LATENCY_SAMPLES)).append(latency)
+        return response
+
+    async def get(self, client: httpx.AsyncClient, path: str, params: Dict[str, Any],
+                  hedge: bool = False) -> httpx.Response:
+        """GET ``path`` from the replicas; returns the first response that is not a server error"""
+        self.requests += 1
+        candidates = self.ranked()
+        delay = self.hedge_delay(path) if hedge and len(candidates) > 1 else None
+        pending: Dict[asyncio.Task, Replica] = {}
+        tried = 0
+        hedged = False
+        error: Optional[Exception] = None
+
+        def launch():
+            nonlocal tried
+            replica = candidates[tried]
+            pending[asyncio.create_task(self._send(client, replica, path, params))] = replica
+            tried += 1
+
+        launch()
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Slower than usual: hedge with the next replica, once
+                    delay = None
+                    hedged = True
+                    self.hedged += 1
+                    launch()
+                    continue
+                for task in done:
+                    replica = pending.pop(task)
+                    try:
+                        response = task.result()
+                    except Exception as e:
+                        error = e
+                        continue
+                    if hedged and replica is not candidates[0]:
+                        replica.hedge_wins += 1
+                    return response
+                if not pending and tried < len(candidates):
+                    # Fail over to the next replica
+                    delay = None
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+        raise error
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "hedge_delay_ms": {
+                path: round(delay * 1000, 1)
+                for path in self.latencies
+                if (delay := self.hedge_delay(path)) is not None
+            },
+            "replicas": [
+                {
+                    "url": replica.url,
+                    "healthy": replica.healthy,
+                    "latency_ms": round(replica.latency * 1000, 1),
+                    "requests": replica.requests,
+                    "failures": replica.failures,
+                    "hedge_wins": replica.hedge_wins,
+                    "last_error": replica.last_error
+                }
+                for replica in self.replicas
+            ]
+        }
@@ -0,0 +1,101 @@
+import logging
+import time
+from datetime import datetime
+from typing import Dict, List, Tuple
+from ..config import settings
+from ..models.server_metrics import parse_duration
+from .prometheus_client import prometheus_client
+from .remote_write import remote_write_store
+
+logger = logging.getLogger(__name__)
+
+# (scrape interval, last scrape, seconds until its samples are queryable)
+Schedule = Tuple[float, float, float]
+
+class ScrapeScheduler:
+    """Tells collectors which servers have new samples in Prometheus.
+
+    Each target's scrape interval and last scrape time are learned from
+    Prometheus' ``/api/v1/targets`` and re-synced every
+    ``scrape_targets_refresh`` seconds. In between, scrapes are predicted from
+    that schedule, so a group of targets (one server) is only due once a scrape
+    newer than the one it was last collected from has landed. Targets
+    Prometheus does not know fall back to ``metrics_update_interval``, and so
+    does every target while the targets API cannot be reached, rather than
+    being predicted from schedules that may have changed since; targets
+    pushing through remote write are due whenever they push.
+    """
+
+    def __init__(self):
+        self.schedules: Dict[str, Schedule] = {}
+        self.collected: Dict[str, Tuple[float, ...]] = {}
+        self.refreshed_at = 0.0
+
+    async def refresh(self):
+        """Re-learn scrape intervals and times from the targets API"""
+        self.refreshed_at = time.monotonic()
+        targets = await prometheus_client.get_targets()
+        if targets is None:
+            if self.schedules:
+                logger.warning(f"Scrape targets unavailable, collecting every {settings.metrics_update_interval}s until they are back")
+                self.schedules = {}
+            return
+        schedules = {}
+        for target in targets:
+            try:
+                instance = target["labels"]["instance"]
+                interval = parse_duration(target["scrapeInterval"])
+                last = datetime.fromisoformat(target["lastScrape"].replace("Z", "+00:00")).timestamp()
+                duration = float(target.get("lastScrapeDuration") or 0)
+            except (KeyError, TypeError, ValueError):
+                continue
+            if interval > 0 and last > 0:
+                schedules[instance] = (interval, last, duration + settings.scrape_align_delay)
+        self.schedules = schedules
+        logger.debug(f"Learned scrape schedules of {len(schedules)} targets")
+
+    def _schedule(self, target: str) -> Schedule:
+        return self.schedules.get(target, (float(settings.metrics_update_interval), 0.0, 0.0))
+
+    def latest_sample(self, target: str, now: float) -> float:
+        """Time of the newest samples of ``target`` that are queryable at ``now``"""
+        if remote_write_store.is_fresh(target):
+            return remote_write_store.last_push[target]
+        interval, last, lag = self._schedule(target)
+        return max(last, last + (now - lag - last) // interval * interval)
+
+    def next_sample(self, target: str, now: float) -> float:
+        """When the next samples of ``target`` become queryable"""
+        interval, _, lag = self._schedule(target)
+        return self.latest_sample(target, now) + interval + lag
+
+    async def due(self, groups: Dict[str, List[str]]) -> List[str]:
+        """Groups with samples newer than when they were last returned"""
+        if time.monotonic() - self.refreshed_at >= settings.scrape_targets_refresh:
+            await self.refresh()
+        now = time.time()
+        due = []
+        for name, targets in groups.items():
+            latest = tuple(self.latest_sample(target, now) for target in targets)
+            if self.collected.get(name) != latest:
+                self.collected[name] = latest
+                due.append(name)
+        return due
+
+    def forget(self, name: str):
+        """Make a group due again, e.g. after its collection failed"""
+        self.collected.pop(name, None)
+
+    def next_delay(self, groups: Dict[str, List[str]]) -> float:
+        """Seconds until any group has new samples"""
+        now = time.time()
+        for name, targets in groups.items():
+            # Samples that landed while the last collection was running
+            if self.collected.get(name) != tuple(self.latest_sample(target, now) for target in targets):
+                return 0.0
+        wake = min(self.next_sample(target, now) for targets in groups.values() for target in targets)
+        # Wake up for the next re-sync at the latest
+        return min(max(0.0, wake - now), settings.scrape_targets_refresh)
+
+# Global scrape scheduler instance
+scrape_scheduler = ScrapeScheduler()
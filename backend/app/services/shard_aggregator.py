@@ -0,0 +1,120 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from ..config import settings
+from ..models.server_metrics import PartialSnapshot, SystemOverview
+from .metrics_collector import metrics_collector, SERVER_TYPES
+from .sharding import HashRing
+
+logger = logging.getLogger(__name__)
+
+# Partials arriving within this window are merged into one published snapshot
+COALESCE_SECONDS = 0.25
+
+class ShardAggregator:
+    """Merges partial snapshots pushed by shard collectors into one SystemOverview.
+
+    Membership is implicit: a node is a member while it keeps pushing (an empty
+    push is a join) and is dropped after ``shard_member_ttl`` seconds of silence.
+    Every push is answered with the current member list, from which each node
+    builds the same ``HashRing`` and collects only the sections it owns.
+    """
+
+    def __init__(self):
+        self.ring = HashRing()
+        self.members: Dict[str, float] = {}
+        self.sections: Dict[str, Tuple[Any, str, float]] = {}
+        self._changed: Optional[asyncio.Event] = None
+        self._published_fresh: frozenset = frozenset()
+
+    def _get_changed(self) -> asyncio.Event:
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        return self._changed
+
+    def _expire_members(self, now: float):
+        for node_id, last_seen in list(self.members.items()):
+            if now - last_seen > settings.shard_member_ttl:
+                self.remove_member(node_id, reason="timed out")
+
+    def remove_member(self, node_id: str, reason: str = "left") -> bool:
+        """Drop a node from the ring so its sections move to the others"""
+        if node_id not in self.members:
+            return False
+        del self.members[node_id]
+        self.ring.remove_node(node_id)
+        logger.info(f"Shard collector {node_id} {reason}. Members: {sorted(self.members)}")
+        self._get_changed().set()
+        return True
+
+    def receive(self, partial: PartialSnapshot) -> Dict[str, Any]:
+        """Record a push from a shard collector and return the cluster status"""
+        now = time.monotonic()
+        if partial.node_id not in self.members:
+            self.ring.add_node(partial.node_id)
+            logger.info(f"Shard collector {partial.node_id} joined. Members: {sorted(self.members) + [partial.node_id]}")
+        self.members[partial.node_id] = now
+        self._expire_members(now)
+
+        for server_type in SERVER_TYPES:
+            metrics = getattr(partial, server_type)
+            if metrics is None:
+                continue
+            if self.ring.owner(server_type) != partial.node_id and server_type in self.sections:
+                # Late push from the previous owner of a section that was rebalanced
+                continue
+            self.sections[server_type] = (metrics, partial.node_id, now)
+            self._get_changed().set()
+
+        return self.status()
+
+    def status(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "members": sorted(self.members),
+            "assignments": self.ring.assignments(SERVER_TYPES),
+            "sections": {
+                server_type: {
+                    "node_id": node_id,
+                    "age_seconds": round(now - received, 3)
+                }
+                for server_type, (_, node_id, received) in self.sections.items()
+            }
+        }
+
+    def _fresh_sections(self, now: float) -> Dict[str, Any]:
+        return {
+            server_type: metrics
+            for server_type, (metrics, _, received) in self.sections.items()
+            if now - received <= settings.shard_member_ttl
+        }
+
+    def build_overview(self) -> SystemOverview:
+        """Merge the fresh sections; missing or stale ones become error placeholders"""
+        return metrics_collector.build_overview(self._fresh_sections(time.monotonic()))
+
+    async def run(self, publish: Callable[[SystemOverview], Awaitable[None]]):
+        """Publish a merged snapshot whenever partials arrive or sections go stale"""
+        changed = self._get_changed()
+        logger.info("Started shard aggregation")
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(changed.wait(), timeout=settings.shard_member_ttl)
+                    await asyncio.sleep(COALESCE_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                now = time.monotonic()
+                self._expire_members(now)
+                fresh = frozenset(self._fresh_sections(now))
+                if not changed.is_set() and fresh == self._published_fresh:
+                    continue
+                changed.clear()
+                self._published_fresh = fresh
+                if self.sections:
+                    await publish(self.build_overview())
+        finally:
+            logger.info("Stopped shard aggregation")
+
+shard_aggregator = ShardAggregator()
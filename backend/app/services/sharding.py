@@ -0,0 +1,59 @@
+import bisect
+import hashlib
+from typing import Dict, Iterable, List, Optional
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+class HashRing:
+    """Consistent hash ring mapping inventory keys to collector nodes.
+
+    Each node is placed on the ring at ``replicas`` virtual points, so when a
+    node joins or leaves only the keys next to its points move to another node.
+    Every process that builds a ring from the same member list gets the same
+    assignments, so no coordination service is needed.
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), replicas: int = 64):
+        self.replicas = replicas
+        self._points: List[int] = []
+        self._owners: Dict[int, str] = {}
+        self.nodes: List[str] = []
+        for node in nodes:
+            self.add_node(node)
+
+    def add_node(self, node: str):
+        if node in self.nodes:
+            return
+        self.nodes.append(node)
+        for replica in range(self.replicas):
+            point = _hash(f"{node}#{replica}")
+            self._owners[point] = node
+            bisect.insort(self._points, point)
+
+    def remove_node(self, node: str):
+        if node not in self.nodes:
+            return
+        self.nodes.remove(node)
+        for replica in range(self.replicas):
+            point = _hash(f"{node}#{replica}")
+            if self._owners.get(point) == node:
+                del self._owners[point]
+                index = bisect.bisect_left(self._points, point)
+                del self._points[index]
+
+    def owner(self, key: str) -> Optional[str]:
+        """Node responsible for ``key``"""
+        if not self._points:
+            return None
+        index = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[self._points[index]]
+
+    def assignments(self, keys: Iterable[str]) -> Dict[str, List[str]]:
+        """Keys owned by every node"""
+        shards: Dict[str, List[str]] = {node: [] for node in self.nodes}
+        for key in keys:
+            owner = self.owner(key)
+            if owner is not None:
+                shards[owner].append(key)
+        return shards
@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import os
+import time
+from typing import AsyncIterator, Optional, Set, Tuple
+from ..models.server_metrics import SystemOverview
+from .offload import offload_pool
+
+logger = logging.getLogger(__name__)
+
+# Snapshots are sent as one line each: "<version> <SystemOverview JSON>\n"
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+# Subscribers with more than this much unsent data are dropped instead of buffered
+MAX_PENDING_BYTES = 8 * 1024 * 1024
+
+class SnapshotPublisher:
+    """Serves snapshots to worker processes over a local Unix socket.
+
+    Every subscriber receives the latest snapshot as soon as it connects and
+    every new one after that. Each snapshot is serialized once, however many
+    workers are listening.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # Start from the clock so versions keep increasing across collector restarts
+        self.version = int(time.time())
+        self._frame: Optional[bytes] = None
+        self._writers: Set[asyncio.StreamWriter] = set()
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._handle_subscriber, path=self.path)
+        os.chmod(self.path, 0o660)
+        logger.info(f"Publishing snapshots on {self.path}")
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        for writer in list(self._writers):
+            writer.close()
+        self._writers.clear()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    async def _handle_subscriber(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._writers.add(writer)
+        logger.info(f"Snapshot subscriber connected. Total subscribers: {len(self._writers)}")
+        if self._frame:
+            writer.write(self._frame)
+        try:
+            # Subscribers never send anything; EOF means they went away
+            await reader.read()
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+            logger.info(f"Snapshot subscriber disconnected. Total subscribers: {len(self._writers)}")
+
+    def publish(self, overview: SystemOverview) -> int:
+        """Send a snapshot to all subscribers and return its version"""
+        self.version += 1
+        self._frame = f"{self.version} ".encode() + overview.model_dump_json().encode() + b"\n"
+        for writer in list(self._writers):
+            if writer.transport.get_write_buffer_size() > MAX_PENDING_BYTES:
+                logger.warning("Dropping snapshot subscriber that stopped reading")
+                self._writers.discard(writer)
+                writer.close()
+                continue
+            writer.write(self._frame)
+        return self.version
+
+class SnapshotSubscriber:
+    """Receives snapshots from a ``SnapshotPublisher``, reconnecting as needed"""
+
+    def __init__(self, path: str, retry_interval: float = 1.0):
+        self.path = path
+        self.retry_interval = retry_interval
+
+    async def snapshots(self) -> AsyncIterator[Tuple[int, SystemOverview]]:
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path, limit=MAX_FRAME_BYTES)
+            except OSError as e:
+                logger.warning(f"Collector socket {self.path} unavailable: {e}")
+                await asyncio.sleep(self.retry_interval)
+                continue
+
+            logger.info(f"Connected to collector socket {self.path}")
+            try:
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    version, payload = line.split(b" ", 1)
+                    # Parsed off the event loop, as the largest payload a worker reads
+                    yield int(version), await offload_pool.run(SystemOverview.model_validate_json, payload)
+            except (OSError, ValueError) as e:
+                logger.error(f"Collector socket error: {e}")
+            finally:
+                writer.close()
+            logger.warning("Lost connection to collector process, reconnecting")
+            await asyncio.sleep(self.retry_interval)
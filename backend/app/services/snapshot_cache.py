@@ -0,0 +1,57 @@
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Optional, Tuple
+from ..models.server_metrics import SystemOverview
+
+logger = logging.getLogger(__name__)
+
+class SnapshotCache:
+    """The last snapshot on local disk, so a restarted process has data right away.
+
+    The file holds ``{"version": ..., "overview": ...}`` and is replaced
+    atomically, so a crash mid-write leaves the previous snapshot in place.
+    Every save writes its own temporary file, so workers sharing the path and
+    overlapping saves in one process never truncate each other's writes.
+    An empty path disables the cache.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def save(self, overview: SystemOverview, version: int):
+        if not self.path:
+            return
+        directory, name = os.path.split(os.path.abspath(self.path))
+        tmp_path = None
+        try:
+            with tempfile.NamedTemporaryFile("w", dir=directory, prefix=f"{name}.", suffix=".tmp", delete=False) as f:
+                tmp_path = f.name
+                f.write(f'{{"version": {version}, "overview": {overview.model_dump_json()}}}')
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Failed to write snapshot cache {self.path}: {e}")
+            if tmp_path is not None:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+
+    def load(self) -> Optional[Tuple[int, float, SystemOverview]]:
+        """Cached ``(version, saved_at, overview)``, marked stale, or None"""
+        if not self.path or not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path) as f:
+                document = json.load(f)
+            overview = SystemOverview(**document["overview"])
+            saved_at = os.path.getmtime(self.path)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable snapshot cache {self.path}: {e}")
+            return None
+        overview.stale = True
+        logger.info(f"Loaded snapshot {document['version']} from {self.path}, "
+                    f"{time.time() - saved_at:.0f}s old")
+        return document["version"], saved_at, overview
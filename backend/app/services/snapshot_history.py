@@ -0,0 +1,53 @@
+from collections import deque
+from typing import Deque, Dict, FrozenSet, Optional, Set, Tuple
+from ..models.server_metrics import SystemOverview
+
+# Overview sections tracked for "changed since version" reads
+SECTIONS = ("ai_server", "app_server", "storage_server")
+# Left out of a section's fingerprint: fields that move with the clock on every
+# collection, and forecasts the capacity forecaster writes back into the
+# snapshot, so only a change of the collected metrics counts
+_FORECASTS = {"__all__": {"growth_gb_per_day", "days_to_full"}}
+FINGERPRINT_EXCLUDE = {
+    "server_status": {"last_updated", "response_time_ms", "uptime_seconds"},
+    "vms": {"__all__": {"uptime_seconds"}},
+    "disks": _FORECASTS,
+    "filesystems": _FORECASTS,
+}
+
+class SnapshotHistory:
+    """Which overview sections changed in each of the last ``size`` snapshot versions.
+
+    Sections are compared by a hash of their JSON without
+    ``FINGERPRINT_EXCLUDE``, so it works the same for snapshots collected here
+    and snapshots received from a collector process.
+    """
+
+    def __init__(self, size: int):
+        self.entries: Deque[Tuple[int, FrozenSet[str]]] = deque(maxlen=size)
+        self._fingerprints: Dict[str, int] = {}
+
+    def record(self, version: int, overview: SystemOverview):
+        if self.entries and self.entries[-1][0] == version:
+            return
+        fingerprints = {
+            section: hash(getattr(overview, section).model_dump_json(exclude=FINGERPRINT_EXCLUDE))
+            for section in SECTIONS
+        }
+        changed = frozenset(
+            section for section in SECTIONS
+            if fingerprints[section] != self._fingerprints.get(section)
+        )
+        self._fingerprints = fingerprints
+        self.entries.append((version, changed))
+
+    def changed_since(self, version: int) -> Optional[Set[str]]:
+        """Sections changed after ``version``, or None if it is outside the history"""
+        if not self.entries or not self.entries[0][0] <= version <= self.entries[-1][0]:
+            # Too old, or from a restarted collector
+            return None
+        changed: Set[str] = set()
+        for entry_version, sections in self.entries:
+            if entry_version > version:
+                changed |= sections
+        return changed
@@ -0,0 +1,288 @@
+import asyncio
+import logging
+import time
+from contextvars import ContextVar, Token
+from typing import Optional, Tuple
+from ..config import settings
+from ..models.server_metrics import SystemOverview, AIServerMetrics, AppServerMetrics, StorageServerMetrics
+from .alert_engine import alert_engine
+from .anomaly_detector import anomaly_detector
+from .capacity import capacity_forecaster
+from .metrics_collector import metrics_collector
+from .offload import offload_pool
+from .shard_aggregator import shard_aggregator
+from .snapshot_history import SnapshotHistory
+from .snapshot_bus import SnapshotSubscriber
+from .snapshot_cache import SnapshotCache
+
+logger = logging.getLogger(__name__)
+
+# Snapshot that reads in the current context are served from, see SnapshotStore.pin
+_pinned: ContextVar[Optional[SystemOverview]] = ContextVar("pinned_snapshot", default=None)
+
+class SnapshotStore:
+    """Latest system snapshot shared by REST handlers and WebSocket broadcasting.
+
+    The feed starts with the application and every read is served from the
+    latest snapshot. Until the first one arrives, the snapshot persisted by the
+    previous run is served marked ``stale``.
+
+    In ``embedded`` collector mode this process collects its own snapshots. In
+    ``external`` mode snapshots are produced by the
+    standalone collector process (``python -m app.collector``) and received over
+    its Unix socket, so any number of uvicorn workers share one collection. In
+    ``aggregator`` mode they are merged from partial snapshots pushed by shard
+    collectors (``python -m app.collector --aggregator URL``).
+    """
+
+    def __init__(self):
+        self.overview: Optional[SystemOverview] = None
+        self.version = 0
+        self.updated_at: Optional[float] = None
+        # When the next snapshot is expected, for Cache-Control max-age
+        self.next_update_at: Optional[float] = None
+        self._published_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.generation = 0
+        self._condition: Optional[asyncio.Condition] = None
+        self._refresh: Optional[asyncio.Event] = None
+        self._feed_task: Optional[asyncio.Task] = None
+        self._consumers = 0
+        self.cache = SnapshotCache(settings.snapshot_cache_file)
+        self.history = SnapshotHistory(settings.long_poll_history_size)
+        # (version, JSON) of the last snapshot served by overview_json
+        self._encoded: Optional[Tuple[int, str]] = None
+
+    @property
+    def external(self) -> bool:
+        """Whether snapshots are produced outside this process"""
+        return settings.collector_mode in ("external", "aggregator")
+
+    def _get_condition(self) -> asyncio.Condition:
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    def request_refresh(self):
+        """Start the next embedded collection early, e.g. when pushed samples arrive"""
+        if self._refresh is not None:
+            self._refresh.set()
+
+    async def _wait_next_cycle(self, started: float, timeout: float):
+        if self._refresh is None:
+            self._refresh = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._refresh.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return
+        self._refresh.clear()
+        # Coalesce bursts of refresh requests into one collection
+        delay = settings.remote_write_min_refresh - (time.monotonic() - started)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def publish(self, overview: SystemOverview, version: Optional[int] = None):
+        """Store a new snapshot and wake everyone waiting for one"""
+        alert_engine.evaluate(overview)
+        if settings.anomaly_detection:
+            anomaly_detector.update(overview)
+        capacity_forecaster.update(overview)
+        condition = self._get_condition()
+        async with condition:
+            now = time.time()
+            # Snapshots produced elsewhere are expected at the interval seen so far
+            interval = now - self._published_at if self._published_at else settings.metrics_update_interval
+            self.overview = overview
+            self.version = version if version is not None else self.version + 1
+            self.updated_at = self._published_at = now
+            self.next_update_at = now + interval
+            self.history.record(self.version, overview)
+            self.last_error = None
+            self.generation += 1
+            condition.notify_all()
+        # In external mode the collector process keeps the cache. Under load the
+        # save is skipped rather than queued; the next snapshot is saved instead
+        if settings.collector_mode != "external" and not offload_pool.full:
+            await offload_pool.run(self.cache.save, overview, self.version)
+
+    async def publish_error(self, error: str):
+        """Record a failed collection so waiting consumers can report it"""
+        condition = self._get_condition()
+        async with condition:
+            self.last_error = error
+            self.generation += 1
+            condition.notify_all()
+
+    async def wait_for_change(self, generation: int, timeout: Optional[float] = None) -> bool:
+        """Wait until a snapshot or error newer than ``generation`` is available"""
+        condition = self._get_condition()
+        async with condition:
+            try:
+                await asyncio.wait_for(
+                    condition.wait_for(lambda: self.generation != generation), timeout
+                )
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+    async def wait_for_version(self, version: int, timeout: float) -> bool:
+        """Wait up to ``timeout`` seconds for a snapshot newer than ``version``"""
+        condition = self._get_condition()
+        async with condition:
+            try:
+                await asyncio.wait_for(
+                    condition.wait_for(lambda: self.overview is not None and self.version != version), timeout
+                )
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+    def load_cached(self):
+        """Serve the snapshot persisted by the previous run until a fresh one arrives"""
+        if self.overview is not None:
+            return
+        cached = self.cache.load()
+        if cached:
+            self.version, self.updated_at, self.overview = cached
+            self.history.record(self.version, self.overview)
+            self.generation += 1
+
+    async def start(self):
+        """Load the cached snapshot and start the feed; the first collection runs in the background"""
+        self.load_cached()
+        self.acquire()
+
+    async def stop(self):
+        """Stop the snapshot feed regardless of remaining consumers"""
+        self._consumers = 0
+        await self._stop_feed()
+
+    def acquire(self):
+        """Register a consumer; starts the snapshot feed if it is not running"""
+        self._consumers += 1
+        if self._feed_task is None or self._feed_task.done():
+            if settings.collector_mode == "aggregator":
+                feed = shard_aggregator.run(self.publish)
+            elif settings.collector_mode == "external":
+                feed = self._subscribe()
+            else:
+                feed = self._produce()
+            self._feed_task = asyncio.create_task(feed)
+
+    async def release(self):
+        """Unregister a consumer; embedded collection stops with the last one"""
+        self._consumers = max(0, self._consumers - 1)
+        if self._consumers == 0 and not self.external:
+            await self._stop_feed()
+
+    async def _stop_feed(self):
+        if self._feed_task and not self._feed_task.done():
+            self._feed_task.cancel()
+            try:
+                await self._feed_task
+            except asyncio.CancelledError:
+                pass
+        self._feed_task = None
+
+    async def _produce(self):
+        """Embedded mode: collect periodically in this process"""
+        logger.info("Started embedded metrics collection")
+        sections = {}
+        try:
+            while True:
+                try:
+                    started = time.monotonic()
+                    overview = await metrics_collector.collect_changed(sections)
+                    if overview is not None:
+                        await self.publish(overview)
+                    delay = metrics_collector.next_collection_delay()
+                    self.next_update_at = time.time() + delay
+                    await self._wait_next_cycle(started, delay)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Error in metrics collection: {e}")
+                    await self.publish_error(str(e))
+                    # Wait before retrying
+                    await asyncio.sleep(10)
+        finally:
+            logger.info("Stopped embedded metrics collection")
+
+    async def _subscribe(self):
+        """External mode: receive snapshots from the collector process"""
+        subscriber = SnapshotSubscriber(settings.collector_socket)
+        async for version, overview in subscriber.snapshots():
+            await self.publish(overview, version=version)
+
+    def pin(self, overview: SystemOverview) -> Token:
+        """Serve every read in the current context from ``overview``, e.g. for one batch request"""
+        return _pinned.set(overview)
+
+    def unpin(self, token: Token):
+        _pinned.reset(token)
+
+    @property
+    def pinned(self) -> bool:
+        """Whether reads in the current context are served from a pinned snapshot"""
+        return _pinned.get() is not None
+
+    def etag(self) -> Optional[str]:
+        """Strong ETag of the latest snapshot, or None before the first one.
+
+        The collection time keeps versions from different runs apart, as the
+        version restarts at 1 when there is no cached snapshot.
+        """
+        if self.overview is None:
+            return None
+        return self._etag(self.version, self.overview)
+
+    @staticmethod
+    def _etag(version: int, overview: SystemOverview) -> str:
+        return f'"{version}-{int(overview.last_updated.timestamp() * 1000)}"'
+
+    def expires_in(self) -> float:
+        """Seconds until the next snapshot is expected; 0 when overdue or unknown"""
+        if self.next_update_at is None or self.overview is None or self.overview.stale:
+            return 0
+        return max(0.0, self.next_update_at - time.time())
+
+    async def _latest(self) -> SystemOverview:
+        pinned = _pinned.get()
+        if pinned is not None:
+            return pinned
+        if self.overview is None:
+            await self.wait_for_change(self.generation, timeout=settings.scrape_timeout)
+        if self.overview is None:
+            raise RuntimeError(self.last_error or "No snapshot collected yet")
+        return self.overview
+
+    async def get_overview(self) -> SystemOverview:
+        """Current system overview"""
+        return await self._latest()
+
+    async def overview_json(self) -> Tuple[str, str]:
+        """ETag and JSON of the latest snapshot, encoded once per version in the offload pool.
+
+        The version is read together with the snapshot it belongs to, and the
+        body returned is the one encoded from it, even if a newer snapshot is
+        published, or encoded by another request, while this one waits.
+        """
+        await self._latest()
+        version, overview = self.version, self.overview
+        encoded = self._encoded
+        if encoded is None or encoded[0] != version:
+            encoded = (version, await offload_pool.run(overview.model_dump_json, timeout=settings.offload_wait))
+            if version == self.version:
+                self._encoded = encoded
+        return self._etag(version, overview), encoded[1]
+
+    async def get_ai_server_metrics(self) -> AIServerMetrics:
+        return (await self._latest()).ai_server
+
+    async def get_app_server_metrics(self) -> AppServerMetrics:
+        return (await self._latest()).app_server
+
+    async def get_storage_server_metrics(self) -> StorageServerMetrics:
+        return (await self._latest()).storage_server
+
+snapshot_store = SnapshotStore()
@@ -1,25 +1,52 @@
 import asyncio
 import json
 import logging
-from typing import Set, Dict, Any
+from typing import Set, Dict, Any, Optional, Tuple
 from datetime import datetime
 from fastapi import WebSocket, WebSocketDisconnect
-from .metrics_collector import metrics_collector
-from ..models.server_metrics import MetricsUpdate
+from .alert_engine import alert_engine
+from .anomaly_detector import anomaly_detector
+from .heartbeat import HeartbeatWheel
+from .offload import offload_pool
+from .snapshot_store import snapshot_store
+from ..models.server_metrics import MetricsUpdate, SystemOverview
 from ..config import settings
 
 logger = logging.getLogger(__name__)
 
+def encode_snapshot(overview: SystemOverview) -> Dict[str, str]:
+    """metrics_update messages of the overview and of each server"""
+    timestamp = datetime.now()
+    sections = {
+        "overview": overview,
+        "ai_server": overview.ai_server,
+        "app_server": overview.app_server,
+        "storage_server": overview.storage_server
+    }
+    return {
+        server_type: json.dumps(MetricsUpdate(
+            timestamp=timestamp,
+            server_type=server_type,
+            data=section.dict(),
+            event_type="metrics_update"
+        ).dict(), default=str)
+        for server_type, section in sections.items()
+    }
+
 class WebSocketManager:
     def __init__(self):
         self.active_connections: Set[WebSocket] = set()
         self.is_broadcasting = False
         self.broadcast_task = None
+        self.heartbeats = HeartbeatWheel(settings.websocket_heartbeat_interval, settings.websocket_dead_after)
+        # (snapshot version, messages) of the last snapshot encoded
+        self._encoded: Optional[Tuple[int, Dict[str, str]]] = None
     
     async def connect(self, websocket: WebSocket):
         """Accept a new WebSocket connection"""
         await websocket.accept()
         self.active_connections.add(websocket)
+        self.heartbeats.register(websocket, "metrics")
         logger.info(f"WebSocket connected. Total connections: {len(self.active_connections)}")
         
         # Start broadcasting if this is the first connection
@@ -29,6 +56,7 @@ class WebSocketManager:
     async def disconnect(self, websocket: WebSocket):
         """Remove a WebSocket connection"""
         self.active_connections.discard(websocket)
+        self.heartbeats.unregister(websocket)
         logger.info(f"WebSocket disconnected. Total connections: {len(self.active_connections)}")
         
         # Stop broadcasting if no connections remain
@@ -37,6 +65,24 @@ class WebSocketManager:
             if self.broadcast_task:
                 self.broadcast_task.cancel()
     
+    async def snapshot_messages(self) -> Optional[Dict[str, str]]:
+        """Messages of the latest snapshot, encoded once per version in the offload pool"""
+        overview = snapshot_store.overview
+        if overview is None:
+            return None
+        version = snapshot_store.version
+        if self._encoded is None or self._encoded[0] != version:
+            self._encoded = (version, await offload_pool.run(encode_snapshot, overview))
+        return self._encoded[1]
+    
+    async def send_snapshot(self, websocket: WebSocket):
+        """Send the latest snapshot to a newly connected client without waiting for the next one"""
+        messages = await self.snapshot_messages()
+        if messages is None:
+            return
+        for message in messages.values():
+            await self.send_personal_message(message, websocket)
+    
     async def send_personal_message(self, message: str, websocket: WebSocket):
         """Send a message to a specific WebSocket"""
         try:
@@ -61,6 +107,7 @@ class WebSocketManager:
         # Remove disconnected connections
         for connection in disconnected:
             self.active_connections.discard(connection)
+            self.heartbeats.unregister(connection)
     
     async def broadcast_metrics_update(self, server_type: str, data: Dict[str, Any]):
         """Broadcast a metrics update to all connected clients"""
@@ -74,41 +121,69 @@ class WebSocketManager:
         message = json.dumps(update.dict(), default=str)
         await self.broadcast_message(message)
     
+    async def broadcast_alert(self, alert: Dict[str, Any]):
+        """Broadcast an alert firing or resolving to all connected clients"""
+        update = MetricsUpdate(
+            timestamp=datetime.now(),
+            server_type=alert["server_type"] or "overview",
+            data=alert,
+            event_type="alert"
+        )
+        
+        message = json.dumps(update.dict(), default=str)
+        await self.broadcast_message(message)
+    
+    async def broadcast_anomaly(self, anomaly: Dict[str, Any]):
+        """Broadcast a series becoming anomalous or normal again to all connected clients"""
+        update = MetricsUpdate(
+            timestamp=datetime.now(),
+            server_type=anomaly["server_type"] or "overview",
+            data=anomaly,
+            event_type="anomaly"
+        )
+        
+        message = json.dumps(update.dict(), default=str)
+        await self.broadcast_message(message)
+    
     async def _start_broadcasting(self):
-        """Start the periodic metrics broadcasting"""
+        """Broadcast every new snapshot while clients are connected"""
         self.is_broadcasting = True
         logger.info("Started WebSocket metrics broadcasting")
+        snapshot_store.acquire()
         
         try:
+            # Clients receive the current snapshot on connect, so start from the next one
+            generation = snapshot_store.generation
+            alert_sequence = alert_engine.sequence
+            anomaly_sequence = anomaly_detector.sequence
             while self.is_broadcasting and self.active_connections:
-                try:
-                    # Collect all metrics
-                    overview = await metrics_collector.collect_all_metrics()
-                    
-                    # Broadcast overview
-                    await self.broadcast_metrics_update("overview", overview.dict())
-                    
-                    # Broadcast individual server metrics
-                    await self.broadcast_metrics_update("ai_server", overview.ai_server.dict())
-                    await self.broadcast_metrics_update("app_server", overview.app_server.dict())
-                    await self.broadcast_metrics_update("storage_server", overview.storage_server.dict())
-                    
-                    # Wait for next update interval
-                    await asyncio.sleep(settings.metrics_update_interval)
-                    
-                except Exception as e:
-                    logger.error(f"Error in metrics broadcasting: {e}")
+                await snapshot_store.wait_for_change(generation)
+                generation = snapshot_store.generation
+                
+                if snapshot_store.last_error:
                     # Send error message to clients
                     error_update = MetricsUpdate(
                         timestamp=datetime.now(),
                         server_type="error",
-                        data={"error": str(e), "message": "Failed to collect metrics"},
+                        data={"error": snapshot_store.last_error, "message": "Failed to collect metrics"},
                         event_type="error"
                     )
                     await self.broadcast_message(json.dumps(error_update.dict(), default=str))
-                    
-                    # Wait before retrying
-                    await asyncio.sleep(10)
+                    continue
+                
+                # Broadcast overview, then individual server metrics
+                for message in (await self.snapshot_messages()).values():
+                    await self.broadcast_message(message)
+                
+                # Broadcast alerts that started firing or resolved with this snapshot
+                alert_sequence, transitions = alert_engine.events_since(alert_sequence)
+                for alert in transitions:
+                    await self.broadcast_alert(alert.dict())
+                
+                # Broadcast series that became anomalous or normal again
+                anomaly_sequence, anomalies = anomaly_detector.events_since(anomaly_sequence)
+                for anomaly in anomalies:
+                    await self.broadcast_anomaly(anomaly.dict())
                     
         except asyncio.CancelledError:
             logger.info("WebSocket broadcasting cancelled")
@@ -116,16 +191,25 @@ class WebSocketManager:
             logger.error(f"Unexpected error in broadcasting: {e}")
         finally:
             self.is_broadcasting = False
+            await snapshot_store.release()
             logger.info("Stopped WebSocket metrics broadcasting")
     
-    async def send_heartbeat(self):
-        """Send heartbeat to all connected clients"""
-        heartbeat = {
-            "event_type": "heartbeat",
-            "timestamp": datetime.now().isoformat(),
-            "connections": len(self.active_connections)
-        }
-        await self.broadcast_message(json.dumps(heartbeat))
+    async def shutdown(self):
+        """Stop broadcasting and close all connections"""
+        self.is_broadcasting = False
+        if self.broadcast_task and not self.broadcast_task.done():
+            self.broadcast_task.cancel()
+            try:
+                await self.broadcast_task
+            except asyncio.CancelledError:
+                pass
+        for connection in self.active_connections.copy():
+            try:
+                await connection.close(code=1001)
+            except Exception:
+                pass
+        self.active_connections.clear()
+        await self.heartbeats.shutdown()
 
 # Global WebSocket manager instance
 websocket_manager = WebSocketManager()
\ No newline at end of file
@@ -0,0 +1,132 @@
+"""
+Prometheus admission control check.
+
+Runs ``collect_all_metrics`` cycles against the in-process fake backends
+while ``--exports`` concurrent bulk exports (``exporter.export_rows``) keep
+the fake Prometheus busy with range queries, in three phases:
+
+- idle: no exports, the collector's latency on its own
+- unlimited: exports running, no admission control
+- scheduled: exports running, ``PROMETHEUS_MAX_CONCURRENCY`` slots and
+  ``PROMETHEUS_CLASS_LIMITS``, so live queries are admitted ahead of queued
+  export queries and exports never hold every slot
+
+For each phase it reports the collection latency and the scheduler's wait
+times per priority class.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.admission --exports 8 --cycles 10
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from typing import Any, Dict, Optional
+
+from .fakes import FakeBackends, FleetSpec
+from .report import build_meta, compare_files, percentiles, write_result
+
+
+async def _export(args, stop: asyncio.Event):
+    from app.services.exporter import EXPORT_METRICS, export_rows
+    from app.services.metrics_collector import SERVER_TYPES
+
+    while not stop.is_set():
+        end = time.time()
+        async for _ in export_rows(SERVER_TYPES, EXPORT_METRICS, end - args.export_hours * 3600, end, args.step):
+            if stop.is_set():
+                return
+
+
+async def run_phase(args, exports: int, limit: Optional[int]) -> Dict[str, Any]:
+    from app.config import settings
+    from app.services.metrics_collector import metrics_collector
+    from app.services.prometheus_client import prometheus_client
+    from app.services.query_scheduler import QueryScheduler
+
+    class_limits = settings.prometheus_class_limits if limit else {}
+    prometheus_client.scheduler = QueryScheduler(limit or 10000, settings.prometheus_queue_timeouts, class_limits)
+    stop = asyncio.Event()
+    tasks = [asyncio.create_task(_export(args, stop)) for _ in range(exports)]
+    try:
+        # Let the exports fill the queue first
+        await asyncio.sleep(1 if exports else 0)
+        latencies = []
+        for _ in range(args.cycles):
+            start = time.perf_counter()
+            await metrics_collector.collect_all_metrics()
+            latencies.append((time.perf_counter() - start) * 1000)
+    finally:
+        stop.set()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    stats = prometheus_client.scheduler.stats()
+    return {
+        "collect_ms": percentiles(latencies),
+        "wait_ms": {priority: c["wait_ms"] for priority, c in stats["classes"].items() if c["wait_ms"]},
+        "rejected": {priority: c["rejected"] for priority, c in stats["classes"].items() if c["rejected"]},
+    }
+
+
+async def run(args) -> Dict[str, Any]:
+    # Settings are read at import time, so the app is imported only now
+    from app.config import settings
+    from app.services.metrics_collector import metrics_collector
+    from app.services.prometheus_client import prometheus_client
+
+    await metrics_collector.collect_all_metrics()
+    results = {}
+    for name, exports, limit in (
+        ("idle", 0, settings.prometheus_max_concurrency),
+        ("unlimited", args.exports, None),
+        ("scheduled", args.exports, settings.prometheus_max_concurrency),
+    ):
+        results[name] = result = await run_phase(args, exports, limit)
+        collect = result["collect_ms"]
+        print(f"{name:9} collect p50 {collect['p50']:7.0f} ms, p95 {collect['p95']:7.0f} ms, "
+              f"live wait p95 {(result['wait_ms'].get('live') or {}).get('p95', 0):6.0f} ms")
+    await metrics_collector.close()
+    await prometheus_client.close()
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Prometheus admission control check")
+    parser.add_argument("--hosts", type=int, default=3)
+    parser.add_argument("--exports", type=int, default=8, help="concurrent bulk exports")
+    parser.add_argument("--export-hours", type=float, default=24, help="range of each export")
+    parser.add_argument("--step", type=int, default=60, help="export step in seconds")
+    parser.add_argument("--cycles", type=int, default=10)
+    parser.add_argument("--prometheus-latency-ms", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--label", default="local")
+    parser.add_argument("--output")
+    parser.add_argument("--compare")
+    parser.add_argument("--threshold", type=float, default=10.0)
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+    spec = FleetSpec(hosts=args.hosts, prometheus_latency_ms=args.prometheus_latency_ms, seed=args.seed)
+    with FakeBackends(spec) as backends:
+        os.environ.update(backends.environment())
+        results = asyncio.run(run(args))
+    parameters = {k: v for k, v in vars(args).items() if k not in ("output", "compare", "verbose", "label")}
+    result = {"meta": build_meta("admission", args.label, parameters), **results}
+    path = write_result(result, args.output)
+    print(f"results written to {path}")
+    if args.compare:
+        return compare_files(args.compare, result, args.threshold)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""
+Anomaly detection cost and accuracy check.
+
+Feeds synthetic ticks of ``--series`` series (noisy values around a per-series
+level) to ``AnomalyDetector.observe`` and reports the time to score one tick.
+After the warmup a few series per tick get a spike of ``--spike`` standard
+deviations, and the run checks those are the transitions the detector reports.
+It runs three times:
+
+- ``full``: every series has a new sample in every tick
+- ``repeated``: series belong to ``--sections`` sections and each tick only one
+  section is collected again, as with scrape-aligned collection; the other
+  series repeat their last value and are scored as if it were new
+- ``gated``: the same ticks, with only the collected section marked sampled,
+  as ``AnomalyDetector.update`` does
+
+No backends are needed; the detector is driven directly.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.anomaly_detection --series 5000 --ticks 200
+"""
+
+import argparse
+import logging
+import random
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+from .report import build_meta, compare_files, percentiles, write_result
+
+
+def make_ticks(args, partial: bool) -> Tuple[List[Tuple[str, str]], List[List[float]], List[set], List[List[bool]]]:
+    """Series keys, one value list per tick, the positions spiked in each tick
+    and which series were collected again in each tick"""
+    rng = random.Random(args.seed)
+    keys = [(f"metric_{i % 13}", f"host-{i // 13}") for i in range(args.series)]
+    sections = [(i // 13) % args.sections for i in range(args.series)]
+    levels = [rng.uniform(10, 1000) for _ in keys]
+    noise = [level * 0.05 for level in levels]
+    values = [rng.gauss(level, sigma) for level, sigma in zip(levels, noise)]
+    ticks, spiked, sampled = [], [], []
+    for tick in range(args.warmup * (args.sections if partial else 1) + args.ticks):
+        collected = [not partial or section == tick % args.sections for section in sections]
+        values = [rng.gauss(level, sigma) if fresh else value
+                  for level, sigma, value, fresh in zip(levels, noise, values, collected)]
+        positions = set()
+        if tick >= args.warmup * (args.sections if partial else 1):
+            candidates = [position for position, fresh in enumerate(collected) if fresh]
+            positions = set(rng.sample(candidates, args.spikes))
+            for position in positions:
+                values[position] = levels[position] + args.spike * noise[position]
+        ticks.append(values)
+        spiked.append(positions)
+        sampled.append(collected)
+    return keys, ticks, spiked, sampled
+
+
+def run_phase(args, gated: bool, keys, ticks, spiked, sampled, warmup: int) -> Dict[str, Any]:
+    from app.services.anomaly_detector import AnomalyDetector
+
+    detector = AnomalyDetector(args.alpha, args.zscore, args.warmup, expiry=len(ticks))
+    timestamp = datetime.now()
+    positions = {key: position for position, key in enumerate(keys)}
+    latencies, expected, detected, false_positives = [], 0, 0, 0
+    sequence = 0
+    for tick, values in enumerate(ticks):
+        start = time.perf_counter()
+        detector.observe(keys, values, timestamp, sampled[tick] if gated else None)
+        elapsed = (time.perf_counter() - start) * 1000
+        sequence, events = detector.events_since(sequence)
+        if tick < warmup:
+            continue
+        latencies.append(elapsed)
+        expected += len(spiked[tick])
+        for event in events:
+            if event.state != "anomalous":
+                continue
+            if positions[(event.metric, event.instance)] in spiked[tick]:
+                detected += 1
+            else:
+                false_positives += 1
+    return {
+        "tick_ms": percentiles(latencies),
+        "spikes_injected": expected,
+        "spikes_detected": detected,
+        "false_positives": false_positives,
+        "false_positive_rate": round(false_positives / (len(keys) * len(latencies)), 6) if latencies else None,
+        "active_at_end": len(detector.anomalies),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Anomaly detection cost and accuracy check")
+    parser.add_argument("--series", type=int, default=5000)
+    parser.add_argument("--ticks", type=int, default=200, help="scored ticks after the warmup")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--sections", type=int, default=3, help="sections collected in turn in the partial phases")
+    parser.add_argument("--spikes", type=int, default=3, help="spiked series per tick")
+    parser.add_argument("--spike", type=float, default=10.0, help="spike size in standard deviations")
+    parser.add_argument("--alpha", type=float, default=0.1)
+    parser.add_argument("--zscore", type=float, default=5.0, help="anomaly threshold")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--label", default="local")
+    parser.add_argument("--output")
+    parser.add_argument("--compare")
+    parser.add_argument("--threshold", type=float, default=10.0)
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+    results = {}
+    for name, partial, gated in (("full", False, False), ("repeated", True, False), ("gated", True, True)):
+        keys, ticks, spiked, sampled = make_ticks(args, partial)
+        warmup = args.warmup * (args.sections if partial else 1)
+        results[name] = result = run_phase(args, gated, keys, ticks, spiked, sampled, warmup)
+        print(f"{name:9} tick p50 {result['tick_ms']['p50']:.3f} ms, p99 {result['tick_ms']['p99']:.3f} ms, "
+              f"{result['spikes_detected']}/{result['spikes_injected']} spikes detected, "
+              f"{result['false_positives']} false positives")
+    parameters = {k: v for k, v in vars(args).items() if k not in ("output", "compare", "verbose", "label")}
+    result = {"meta": build_meta("anomaly_detection", args.label, parameters), **results}
+    path = write_result(result, args.output)
+    print(f"results written to {path}")
+    if args.compare:
+        return compare_files(args.compare, result, args.threshold)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,220 @@
+"""
+Collector benchmark against the in-process fake backends.
+
+Measures end-to-end ``collect_all_metrics`` latency, Prometheus queries and
+exporter requests per cycle, allocations per cycle, event-loop blocking time
+and the cost of a WebSocket broadcast tick, then writes the results as JSON.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.bench_collector --hosts 5 --cycles 30
+    python -m benchmarks.bench_collector --prometheus-latency-ms 20 --failure-rate 0.05 \\
+        --compare benchmarks/results/collector-baseline-....json
+"""
+
+import argparse
+import asyncio
+import gc
+import logging
+import os
+import sys
+import time
+import tracemalloc
+from typing import Any, Dict, List
+
+from .fakes import FakeBackends, FleetSpec
+from .report import build_meta, compare_files, percentiles, write_result
+
+
+class LoopBlockingProbe:
+    """Measures how late a periodic timer fires, i.e. how long the loop was blocked."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.lags: List[float] = []
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, loop.time() - expected))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    def summary(self) -> Dict[str, Any]:
+        lags_ms = [lag * 1000 for lag in self.lags]
+        stats = percentiles(lags_ms)
+        stats["total_blocked_ms"] = round(sum(lag for lag in lags_ms if lag > 1.0), 3)
+        return stats
+
+
+class RecordingWebSocket:
+    """Stand-in for a connected client; only counts what it is sent."""
+
+    def __init__(self):
+        self.frames = 0
+        self.bytes = 0
+
+    async def send_text(self, message: str):
+        self.frames += 1
+        self.bytes += len(message)
+
+
+async def run(args, backends: FakeBackends) -> Dict[str, Any]:
+    # Settings are read at import time, so the app is imported only now
+    from app.services.metrics_collector import metrics_collector
+    from app.services.prometheus_client import prometheus_client
+    from app.services.websocket_manager import websocket_manager
+
+    for _ in range(args.warmup):
+        await metrics_collector.collect_all_metrics()
+
+    latencies, queries, query_ranges, exporter, qdrant, failures = [], [], [], [], [], []
+    probe = LoopBlockingProbe()
+    probe.start()
+    overview = None
+    for _ in range(args.cycles):
+        backends.reset_counters()
+        start = time.perf_counter()
+        overview = await metrics_collector.collect_all_metrics()
+        latencies.append((time.perf_counter() - start) * 1000)
+        queries.append(backends.requests["prometheus.query"])
+        query_ranges.append(backends.requests["prometheus.query_range"])
+        exporter.append(backends.requests["node_exporter"] + backends.requests["gpu_exporter"])
+        qdrant.append(backends.requests["qdrant"])
+        failures.append(sum(backends.failures.values()))
+        if args.interval:
+            await asyncio.sleep(args.interval)
+    await probe.stop()
+
+    gc.collect()
+    tracemalloc.start()
+    alloc_peaks, alloc_retained = [], []
+    for _ in range(args.alloc_cycles):
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        await metrics_collector.collect_all_metrics()
+        after, peak = tracemalloc.get_traced_memory()
+        alloc_peaks.append((peak - before) / 1024)
+        alloc_retained.append((after - before) / 1024)
+    tracemalloc.stop()
+
+    clients = [RecordingWebSocket() for _ in range(args.ws_clients)]
+    websocket_manager.active_connections.update(clients)
+    broadcast_ms = []
+    for _ in range(args.broadcast_ticks):
+        start = time.perf_counter()
+        await websocket_manager.broadcast_metrics_update("overview", overview.dict())
+        await websocket_manager.broadcast_metrics_update("ai_server", overview.ai_server.dict())
+        await websocket_manager.broadcast_metrics_update("app_server", overview.app_server.dict())
+        await websocket_manager.broadcast_metrics_update("storage_server", overview.storage_server.dict())
+        broadcast_ms.append((time.perf_counter() - start) * 1000)
+    websocket_manager.active_connections.difference_update(clients)
+    await metrics_collector.close()
+    await prometheus_client.close()
+    tick_bytes = (clients[0].bytes / args.broadcast_ticks) if clients and args.broadcast_ticks else 0
+
+    return {
+        "collector": {
+            "latency_ms": percentiles(latencies),
+            "queries_per_cycle": percentiles(queries),
+            "query_range_per_cycle": percentiles(query_ranges),
+            "exporter_requests_per_cycle": percentiles(exporter),
+            "qdrant_requests_per_cycle": percentiles(qdrant),
+            "injected_failures_per_cycle": percentiles(failures),
+            "online_servers": overview.online_servers if overview else 0,
+        },
+        "allocations": {
+            "peak_kib_per_cycle": percentiles(alloc_peaks),
+            "retained_kib_per_cycle": percentiles(alloc_retained),
+        },
+        "event_loop": {
+            "lag_ms": probe.summary(),
+        },
+        "websocket": {
+            "clients": args.ws_clients,
+            "broadcast_tick_ms": percentiles(broadcast_ms),
+            "bytes_per_client_per_tick": tick_bytes,
+        },
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    fleet = parser.add_argument_group("fake fleet")
+    fleet.add_argument("--hosts", type=int, default=5, help="node exporter hosts known to Prometheus")
+    fleet.add_argument("--cpus", type=int, default=8, help="CPUs per host")
+    fleet.add_argument("--disks", type=int, default=2, help="filesystems per host")
+    fleet.add_argument("--interfaces", type=int, default=2, help="physical NICs per host")
+    fleet.add_argument("--gpus", type=int, default=1, help="GPUs on the AI server")
+    fleet.add_argument("--gpu-processes", type=int, default=2, help="processes per GPU")
+    fleet.add_argument("--qdrant-collections", type=int, default=4)
+    fleet.add_argument("--prometheus-latency-ms", type=float, default=0.0)
+    fleet.add_argument("--exporter-latency-ms", type=float, default=0.0)
+    fleet.add_argument("--qdrant-latency-ms", type=float, default=0.0)
+    fleet.add_argument("--jitter-ms", type=float, default=0.0)
+    fleet.add_argument("--failure-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    fleet.add_argument("--seed", type=int, default=42)
+    run_group = parser.add_argument_group("run")
+    run_group.add_argument("--cycles", type=int, default=20)
+    run_group.add_argument("--warmup", type=int, default=2)
+    run_group.add_argument("--alloc-cycles", type=int, default=3)
+    run_group.add_argument("--interval", type=float, default=0.0, help="pause between cycles in seconds")
+    run_group.add_argument("--ws-clients", type=int, default=100)
+    run_group.add_argument("--broadcast-ticks", type=int, default=10)
+    output = parser.add_argument_group("output")
+    output.add_argument("--label", default="local")
+    output.add_argument("--output", help="result file (default: benchmarks/results/...)")
+    output.add_argument("--compare", help="baseline result file to compare against")
+    output.add_argument("--threshold", type=float, default=10.0, help="regression threshold in percent")
+    output.add_argument("--verbose", action="store_true", help="show backend log output")
+    return parser.parse_args(argv)
+
+
+def spec_from_args(args) -> FleetSpec:
+    return FleetSpec(
+        hosts=args.hosts, cpus=args.cpus, disks=args.disks, interfaces=args.interfaces,
+        gpus=args.gpus, gpu_processes=args.gpu_processes, qdrant_collections=args.qdrant_collections,
+        prometheus_latency_ms=args.prometheus_latency_ms, exporter_latency_ms=args.exporter_latency_ms,
+        qdrant_latency_ms=args.qdrant_latency_ms, jitter_ms=args.jitter_ms,
+        failure_rate=args.failure_rate, seed=args.seed,
+    )
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+    spec = spec_from_args(args)
+    with FakeBackends(spec) as backends:
+        os.environ.update(backends.environment())
+        results = asyncio.run(run(args, backends))
+    parameters = {**spec.as_dict(), "cycles": args.cycles, "warmup": args.warmup,
+                  "interval": args.interval, "ws_clients": args.ws_clients, "series": len(backends.store)}
+    result = {"meta": build_meta("collector", args.label, parameters), **results}
+    path = write_result(result, args.output)
+
+    collector = results["collector"]
+    print(f"collect_all_metrics: p50 {collector['latency_ms']['p50']:.1f} ms, "
+          f"p95 {collector['latency_ms']['p95']:.1f} ms, "
+          f"{collector['queries_per_cycle']['mean']:.0f} queries/cycle")
+    print(f"event loop lag: max {results['event_loop']['lag_ms']['max']:.1f} ms, "
+          f"broadcast tick p50 {results['websocket']['broadcast_tick_ms']['p50']:.2f} ms "
+          f"for {args.ws_clients} clients")
+    print(f"results written to {path}")
+    if args.compare:
+        return compare_files(args.compare, result, args.threshold)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+Event loop lag under CPU-heavy requests.
+
+Starts the fake backends in this process and the real backend under uvicorn in
+a child process, once with the offload pool disabled (``OFFLOAD_WORKERS=0``)
+and once with ``--workers`` offload threads. In each phase ``--exports``
+clients download ``/api/export`` over and over for ``--duration`` seconds
+while a probe requests ``/api/health/live`` every ``--probe-interval``
+seconds. It reports:
+
+- probe latency, i.e. how long a cheap request waits behind the exports
+- the backend's own event loop lag and stalls from ``/api/health``, and how
+  many stalls came with a stack sample
+- export throughput
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.event_loop --exports 4 --export-hours 24 --duration 20
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+from .fakes import FakeBackends, FleetSpec
+from .report import build_meta, compare_files, percentiles, write_result
+from .ws_load import free_port, start_backend, wait_ready
+
+
+async def export_loop(client: httpx.AsyncClient, args, stop: asyncio.Event, totals: Dict[str, int]):
+    while not stop.is_set():
+        params = {"start": str(time.time() - args.export_hours * 3600), "step": str(args.step), "format": args.format}
+        try:
+            async with client.stream("GET", "/api/export", params=params) as response:
+                if response.status_code != 200:
+                    totals["refused"] += 1
+                    await asyncio.sleep(1)
+                    continue
+                async for chunk in response.aiter_bytes():
+                    totals["bytes"] += len(chunk)
+                    if stop.is_set():
+                        return
+            totals["exports"] += 1
+        except httpx.HTTPError:
+            totals["errors"] += 1
+
+
+async def probe_loop(client: httpx.AsyncClient, args, stop: asyncio.Event, latencies: List[float]):
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            await client.get("/api/health/live")
+            latencies.append((time.perf_counter() - started) * 1000)
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(args.probe_interval)
+
+
+async def run_phase(args, backends: FakeBackends, workers: int) -> Dict[str, Any]:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = {
+        **backends.environment(),
+        "OFFLOAD_WORKERS": str(workers),
+        "LOOP_STALL_THRESHOLD": str(args.stall_threshold),
+    }
+    process = start_backend(env, port, args)
+    try:
+        await wait_ready(base_url)
+        async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+            # Let the first collection finish before measuring
+            await client.get("/api/servers/overview")
+            stop = asyncio.Event()
+            totals = {"bytes": 0, "exports": 0, "refused": 0, "errors": 0}
+            latencies: List[float] = []
+            tasks = [asyncio.create_task(export_loop(client, args, stop, totals)) for _ in range(args.exports)]
+            tasks.append(asyncio.create_task(probe_loop(client, args, stop, latencies)))
+            started = time.monotonic()
+            await asyncio.sleep(args.duration)
+            stop.set()
+            await asyncio.gather(*tasks)
+            elapsed = time.monotonic() - started
+            health = (await client.get("/api/health")).json()
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+    loop = health["event_loop"]
+    return {
+        "probe_ms": percentiles(latencies),
+        "probe_max_ms": round(max(latencies), 1) if latencies else 0,
+        "loop_lag_ms": loop["lag_ms"],
+        "loop_max_lag_ms": loop["max_lag_ms"],
+        "stalls": loop["stalls"],
+        "stalls_with_stack": sum(1 for stall in loop["recent_stalls"] if stall["stack"]),
+        "offload": health["offload"],
+        "export_mib_per_s": round(totals["bytes"] / 1024 / 1024 / elapsed, 2),
+        "exports_completed": totals["exports"],
+        "exports_refused": totals["refused"],
+    }
+
+
+async def run(args, backends: FakeBackends) -> Dict[str, Any]:
+    results = {}
+    for name, workers in (("inline", 0), ("offload", args.workers)):
+        results[name] = result = await run_phase(args, backends, workers)
+        probe = result["probe_ms"]
+        print(f"{name:8} probe p50 {probe.get('p50', 0):6.1f} ms, p99 {probe.get('p99', 0):6.1f} ms, "
+              f"max {result['probe_max_ms']:6.1f} ms; loop max lag {result['loop_max_lag_ms']:6.1f} ms, "
+              f"{result['stalls']} stalls ({result['stalls_with_stack']} of the last with a stack); "
+              f"exports {result['export_mib_per_s']:.2f} MiB/s")
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Event loop lag under CPU-heavy requests")
+    parser.add_argument("--exports", type=int, default=4, help="concurrent export clients")
+    parser.add_argument("--export-hours", type=float, default=24, help="range of each export")
+    parser.add_argument("--step", type=int, default=60, help="export step in seconds")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--workers", type=int, default=2, help="OFFLOAD_WORKERS of the offload phase")
+    parser.add_argument("--stall-threshold", type=float, default=0.1, help="LOOP_STALL_THRESHOLD for the backend")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per phase")
+    parser.add_argument("--probe-interval", type=float, default=0.05)
+    parser.add_argument("--hosts", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--label", default="local")
+    parser.add_argument("--output")
+    parser.add_argument("--compare")
+    parser.add_argument("--threshold", type=float, default=10.0)
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+    spec = FleetSpec(hosts=args.hosts, seed=args.seed)
+    with FakeBackends(spec) as backends:
+        results = asyncio.run(run(args, backends))
+    parameters = {k: v for k, v in vars(args).items() if k not in ("output", "compare", "verbose", "label")}
+    result = {"meta": build_meta("event_loop", args.label, parameters), **results}
+    path = write_result(result, args.output)
+    print(f"results written to {path}")
+    if args.compare:
+        return compare_files(args.compare, result, args.threshold)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""
+Bulk export memory check.
+
+Starts the fake backends in this process and the real backend under uvicorn in
+a child process, then downloads ``/api/export`` for growing time ranges in
+CSV and Parquet. The body is streamed and discarded. For each download it
+reports bytes, duration and the backend's peak RSS above its RSS before the
+download, which should stay flat as the range grows.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.export --days 1,7,28 --step 300
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from typing import Any, Dict
+
+import httpx
+
+from .fakes import FakeBackends, FleetSpec
+from .report import build_meta, compare_files, write_result
+from .ws_load import ProcessSampler, free_port, start_backend, wait_ready
+
+MB = 1024 * 1024
+
+
+async def download(base_url: str, params: Dict[str, Any], sampler: ProcessSampler) -> Dict[str, Any]:
+    stop = asyncio.Event()
+    sampler.rss.clear()
+    baseline = sampler.process.memory_info().rss
+    sampling = asyncio.create_task(sampler.run(stop))
+    size = 0
+    start = time.perf_counter()
+    try:
+        async with httpx.AsyncClient(timeout=httpx.Timeout(60, read=None)) as client:
+            async with client.stream("GET", f"{base_url}/api/export", params=params) as response:
+                response.raise_for_status()
+                async for piece in response.aiter_bytes():
+                    size += len(piece)
+    finally:
+        stop.set()
+        await sampling
+    return {
+        "bytes": size,
+        "seconds": round(time.perf_counter() - start, 2),
+        "peak_rss_growth_mb": round((max(sampler.rss, default=baseline) - baseline) / MB, 1),
+    }
+
+
+async def run(args, backends: FakeBackends) -> Dict[str, Any]:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    process = start_backend(backends.environment(), port, args)
+    results: Dict[str, Any] = {}
+    try:
+        await wait_ready(base_url)
+        sampler = ProcessSampler(process.pid, interval=0.05)
+        end = time.time()
+        for format in args.formats.split(","):
+            for days in (int(day) for day in args.days.split(",")):
+                params = {"start": end - days * 86400, "end": end, "step": args.step, "format": format}
+                result = results.setdefault(format, {})[f"{days}d"] = await download(base_url, params, sampler)
+                print(f"{format:8} {days:3}d {result['bytes'] / MB:8.1f} MB in {result['seconds']:6.1f} s, "
+                      f"peak RSS +{result['peak_rss_growth_mb']:.1f} MB")
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk export memory check")
+    parser.add_argument("--days", default="1,7", help="comma-separated export ranges in days")
+    parser.add_argument("--formats", default="csv,parquet")
+    parser.add_argument("--step", type=int, default=300, help="seconds between exported points")
+    parser.add_argument("--hosts", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--label", default="local")
+    parser.add_argument("--output")
+    parser.add_argument("--compare")
+    parser.add_argument("--threshold", type=float, default=10.0)
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+    spec = FleetSpec(hosts=args.hosts, seed=args.seed)
+    with FakeBackends(spec) as backends:
+        results = asyncio.run(run(args, backends))
+    parameters = {k: v for k, v in vars(args).items() if k not in ("output", "compare", "verbose", "label")}
+    result = {"meta": build_meta("export", args.label, parameters), **results}
+    path = write_result(result, args.output)
+    print(f"results written to {path}")
+    if args.compare:
+        return compare_files(args.compare, result, args.threshold)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,447 @@
+"""
+In-process stand-ins for the services the backend talks to.
+
+A ``FakeBackends`` instance runs a fake Prometheus HTTP API, one node exporter
+(and optionally a GPU exporter) per host and a fake Qdrant on loopback
+addresses in a background thread, so the backend under test keeps its own
+event loop to itself. Every host gets its own 127.x.y.z address so instance
+labels stay distinct while all exporters share one port, exactly like the
+``settings.node_exporter_port`` layout the collector assumes.
+"""
+
+import asyncio
+import hashlib
+import random
+import socket
+import threading
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+import uvicorn
+import yaml
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, Response
+
+from .promql import Evaluator, PromQLError, Series, SeriesStore, parse_duration
+
+# Roles of the first hosts, in the order the collector expects them
+ROLES = ["ai_server", "storage_server", "app_server", "user_vm", "proxmox"]
+CPU_MODES = {
+    "idle": 0.70, "user": 0.15, "system": 0.06, "iowait": 0.04,
+    "steal": 0.02, "nice": 0.01, "irq": 0.01, "softirq": 0.01,
+}
+STORAGE_MOUNTS = ["/mnt/ingest", "/mnt/data", "/mnt/storage"]
+
+
+@dataclass
+class FleetSpec:
+    """Shape and behaviour of the fake fleet."""
+    hosts: int = 5
+    cpus: int = 8
+    disks: int = 2
+    interfaces: int = 2
+    gpus: int = 1
+    gpu_processes: int = 2  # processes per GPU with per-process memory series
+    qdrant_collections: int = 4
+    prometheus_latency_ms: float = 0.0
+    prometheus_replicas: int = 1
+    # Chance per request that the replica stalls everything for prometheus_pause_ms, like a GC pause
+    prometheus_pause_rate: float = 0.0
+    prometheus_pause_ms: float = 0.0
+    exporter_latency_ms: float = 0.0
+    qdrant_latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    failure_rate: float = 0.0
+    seed: int = 42
+
+    def as_dict(self) -> Dict[str, float]:
+        return asdict(self)
+
+
+def host_address(index: int) -> str:
+    """Loopback address of the index-th fake host (127.0.0.2 onwards)."""
+    n = index + 2
+    return f"127.{(n >> 16) & 255}.{(n >> 8) & 255}.{n & 255}"
+
+
+def _seeded(*parts) -> random.Random:
+    digest = hashlib.sha1("|".join(map(str, parts)).encode()).digest()
+    return random.Random(int.from_bytes(digest[:8], "big"))
+
+
+@dataclass
+class FakeHost:
+    index: int
+    address: str
+    role: str
+    node_series: List[Series] = field(default_factory=list)
+    gpu_series: List[Series] = field(default_factory=list)
+    exposition: str = ""
+    gpu_exposition: str = ""
+
+
+def build_fleet(spec: FleetSpec, node_port: int, gpu_port: int) -> Tuple[List[FakeHost], SeriesStore]:
+    """Generate hosts and their series according to the spec."""
+    store = SeriesStore()
+    hosts = []
+    for index in range(spec.hosts):
+        role = ROLES[index] if index < len(ROLES) else f"node-{index}"
+        host = FakeHost(index=index, address=host_address(index), role=role)
+        instance = f"{host.address}:{node_port}"
+        rng = _seeded(spec.seed, index)
+        base = {"instance": instance, "job": role.replace("_", "-")}
+
+        def add(name, extra=None, **signal):
+            labels = {"__name__": name, **base, **(extra or {})}
+            series = Series(labels, phase=rng.uniform(0, 6.28), **signal)
+            host.node_series.append(series)
+            store.add(series)
+
+        add("up", base=1.0)
+        for cpu in range(spec.cpus):
+            for mode, share in CPU_MODES.items():
+                add("node_cpu_seconds_total", {"cpu": str(cpu), "mode": mode},
+                    counter=True, base=rng.uniform(1e5, 1e6), rate=share * rng.uniform(0.8, 1.2))
+
+        mem_total = rng.choice([16, 32, 64, 128, 256]) * 1024**3
+        add("node_memory_MemTotal_bytes", base=float(mem_total))
+        add("node_memory_MemAvailable_bytes", base=mem_total * 0.45, amplitude=mem_total * 0.1)
+        add("node_memory_Cached_bytes", base=mem_total * 0.2, amplitude=mem_total * 0.02)
+        add("node_memory_Buffers_bytes", base=mem_total * 0.02)
+        for name, value in (("node_load1", 1.5), ("node_load5", 1.2), ("node_load15", 1.0)):
+            add(name, base=value * spec.cpus / 8, amplitude=0.5)
+        add("node_boot_time_seconds", base=time.time() - rng.uniform(1, 30) * 86400)
+        for sensor in range(2):
+            add("node_hwmon_temp_celsius", {"chip": "platform_coretemp_0", "sensor": f"temp{sensor + 1}"},
+                base=rng.uniform(40, 60), amplitude=5)
+
+        mounts = ["/", "/boot"] + [f"/mnt/disk{n}" for n in range(max(0, spec.disks - 2))]
+        if role == "storage_server":
+            mounts += STORAGE_MOUNTS
+        for n, mount in enumerate(mounts):
+            size = rng.choice([0.5, 1, 2, 4, 8]) * 1024**4 if mount != "/boot" else 1024**3
+            labels = {"mountpoint": mount, "device": f"/dev/sd{chr(97 + n)}1", "fstype": "ext4"}
+            add("node_filesystem_size_bytes", labels, base=float(size))
+            add("node_filesystem_avail_bytes", labels, base=size * rng.uniform(0.2, 0.8),
+                slope=-size * rng.uniform(1e-9, 1e-7))
+        add("node_filesystem_size_bytes", {"mountpoint": "/run", "device": "tmpfs", "fstype": "tmpfs"},
+            base=float(2 * 1024**3))
+        add("node_filesystem_avail_bytes", {"mountpoint": "/run", "device": "tmpfs", "fstype": "tmpfs"},
+            base=float(2 * 1024**3))
+
+        devices = ["lo", "docker0"] + [f"eth{n}" for n in range(spec.interfaces)]
+        for device in devices:
+            speed = rng.uniform(1e5, 5e7)
+            for direction in ("receive", "transmit"):
+                add(f"node_network_{direction}_bytes_total", {"device": device}, counter=True, rate=speed)
+                add(f"node_network_{direction}_packets_total", {"device": device}, counter=True, rate=speed / 900)
+                add(f"node_network_{direction}_errs_total", {"device": device}, counter=True,
+                    rate=rng.choice([0.0, 0.0, 0.01]))
+
+        if role == "ai_server" and spec.gpus:
+            gpu_instance = f"{host.address}:{gpu_port}"
+            for gpu in range(spec.gpus):
+                gpu_base = {"instance": gpu_instance, "job": "ai-server-gpu",
+                            "uuid": f"GPU-{index:04d}-{gpu:04d}", "index": str(gpu)}
+                total = 24 * 1024**3
+
+                def add_gpu(name, extra=None, **signal):
+                    labels = {"__name__": name, **gpu_base, **(extra or {})}
+                    series = Series(labels, phase=rng.uniform(0, 6.28), **signal)
+                    host.gpu_series.append(series)
+                    store.add(series)
+
+                add_gpu("nvidia_smi_gpu_info", {"name": "NVIDIA RTX A5000"}, base=1.0)
+                add_gpu("nvidia_smi_utilization_gpu_ratio", base=0.55, amplitude=0.4)
+                add_gpu("nvidia_smi_memory_total_bytes", base=float(total))
+                add_gpu("nvidia_smi_memory_used_bytes", base=total * 0.5, amplitude=total * 0.3)
+                add_gpu("nvidia_smi_temperature_gpu", base=65, amplitude=10)
+                add_gpu("nvidia_smi_power_draw_watts", base=180, amplitude=60)
+                add_gpu("nvidia_smi_fan_speed_ratio", base=0.5, amplitude=0.2)
+                for process in range(spec.gpu_processes):
+                    add_gpu("nvidia_smi_process_used_memory_bytes",
+                            {"pid": str(4000 + gpu * 100 + process), "process_name": f"python{process}"},
+                            base=total * 0.2, amplitude=total * 0.05)
+
+        host.exposition = _exposition(host.node_series)
+        host.gpu_exposition = _exposition(host.gpu_series)
+        hosts.append(host)
+    return hosts, store
+
+
+def _exposition(series: List[Series]) -> str:
+    now = time.time()
+    lines = []
+    for s in series:
+        labels = ",".join(f'{k}="{v}"' for k, v in s.labels.items() if k not in ("__name__", "instance", "job"))
+        name = s.labels["__name__"]
+        lines.append(f"{name}{{{labels}}} {s.value_at(now)}" if labels else f"{name} {s.value_at(now)}")
+    return "\n".join(lines) + "\n"
+
+
+class FakeBackends:
+    """Runs all fake services on loopback in a dedicated thread."""
+
+    def __init__(self, spec: FleetSpec):
+        self.spec = spec
+        self.requests: Counter = Counter()
+        self.failures: Counter = Counter()
+        # Samples read by dashboard queries ("query") and recording rules ("rules")
+        self.samples: Counter = Counter()
+        self.rule_evaluations = 0
+        self.rules: List[Tuple[str, str]] = []
+        self.rule_interval = 15.0
+        self._rules_evaluated_at = 0.0
+        self._rng = random.Random(spec.seed)
+        self._sockets: List[socket.socket] = []
+        self._routes: Dict[Tuple[str, int], object] = {}
+        self._server: Optional[uvicorn.Server] = None
+        self._thread: Optional[threading.Thread] = None
+
+        # Replicas share one store, like Prometheus servers scraping the same targets
+        self.prometheus_ports = [self._bind("127.0.0.1", 0, self._prometheus) for _ in range(spec.prometheus_replicas)]
+        self.prometheus_port = self.prometheus_ports[0]
+        # Replica indexes answering 503, as while restarting
+        self.down_replicas: Set[int] = set()
+        self._paused_until = [0.0] * spec.prometheus_replicas
+        self.qdrant_port = self._bind("127.0.0.1", 0, self._qdrant)
+        self.node_port = self._bind(host_address(0), 0, self._node_exporter)
+        self.gpu_port = self._bind(host_address(0), 0, self._gpu_exporter)
+        for index in range(1, spec.hosts):
+            self._bind(host_address(index), self.node_port, self._node_exporter)
+
+        self.hosts, self.store = build_fleet(spec, self.node_port, self.gpu_port)
+        self.hosts_by_address = {host.address: host for host in self.hosts}
+        self.evaluator = Evaluator(self.store)
+        self.collections = [f"collection_{n}" for n in range(spec.qdrant_collections)]
+
+    # ------------------------------------------------------------------
+    # lifecycle
+    # ------------------------------------------------------------------
+
+    def _bind(self, host: str, port: int, handler) -> int:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
+        sock.listen(1024)
+        sock.set_inheritable(True)
+        bound = sock.getsockname()[1]
+        self._sockets.append(sock)
+        self._routes[(host, bound)] = handler
+        return bound
+
+    def environment(self) -> Dict[str, str]:
+        """Environment variables pointing the backend settings at the fakes."""
+        env = {
+            "PROMETHEUS_URL": ",".join(f"http://127.0.0.1:{port}" for port in self.prometheus_ports),
+            "QDRANT_URL": f"http://127.0.0.1:{self.qdrant_port}",
+            "NODE_EXPORTER_PORT": str(self.node_port),
+            "GPU_EXPORTER_PORT": str(self.gpu_port),
+            # Start every run cold instead of from a previous run's snapshot
+            "SNAPSHOT_CACHE_FILE": "",
+        }
+        for host in self.hosts[:len(ROLES)]:
+            env[f"{host.role.upper()}_IP"] = host.address
+        # Roles beyond the fleet size point at an address nothing listens on
+        for index, role in enumerate(ROLES[len(self.hosts):], start=len(self.hosts)):
+            env[f"{role.upper()}_IP"] = host_address(index)
+        return env
+
+    def start(self):
+        config = uvicorn.Config(self._asgi, interface="asgi3", log_level="warning",
+                                lifespan="off", access_log=False)
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(
+            target=lambda: asyncio.run(self._server.serve(sockets=self._sockets)),
+            name="fake-backends", daemon=True
+        )
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("fake backends did not start")
+            time.sleep(0.01)
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.should_exit = True
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def reset_counters(self):
+        self.requests.clear()
+        self.failures.clear()
+        self.samples.clear()
+        self.rule_evaluations = 0
+
+    def load_recording_rules(self, path: str):
+        """Evaluate the recording rules of a Prometheus rule file from now on."""
+        with open(path) as f:
+            document = yaml.safe_load(f)
+        self.rules = []
+        for group in document.get("groups", []):
+            self.rule_interval = parse_duration(group.get("interval", "15s"))
+            self.rules += [(rule["record"], rule["expr"]) for rule in group["rules"] if "record" in rule]
+        self._rules_evaluated_at = 0.0
+        self.evaluate_rules(time.time())
+
+    def evaluate_rules(self, now: float):
+        """Materialise recorded series, like Prometheus' rule manager every interval."""
+        before = self.evaluator.samples_read
+        for record, expr in self.rules:
+            vector = self.evaluator.eval(self.evaluator.parse(expr), now)
+            self.store.by_name[record] = [Series({**labels, "__name__": record}, base=value)
+                                          for labels, value in vector]
+        self.samples["rules"] += self.evaluator.samples_read - before
+        self.rule_evaluations += 1
+        self._rules_evaluated_at = now
+
+    # ------------------------------------------------------------------
+    # request handling
+    # ------------------------------------------------------------------
+
+    async def _asgi(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        host, port = scope["server"]
+        handler = self._routes.get((host, port))
+        request = Request(scope, receive)
+        if handler is None:
+            response = PlainTextResponse("unknown listener", status_code=404)
+        else:
+            response = await handler(request)
+        await response(scope, receive, send)
+
+    async def _inject(self, kind: str, latency_ms: float) -> Optional[Response]:
+        self.requests[kind] += 1
+        delay = latency_ms + (self._rng.uniform(0, self.spec.jitter_ms) if self.spec.jitter_ms else 0)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        if self.spec.failure_rate and self._rng.random() < self.spec.failure_rate:
+            self.failures[kind] += 1
+            return PlainTextResponse("injected failure", status_code=503)
+        return None
+
+    async def _prometheus(self, request: Request) -> Response:
+        path = request.url.path
+        kind = {
+            "/api/v1/query": "prometheus.query",
+            "/api/v1/query_range": "prometheus.query_range",
+        }.get(path, "prometheus.other")
+        replica = self.prometheus_ports.index(request.scope["server"][1])
+        self.requests[f"prometheus.replica{replica}"] += 1
+        if replica in self.down_replicas:
+            return PlainTextResponse("replica down", status_code=503)
+        if self.spec.prometheus_pause_rate:
+            now = time.monotonic()
+            if now >= self._paused_until[replica] and self._rng.random() < self.spec.prometheus_pause_rate:
+                self._paused_until[replica] = now + self.spec.prometheus_pause_ms / 1000
+            if self._paused_until[replica] > now:
+                await asyncio.sleep(self._paused_until[replica] - now)
+        failure = await self._inject(kind, self.spec.prometheus_latency_ms)
+        if failure:
+            return failure
+
+        params = dict(request.query_params)
+        if request.method == "POST":
+            params.update(await request.form())
+        now = time.time()
+        if self.rules and now - self._rules_evaluated_at >= self.rule_interval:
+            self.evaluate_rules(now)
+        before = self.evaluator.samples_read
+        try:
+            if path == "/api/v1/query":
+                t = float(params.get("time") or now)
+                data = self.evaluator.instant(params["query"], t)
+            elif path == "/api/v1/query_range":
+                start, end = _timestamp(params["start"]), _timestamp(params["end"])
+                step = _step(params.get("step", "15s"))
+                data = self.evaluator.range(params["query"], start, end, step)
+            elif path == "/api/v1/targets":
+                data = self._targets()
+            elif path == "/-/healthy":
+                return PlainTextResponse("Prometheus Server is Healthy.\n")
+            else:
+                return JSONResponse({"status": "error", "errorType": "not_found", "error": path}, 404)
+        except (PromQLError, KeyError, ValueError) as e:
+            return JSONResponse({"status": "error", "errorType": "bad_data", "error": str(e)}, 400)
+        finally:
+            self.samples["query"] += self.evaluator.samples_read - before
+        return JSONResponse({"status": "success", "data": data})
+
+    def _targets(self) -> Dict[str, List]:
+        now = time.time()
+        active = []
+        for host in self.hosts:
+            for job_suffix, series, port in (("", host.node_series, self.node_port),
+                                             ("-gpu", host.gpu_series, self.gpu_port)):
+                if not series:
+                    continue
+                interval = 10 if host.role == "ai_server" else 15
+                last = now - (now % interval)
+                active.append({
+                    "labels": {"instance": f"{host.address}:{port}", "job": host.role.replace("_", "-") + job_suffix},
+                    "scrapeInterval": f"{interval}s",
+                    "lastScrape": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(last)) + f".{int(last % 1 * 1e6):06d}Z",
+                    "lastScrapeDuration": 0.01,
+                    "health": "up",
+                })
+        return {"activeTargets": active, "droppedTargets": []}
+
+    async def _node_exporter(self, request: Request) -> Response:
+        failure = await self._inject("node_exporter", self.spec.exporter_latency_ms)
+        if failure:
+            return failure
+        host = self.hosts_by_address.get(request.scope["server"][0])
+        return PlainTextResponse(host.exposition if host else "")
+
+    async def _gpu_exporter(self, request: Request) -> Response:
+        failure = await self._inject("gpu_exporter", self.spec.exporter_latency_ms)
+        if failure:
+            return failure
+        host = self.hosts_by_address.get(request.scope["server"][0])
+        return PlainTextResponse(host.gpu_exposition if host else "")
+
+    async def _qdrant(self, request: Request) -> Response:
+        failure = await self._inject("qdrant", self.spec.qdrant_latency_ms)
+        if failure:
+            return failure
+        path = request.url.path.rstrip("/")
+        if path in ("/health", "/healthz"):
+            return PlainTextResponse("healthz check passed")
+        if path == "/collections":
+            return JSONResponse({"result": {"collections": [{"name": n} for n in self.collections]},
+                                 "status": "ok"})
+        if path.startswith("/collections/"):
+            name = path.split("/", 2)[2]
+            if name not in self.collections:
+                return JSONResponse({"status": {"error": "Not found"}}, 404)
+            points = _seeded(self.spec.seed, name).randint(10_000, 5_000_000)
+            return JSONResponse({"result": {"status": "green", "points_count": points,
+                                            "vectors_count": points}, "status": "ok"})
+        return JSONResponse({"status": {"error": "Not found"}}, 404)
+
+
+def _timestamp(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        from datetime import datetime
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def _step(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        return parse_duration(value)
+
@@ -0,0 +1,192 @@
+"""
+WebSocket heartbeat and dead-connection check.
+
+Starts the fake backends in this process and the real backend under uvicorn in
+a child process, with a short ``--interval``, ``--dead-after`` and uvicorn
+``--ping-interval``/``--ping-timeout``. It then opens growing numbers of
+``--endpoint`` WebSocket clients. Most of them only answer uvicorn's WebSocket
+pings, as any client library does, and never send a message (with
+``--app-pong`` they also answer every heartbeat with a ``pong`` message, like
+the dashboard). A ``--silent-fraction`` answers no pings and stands in for
+dead peers; with ``--app-pong`` these answer the first heartbeat and then go
+quiet, so the silence deadline closes them before the pings do. For each
+step it reports:
+
+- event loop tasks and RSS of the backend per connection, which should stay flat
+- heartbeats received by live clients per interval
+- silent clients closed by the backend, and how long after connecting
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.heartbeat --steps 250,500,1000 --silent-fraction 0.2
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+import websockets
+from websockets.legacy.client import WebSocketClientProtocol
+
+from .fakes import FakeBackends, FleetSpec
+from .report import build_meta, compare_files, percentiles, write_result
+from .ws_load import ProcessSampler, free_port, raise_fd_limit, start_backend, wait_ready
+
+
+class DeafProtocol(WebSocketClientProtocol):
+    """A client that never answers pings, like a peer that went away"""
+
+    async def pong(self, data=b""):
+        pass
+
+
+class Client:
+    def __init__(self, silent: bool):
+        self.silent = silent
+        self.connected_at: Optional[float] = None
+        self.closed_after: Optional[float] = None
+        self.heartbeats = 0
+
+
+async def run_client(url: str, client: Client, args, stop: asyncio.Event):
+    protocol = DeafProtocol if client.silent else WebSocketClientProtocol
+    try:
+        async with websockets.connect(url, ping_interval=None, open_timeout=60, close_timeout=1,
+                                      create_protocol=protocol) as ws:
+            client.connected_at = time.monotonic()
+            while not stop.is_set():
+                try:
+                    message = await asyncio.wait_for(ws.recv(), timeout=1)
+                except asyncio.TimeoutError:
+                    continue
+                if '"heartbeat"' not in message:
+                    continue
+                client.heartbeats += 1
+                if args.app_pong and (not client.silent or client.heartbeats == 1):
+                    await ws.send('{"type": "pong"}')
+    except websockets.ConnectionClosed:
+        if client.connected_at is not None:
+            client.closed_after = time.monotonic() - client.connected_at
+    except Exception:
+        pass
+
+
+async def liveness(base_url: str) -> Dict[str, Any]:
+    async with httpx.AsyncClient(timeout=30) as http:
+        return (await http.get(f"{base_url}/api/health")).json()["websockets"]
+
+
+async def run_step(base_url: str, count: int, args, sampler: ProcessSampler, idle: Dict[str, Any]) -> Dict[str, Any]:
+    url = base_url.replace("http", "ws") + f"/ws/{args.endpoint}"
+    stop = asyncio.Event()
+    silent_every = round(1 / args.silent_fraction) if args.silent_fraction else 0
+    clients = [Client(silent=bool(silent_every) and i % silent_every == 0) for i in range(count)]
+    tasks = []
+    for client in clients:
+        tasks.append(asyncio.create_task(run_client(url, client, args, stop)))
+        await asyncio.sleep(1 / args.ramp_rate)
+    # Long enough for every silent client to miss a ping, or pass its deadline and be visited once more
+    await asyncio.sleep(max(args.ping_interval + args.ping_timeout, args.dead_after + args.interval) + args.interval + 2)
+    stats = await liveness(base_url)
+    rss = sampler.process.memory_info().rss
+    ended = time.monotonic()
+    stop.set()
+    await asyncio.gather(*tasks)
+
+    live = [client for client in clients if not client.silent and client.connected_at is not None]
+    silent = [client for client in clients if client.silent and client.connected_at is not None]
+    reaped = [client.closed_after for client in silent if client.closed_after is not None]
+    connections = stats["connections"]
+    return {
+        "clients": count,
+        "connections": connections,
+        "tasks_per_connection": round((stats["event_loop_tasks"] - idle["tasks"]) / connections, 2) if connections else 0,
+        "rss_kib_per_connection": round((rss - idle["rss"]) / 1024 / connections, 1) if connections else 0,
+        "live_clients_closed": sum(1 for client in live if client.closed_after is not None),
+        "heartbeats_per_interval": round(
+            sum(client.heartbeats / (ended - client.connected_at) * args.interval for client in live) / len(live), 2
+        ) if live else 0,
+        "silent_clients": len(silent),
+        "silent_reaped": len(reaped),
+        "reaped_after_s": percentiles(reaped),
+    }
+
+
+async def run(args, backends: FakeBackends) -> Dict[str, Any]:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = {
+        **backends.environment(),
+        "WEBSOCKET_HEARTBEAT_INTERVAL": str(args.interval),
+        "WEBSOCKET_DEAD_AFTER": str(args.dead_after),
+    }
+    process = start_backend(env, port, args, "--ws-ping-interval", str(args.ping_interval),
+                            "--ws-ping-timeout", str(args.ping_timeout))
+    steps: List[Dict[str, Any]] = []
+    try:
+        await wait_ready(base_url)
+        sampler = ProcessSampler(process.pid)
+        await asyncio.sleep(1)
+        idle = {"tasks": (await liveness(base_url))["event_loop_tasks"], "rss": sampler.process.memory_info().rss}
+        for count in args.steps:
+            result = await run_step(base_url, count, args, sampler, idle)
+            steps.append(result)
+            reaped = result["reaped_after_s"]
+            print(f"{count:6d} clients: {result['connections']} live, "
+                  f"{result['tasks_per_connection']:.2f} tasks/conn, {result['rss_kib_per_connection']:.1f} KiB/conn, "
+                  f"{result['heartbeats_per_interval']:.2f} heartbeats/interval, "
+                  f"reaped {result['silent_reaped']}/{result['silent_clients']} silent "
+                  f"(p95 {reaped.get('p95', 0):.1f} s), {result['live_clients_closed']} live closed")
+            # Let the backend drop the closed connections before the next step
+            await asyncio.sleep(2)
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+    return {"steps": {str(step["clients"]): step for step in steps}}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="WebSocket heartbeat and dead-connection check")
+    parser.add_argument("--steps", default="250,500,1000", help="comma-separated client counts")
+    parser.add_argument("--endpoint", choices=["heartbeat", "metrics"], default="heartbeat")
+    parser.add_argument("--silent-fraction", type=float, default=0.2, help="share of clients that never answer pings")
+    parser.add_argument("--app-pong", action="store_true", help="live clients also answer heartbeats with a pong message")
+    parser.add_argument("--interval", type=int, default=2, help="WEBSOCKET_HEARTBEAT_INTERVAL for the backend")
+    parser.add_argument("--dead-after", type=int, default=6, help="WEBSOCKET_DEAD_AFTER for the backend")
+    parser.add_argument("--ping-interval", type=float, default=5.0, help="uvicorn --ws-ping-interval")
+    parser.add_argument("--ping-timeout", type=float, default=5.0, help="uvicorn --ws-ping-timeout")
+    parser.add_argument("--ramp-rate", type=float, default=500.0, help="new connections per second")
+    parser.add_argument("--hosts", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--label", default="local")
+    parser.add_argument("--output")
+    parser.add_argument("--compare")
+    parser.add_argument("--threshold", type=float, default=10.0)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+    args.steps = [int(n) for n in args.steps.split(",")]
+    return args
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+    raise_fd_limit(max(args.steps) * 2 + 256)
+    spec = FleetSpec(hosts=args.hosts, seed=args.seed)
+    with FakeBackends(spec) as backends:
+        results = asyncio.run(run(args, backends))
+    parameters = {k: v for k, v in vars(args).items() if k not in ("output", "compare", "verbose", "label")}
+    result = {"meta": build_meta("heartbeat", args.label, parameters), **results}
+    path = write_result(result, args.output)
+    print(f"results written to {path}")
+    if args.compare:
+        return compare_files(args.compare, result, args.threshold)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""
+Conditional GET and long-poll check.
+
+Starts the fake backends in this process and the real backend under uvicorn in
+a child process, then runs ``--clients`` pollers against ``--path`` in three
+modes:
+
+- full: a request every ``--interval`` seconds, re-downloading the full body
+- conditional: the same, sending the last ``ETag`` back in ``If-None-Match``
+- long_poll: ``/api/servers/overview?since=<version>&wait=<--wait>`` in a loop,
+  receiving only the sections that changed
+
+For each mode it reports responses by status, bytes received, request latency
+and the backend's CPU usage. Before that it checks that a collected overview
+recorded again with only its clock fields and forecasts changed counts as no
+change for ``?since=``, and that a changed metric marks just its section;
+the run fails otherwise.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.http_cache --clients 50 --interval 1 --seconds 20
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from .fakes import FakeBackends, FleetSpec
+from .report import build_meta, compare_files, percentiles, write_result
+from .ws_load import ProcessSampler, free_port, start_backend, wait_ready
+
+
+async def poll(client: httpx.AsyncClient, mode: str, args, stop: asyncio.Event,
+               statuses: Counter, latencies: List[float], sizes: List[int]):
+    etag: Optional[str] = None
+    version = 0
+    while not stop.is_set():
+        headers = {"If-None-Match": etag} if mode == "conditional" and etag else {}
+        if mode == "long_poll":
+            url = f"/api/servers/overview?since={version}&wait={args.wait}"
+        else:
+            url = args.path
+        start = time.perf_counter()
+        response = await client.get(url, headers=headers)
+        latencies.append((time.perf_counter() - start) * 1000)
+        statuses[response.status_code] += 1
+        sizes.append(len(response.content))
+        if mode == "long_poll":
+            version = response.json()["version"]
+        else:
+            etag = response.headers.get("etag", etag)
+            await asyncio.sleep(args.interval)
+
+
+async def run_mode(base_url: str, mode: str, args, sampler: ProcessSampler) -> Dict[str, Any]:
+    stop = asyncio.Event()
+    statuses: Counter = Counter()
+    latencies: List[float] = []
+    sizes: List[int] = []
+    limits = httpx.Limits(max_connections=args.clients)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.wait + 30, limits=limits) as client:
+        sampler.mark()
+        tasks = [
+            asyncio.create_task(poll(client, mode, args, stop, statuses, latencies, sizes))
+            for _ in range(args.clients)
+        ]
+        await asyncio.sleep(args.seconds)
+        stop.set()
+        await asyncio.gather(*tasks)
+        cpu = sampler.cpu_percent()
+    return {
+        "requests": sum(statuses.values()),
+        "status": {str(status): count for status, count in sorted(statuses.items())},
+        "bytes_mb": round(sum(sizes) / 1024 / 1024, 2),
+        "latency_ms": percentiles(latencies),
+        "backend_cpu_percent": round(cpu, 1),
+    }
+
+
+def check_fingerprints(document: Dict[str, Any]) -> Dict[str, Any]:
+    """Sections ``SnapshotHistory`` reports changed for a re-collection with the
+    same metrics, and for one with a changed AI server CPU usage"""
+    from app.models.server_metrics import SystemOverview
+    from app.services.snapshot_history import SnapshotHistory
+
+    first = SystemOverview(**document)
+    recollected = first.model_copy(deep=True)
+    for section in (recollected.ai_server, recollected.app_server, recollected.storage_server):
+        section.server_status.last_updated = datetime.now()
+        section.server_status.response_time_ms = (section.server_status.response_time_ms or 0) + 12.5
+        section.server_status.uptime_seconds = (section.server_status.uptime_seconds or 0) + 15
+        for disk in section.disks:
+            disk.growth_gb_per_day, disk.days_to_full = 1.5, 90.0
+    changed = recollected.model_copy(deep=True)
+    changed.ai_server.cpu.usage_percent += 1
+
+    history = SnapshotHistory(3)
+    for version, overview in enumerate((first, recollected, changed), 1):
+        history.record(version, overview)
+    recollected_changed = sorted(history.entries[1][1])
+    metric_changed = sorted(history.entries[2][1])
+    return {
+        "recollected_changed": recollected_changed,
+        "metric_changed": metric_changed,
+        "ok": not recollected_changed and metric_changed == ["ai_server"],
+    }
+
+
+async def run(args, backends: FakeBackends) -> Dict[str, Any]:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    process = start_backend(backends.environment(), port, args)
+    results: Dict[str, Any] = {}
+    try:
+        await wait_ready(base_url)
+        sampler = ProcessSampler(process.pid)
+        async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+            check = results["fingerprints"] = check_fingerprints((await client.get("/api/servers/overview")).json())
+        print(f"fingerprints {'ok' if check['ok'] else 'FAILED'}: same metrics changed {check['recollected_changed']}, "
+              f"AI server CPU changed {check['metric_changed']}")
+        for name in ("full", "conditional", "long_poll"):
+            results[name] = result = await run_mode(base_url, name, args, sampler)
+            print(f"{name:11} {result['requests']:6} requests {result['status']}, "
+                  f"{result['bytes_mb']:7.2f} MB, p50 {result['latency_ms']['p50']:6.1f} ms, "
+                  f"backend CPU {result['backend_cpu_percent']:5.1f}%")
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Conditional GET check")
+    parser.add_argument("--path", default="/api/servers/overview")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between polls of one client")
+    parser.add_argument("--wait", type=int, default=30, help="long-poll wait in seconds")
+    parser.add_argument("--seconds", type=float, default=20, help="duration of each run")
+    parser.add_argument("--hosts", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--label", default="local")
+    parser.add_argument("--output")
+    parser.add_argument("--compare")
+    parser.add_argument("--threshold", type=float, default=10.0)
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+    spec = FleetSpec(hosts=args.hosts, seed=args.seed)
+    with FakeBackends(spec) as backends:
+        results = asyncio.run(run(args, backends))
+    parameters = {k: v for k, v in vars(args).items() if k not in ("output", "compare", "verbose", "label")}
+    result = {"meta": build_meta("http_cache", args.label, parameters), **results}
+    path = write_result(result, args.output)
+    print(f"results written to {path}")
+    if not results["fingerprints"]["ok"]:
+        return 1
+    if args.compare:
+        return compare_files(args.compare, result, args.threshold)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+"""
+Cost of the memory profiling endpoints, and where WebSocket memory goes.
+
+Starts the fake backends in this process and the real backend under uvicorn in
+a child process with ``DEBUG_ENDPOINTS=true``. It polls
+``/api/servers/overview`` from ``--pollers`` clients for ``--duration``
+seconds, three times:
+
+- ``off``: tracemalloc stopped, as in production
+- ``report``: still stopped, while another client requests
+  ``/api/debug/memory`` (heap walk and WebSocket buffers) over and over
+- ``tracing``: after ``POST /api/debug/memory/start``
+
+Between the first and the last phase it takes a snapshot, opens
+``--websockets`` clients, and diffs against the snapshot, so the largest
+allocation sites per connection are listed. It reports request rate and
+latency per phase, RSS, and what tracemalloc itself used.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.memory --pollers 8 --websockets 200 --duration 10
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from typing import Any, Dict, List
+
+import httpx
+import websockets
+
+from .fakes import FakeBackends, FleetSpec
+from .report import build_meta, compare_files, percentiles, write_result
+from .ws_load import ProcessSampler, free_port, raise_fd_limit, start_backend, wait_ready
+
+
+async def poll_loop(client: httpx.AsyncClient, stop: asyncio.Event, latencies: List[float]):
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            await client.get("/api/servers/overview")
+            latencies.append((time.perf_counter() - started) * 1000)
+        except httpx.HTTPError:
+            pass
+
+
+async def report_loop(client: httpx.AsyncClient, stop: asyncio.Event, latencies: List[float]):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get("/api/debug/memory", params={"top": "0", "objects": "25"})
+        latencies.append((time.perf_counter() - started) * 1000)
+
+
+async def run_phase(client: httpx.AsyncClient, args, reports: bool) -> Dict[str, Any]:
+    stop = asyncio.Event()
+    latencies: List[float] = []
+    report_latencies: List[float] = []
+    tasks = [asyncio.create_task(poll_loop(client, stop, latencies)) for _ in range(args.pollers)]
+    if reports:
+        tasks.append(asyncio.create_task(report_loop(client, stop, report_latencies)))
+    started = time.monotonic()
+    await asyncio.sleep(args.duration)
+    stop.set()
+    await asyncio.gather(*tasks)
+    elapsed = time.monotonic() - started
+    result = {
+        "requests_per_s": round(len(latencies) / elapsed, 1),
+        "latency_ms": percentiles(latencies),
+    }
+    if reports:
+        result["report_ms"] = percentiles(report_latencies)
+    return result
+
+
+async def hold_websocket(url: str, stop: asyncio.Event):
+    try:
+        async with websockets.connect(url, open_timeout=60, close_timeout=1) as ws:
+            while not stop.is_set():
+                try:
+                    await asyncio.wait_for(ws.recv(), timeout=1)
+                except asyncio.TimeoutError:
+                    continue
+    except Exception:
+        pass
+
+
+async def run(args, backends: FakeBackends) -> Dict[str, Any]:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = {**backends.environment(), "DEBUG_ENDPOINTS": "true"}
+    process = start_backend(env, port, args)
+    results: Dict[str, Any] = {}
+    try:
+        await wait_ready(base_url)
+        sampler = ProcessSampler(process.pid)
+        async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+            await client.get("/api/servers/overview")
+            for name, reports in (("off", False), ("report", True)):
+                results[name] = await run_phase(client, args, reports)
+                results[name]["rss_mib"] = round(sampler.process.memory_info().rss / 1024 / 1024, 1)
+
+            await client.post("/api/debug/memory/start", params={"frames": str(args.frames)})
+            snapshot = (await client.post("/api/debug/memory/snapshots", params={"label": "before websockets"})).json()
+            rss_before = sampler.process.memory_info().rss
+            stop = asyncio.Event()
+            url = base_url.replace("http", "ws") + "/ws/metrics"
+            holders = [asyncio.create_task(hold_websocket(url, stop)) for _ in range(args.websockets)]
+            # A few broadcasts, so every connection has sent snapshots
+            await asyncio.sleep(args.settle)
+            memory = (await client.get("/api/debug/memory", params={"top": "0", "objects": "10"})).json()
+            connections = memory["websockets"]["connections"]
+            diff = (await client.get("/api/debug/memory/diff",
+                                     params={"since": str(snapshot["id"]), "limit": str(args.sites)})).json()
+
+            results["tracing"] = await run_phase(client, args, False)
+            status = (await client.get("/api/debug/memory", params={"top": "0", "objects": "0"})).json()
+            results["tracing"]["rss_mib"] = round(status["rss_bytes"] / 1024 / 1024, 1)
+            results["tracing"]["traced_mib"] = round(status["traced_kib"] / 1024, 1)
+            results["tracing"]["overhead_mib"] = round(status["overhead_kib"] / 1024, 1)
+            results["websockets"] = {
+                "connections": connections,
+                "rss_kib_per_connection": round((sampler.process.memory_info().rss - rss_before) / 1024 / connections, 1)
+                if connections else 0,
+                "objects": memory["objects"],
+                "top_sites": [
+                    {**site, "kib_per_connection": round(site["size_diff_kib"] / connections, 2) if connections else 0}
+                    for site in diff["growth"]
+                ],
+            }
+            stop.set()
+            await asyncio.gather(*holders)
+            stopped = (await client.post("/api/debug/memory/stop")).json()
+            results["stopped_traced_kib"] = stopped["traced_kib"]
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+    return results
+
+
+def print_results(results: Dict[str, Any]):
+    baseline = results["off"]["requests_per_s"]
+    for name in ("off", "report", "tracing"):
+        phase = results[name]
+        latency = phase["latency_ms"]
+        line = (f"{name:8} {phase['requests_per_s']:7.1f} req/s ({phase['requests_per_s'] / baseline * 100 if baseline else 0:5.1f}%), "
+                f"p50 {latency.get('p50', 0):6.1f} ms, p99 {latency.get('p99', 0):6.1f} ms, RSS {phase['rss_mib']:.1f} MiB")
+        if "report_ms" in phase:
+            line += f"; /api/debug/memory p50 {phase['report_ms'].get('p50', 0):.1f} ms"
+        if "overhead_mib" in phase:
+            line += f"; traced {phase['traced_mib']:.1f} MiB, tracemalloc overhead {phase['overhead_mib']:.1f} MiB"
+        print(line)
+    ws = results["websockets"]
+    print(f"{ws['connections']} WebSockets: {ws['rss_kib_per_connection']:.1f} KiB RSS per connection; largest growth:")
+    for site in ws["top_sites"]:
+        print(f"  {site['kib_per_connection']:8.2f} KiB/conn  {site['site']}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Cost of the memory profiling endpoints")
+    parser.add_argument("--pollers", type=int, default=8, help="concurrent /api/servers/overview clients")
+    parser.add_argument("--websockets", type=int, default=200, help="WebSocket clients opened while tracing")
+    parser.add_argument("--frames", type=int, default=10, help="tracemalloc frames per allocation")
+    parser.add_argument("--sites", type=int, default=10, help="allocation sites listed from the diff")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per phase")
+    parser.add_argument("--settle", type=float, default=12.0, help="seconds the WebSockets stay open before the diff")
+    parser.add_argument("--hosts", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--label", default="local")
+    parser.add_argument("--output")
+    parser.add_argument("--compare")
+    parser.add_argument("--threshold", type=float, default=10.0)
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+    raise_fd_limit(args.websockets * 2 + 256)
+    spec = FleetSpec(hosts=args.hosts, seed=args.seed)
+    with FakeBackends(spec) as backends:
+        results = asyncio.run(run(args, backends))
+    print_results(results)
+    parameters = {k: v for k, v in vars(args).items() if k not in ("output", "compare", "verbose", "label")}
+    result = {"meta": build_meta("memory", args.label, parameters), **results}
+    path = write_result(result, args.output)
+    print(f"results written to {path}")
+    if args.compare:
+        return compare_files(args.compare, result, args.threshold)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,546 @@
+"""
+Minimal PromQL evaluator used by the fake Prometheus server.
+
+Supports the subset of PromQL the backend actually issues: selectors with
+label matchers, range selectors inside functions, arithmetic/comparison and
+set operators, and the common aggregations. Values are synthesised from
+deterministic per-series signals, so results are stable between runs.
+"""
+
+import math
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+Labels = Dict[str, str]
+Vector = List[Tuple[Labels, float]]
+
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800, "y": 31536000}
+
+_TOKEN_RE = re.compile(r"""
+    (?P<ws>\s+)
+  | (?P<duration>\[\s*\d+(?:ms|[smhdwy])(?:\d+(?:ms|[smhdwy]))*\s*(?::\s*\d+(?:ms|[smhdwy])?\s*)?\])
+  | (?P<number>\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)
+  | (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+  | (?P<op>=~|!~|!=|==|>=|<=|[-+*/(){},=<>^%])
+  | (?P<ident>[a-zA-Z_:][a-zA-Z0-9_:]*)
+""", re.VERBOSE)
+
+AGGREGATIONS = {"sum", "avg", "min", "max", "count", "topk", "bottomk", "quantile", "stddev", "group"}
+RANGE_FUNCTIONS = {
+    "rate", "irate", "increase", "delta", "idelta", "deriv", "predict_linear",
+    "avg_over_time", "min_over_time", "max_over_time", "last_over_time",
+    "sum_over_time", "count_over_time", "quantile_over_time",
+}
+INSTANT_FUNCTIONS = {"abs", "clamp_min", "clamp_max", "time", "vector", "scalar", "round", "ceil", "floor",
+                     "label_replace"}
+# Scrape interval assumed when counting the samples a range selector reads
+SAMPLE_INTERVAL = 15
+
+
+class PromQLError(ValueError):
+    pass
+
+
+class Series:
+    """A synthetic time series with a deterministic value curve."""
+
+    __slots__ = ("labels", "counter", "base", "amplitude", "period", "phase", "slope", "rate")
+
+    def __init__(self, labels: Labels, base: float = 0.0, amplitude: float = 0.0,
+                 period: float = 300.0, phase: float = 0.0, slope: float = 0.0,
+                 rate: float = 0.0, counter: bool = False):
+        self.labels = labels
+        self.counter = counter
+        self.base = base
+        self.amplitude = amplitude
+        self.period = period
+        self.phase = phase
+        self.slope = slope
+        self.rate = rate
+
+    def value_at(self, t: float) -> float:
+        if self.counter:
+            return self.base + self.rate * t
+        wave = self.amplitude * math.sin(2 * math.pi * t / self.period + self.phase)
+        return self.base + wave + self.slope * (t % 86400)
+
+    def rate_at(self, t: float) -> float:
+        if self.counter:
+            return self.rate * (1 + 0.05 * math.sin(2 * math.pi * t / self.period + self.phase))
+        return self.slope
+
+
+class SeriesStore:
+    """Series indexed by metric name."""
+
+    def __init__(self):
+        self.by_name: Dict[str, List[Series]] = {}
+
+    def add(self, series: Series):
+        self.by_name.setdefault(series.labels["__name__"], []).append(series)
+
+    def __len__(self):
+        return sum(len(items) for items in self.by_name.values())
+
+    def select(self, matchers: List[Tuple[str, str, str]]) -> List[Series]:
+        name = next((v for (l, op, v) in matchers if l == "__name__" and op == "="), None)
+        candidates = self.by_name.get(name, []) if name else [
+            s for items in self.by_name.values() for s in items
+        ]
+        return [s for s in candidates if _matches(s.labels, matchers)]
+
+
+def _matches(labels: Labels, matchers: List[Tuple[str, str, str]]) -> bool:
+    for label, op, value in matchers:
+        actual = labels.get(label, "")
+        if op == "=" and actual != value:
+            return False
+        if op == "!=" and actual == value:
+            return False
+        if op == "=~" and not re.fullmatch(value, actual):
+            return False
+        if op == "!~" and re.fullmatch(value, actual):
+            return False
+    return True
+
+
+def parse_duration(text: str) -> float:
+    total = 0.0
+    for amount, unit in re.findall(r"(\d+)(ms|[smhdwy])", text):
+        total += int(amount) * _DURATION_UNITS[unit]
+    if total <= 0:
+        raise PromQLError(f"invalid duration {text!r}")
+    return total
+
+
+# --------------------------------------------------------------------------
+# Parser
+# --------------------------------------------------------------------------
+
+def _tokenize(query: str) -> List[Tuple[str, str]]:
+    tokens, pos = [], 0
+    while pos < len(query):
+        match = _TOKEN_RE.match(query, pos)
+        if not match:
+            raise PromQLError(f"unexpected character {query[pos]!r} at {pos}")
+        pos = match.end()
+        kind = match.lastgroup
+        if kind != "ws":
+            tokens.append((kind, match.group()))
+    tokens.append(("eof", ""))
+    return tokens
+
+
+class _Parser:
+    _PRECEDENCE = [
+        {"or"},
+        {"and", "unless"},
+        {"==", "!=", ">", "<", ">=", "<="},
+        {"+", "-"},
+        {"*", "/", "%"},
+    ]
+
+    def __init__(self, query: str):
+        self.tokens = _tokenize(query)
+        self.pos = 0
+
+    def peek(self) -> Tuple[str, str]:
+        return self.tokens[self.pos]
+
+    def next(self) -> Tuple[str, str]:
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def expect(self, value: str):
+        kind, text = self.next()
+        if text != value:
+            raise PromQLError(f"expected {value!r}, got {text!r}")
+
+    def parse(self):
+        node = self.expr(0)
+        if self.peek()[0] != "eof":
+            raise PromQLError(f"unexpected token {self.peek()[1]!r}")
+        return node
+
+    def expr(self, level: int):
+        if level == len(self._PRECEDENCE):
+            return self.unary()
+        node = self.expr(level + 1)
+        while self.peek()[1] in self._PRECEDENCE[level]:
+            op = self.next()[1]
+            modifiers = self.binary_modifiers()
+            node = ("binop", op, node, self.expr(level + 1), modifiers)
+        return node
+
+    def binary_modifiers(self) -> Dict[str, Any]:
+        modifiers: Dict[str, Any] = {}
+        if self.peek()[1] == "bool":
+            self.next()
+            modifiers["bool"] = True
+        if self.peek()[1] in ("on", "ignoring"):
+            modifiers["match"] = (self.next()[1], self.label_list())
+        if self.peek()[1] in ("group_left", "group_right"):
+            self.next()
+            if self.peek()[1] == "(":
+                self.label_list()
+        return modifiers
+
+    def unary(self):
+        if self.peek()[1] in ("-", "+"):
+            sign = self.next()[1]
+            operand = self.unary()
+            return operand if sign == "+" else ("binop", "*", ("number", -1.0), operand, {})
+        return self.primary()
+
+    def label_list(self) -> List[str]:
+        self.expect("(")
+        labels = []
+        while self.peek()[1] != ")":
+            labels.append(self.next()[1])
+            if self.peek()[1] == ",":
+                self.next()
+        self.expect(")")
+        return labels
+
+    def primary(self):
+        kind, text = self.peek()
+        if kind == "number":
+            self.next()
+            return ("number", float(text))
+        if kind == "string":
+            self.next()
+            return ("string", text[1:-1])
+        if text == "(":
+            self.next()
+            node = self.expr(0)
+            self.expect(")")
+            return self.maybe_range(("paren", node))
+        if text == "{":
+            return self.selector(None)
+        if kind == "ident":
+            self.next()
+            if text in AGGREGATIONS:
+                return self.aggregation(text)
+            if self.peek()[1] == "(" and (text in RANGE_FUNCTIONS or text in INSTANT_FUNCTIONS):
+                return self.function(text)
+            return self.selector(text)
+        raise PromQLError(f"unexpected token {text!r}")
+
+    def aggregation(self, op: str):
+        grouping = None
+        if self.peek()[1] in ("by", "without"):
+            grouping = (self.next()[1], self.label_list())
+        self.expect("(")
+        args = [self.expr(0)]
+        while self.peek()[1] == ",":
+            self.next()
+            args.append(self.expr(0))
+        self.expect(")")
+        if grouping is None and self.peek()[1] in ("by", "without"):
+            grouping = (self.next()[1], self.label_list())
+        return ("aggregate", op, args, grouping)
+
+    def function(self, name: str):
+        self.expect("(")
+        args = []
+        while self.peek()[1] != ")":
+            args.append(self.expr(0))
+            if self.peek()[1] == ",":
+                self.next()
+        self.expect(")")
+        return ("call", name, args)
+
+    def selector(self, name: Optional[str]):
+        matchers = [("__name__", "=", name)] if name else []
+        if self.peek()[1] == "{":
+            self.next()
+            while self.peek()[1] != "}":
+                label = self.next()[1]
+                op = self.next()[1]
+                kind, value = self.next()
+                if kind != "string":
+                    raise PromQLError(f"expected string in matcher for {label}")
+                matchers.append((label, op, bytes(value[1:-1], "utf-8").decode("unicode_escape")))
+                if self.peek()[1] == ",":
+                    self.next()
+            self.next()
+        if not matchers:
+            raise PromQLError("empty selector")
+        return self.maybe_range(("selector", matchers))
+
+    def maybe_range(self, node):
+        if self.peek()[0] == "duration":
+            window = self.next()[1].strip("[] ").split(":")[0]
+            return ("range", node, parse_duration(window))
+        return node
+
+
+# --------------------------------------------------------------------------
+# Evaluator
+# --------------------------------------------------------------------------
+
+def _without_name(labels: Labels) -> Labels:
+    return {k: v for k, v in labels.items() if k != "__name__"}
+
+
+def _signature(labels: Labels, match: Optional[Tuple[str, List[str]]]) -> Tuple:
+    if match and match[0] == "on":
+        return tuple((k, labels.get(k, "")) for k in sorted(match[1]))
+    ignored = set(match[1]) if match else set()
+    return tuple(sorted((k, v) for k, v in labels.items() if k != "__name__" and k not in ignored))
+
+
+def _quantile(q: float, values: List[float]) -> float:
+    if not values:
+        return math.nan
+    ordered = sorted(values)
+    rank = q * (len(ordered) - 1)
+    lower, upper = math.floor(rank), math.ceil(rank)
+    weight = rank - lower
+    return ordered[lower] * (1 - weight) + ordered[upper] * weight
+
+
+_ARITHMETIC = {
+    "+": lambda a, b: a + b,
+    "-": lambda a, b: a - b,
+    "*": lambda a, b: a * b,
+    "/": lambda a, b: a / b if b else (math.nan if a == 0 else math.copysign(math.inf, a)),
+    "%": lambda a, b: math.fmod(a, b) if b else math.nan,
+}
+_COMPARISON = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    ">": lambda a, b: a > b,
+    "<": lambda a, b: a < b,
+    ">=": lambda a, b: a >= b,
+    "<=": lambda a, b: a <= b,
+}
+
+
+class Evaluator:
+    def __init__(self, store: SeriesStore, max_cache: int = 4096):
+        self.store = store
+        self._ast_cache: Dict[str, Any] = {}
+        self._max_cache = max_cache
+        # Samples loaded by selectors, like Prometheus' totalQueryableSamples
+        self.samples_read = 0
+
+    def parse(self, query: str):
+        node = self._ast_cache.get(query)
+        if node is None:
+            node = _Parser(query).parse()
+            if len(self._ast_cache) >= self._max_cache:
+                self._ast_cache.clear()
+            self._ast_cache[query] = node
+        return node
+
+    def instant(self, query: str, t: float) -> Dict[str, Any]:
+        value = self.eval(self.parse(query), t)
+        if isinstance(value, float):
+            return {"resultType": "scalar", "result": [t, _fmt(value)]}
+        return {
+            "resultType": "vector",
+            "result": [{"metric": labels, "value": [t, _fmt(v)]} for labels, v in value],
+        }
+
+    def range(self, query: str, start: float, end: float, step: float) -> Dict[str, Any]:
+        node = self.parse(query)
+        matrix: Dict[Tuple, Dict[str, Any]] = {}
+        t = start
+        while t <= end:
+            value = self.eval(node, t)
+            if isinstance(value, float):
+                value = [({}, value)]
+            for labels, v in value:
+                key = tuple(sorted(labels.items()))
+                entry = matrix.setdefault(key, {"metric": labels, "values": []})
+                entry["values"].append([t, _fmt(v)])
+            t += step
+        return {"resultType": "matrix", "result": list(matrix.values())}
+
+    def eval(self, node, t: float):
+        kind = node[0]
+        if kind == "number":
+            return node[1]
+        if kind == "paren":
+            return self.eval(node[1], t)
+        if kind == "selector":
+            series = self.store.select(node[1])
+            self.samples_read += len(series)
+            return [(s.labels, s.value_at(t)) for s in series]
+        if kind == "range":
+            raise PromQLError("range vector must be passed to a function")
+        if kind == "binop":
+            return self._binop(node, t)
+        if kind == "aggregate":
+            return self._aggregate(node, t)
+        if kind == "call":
+            return self._call(node, t)
+        raise PromQLError(f"cannot evaluate {kind}")
+
+    def _range_series(self, node) -> Tuple[List[Series], float]:
+        if node[0] != "range" or node[1][0] != "selector":
+            raise PromQLError("expected range selector")
+        return self.store.select(node[1][1]), node[2]
+
+    def _call(self, node, t: float):
+        _, name, args = node
+        if name == "time":
+            return t
+        if name == "vector":
+            return [({}, self._scalar(args[0], t))]
+        if name == "scalar":
+            vector = self.eval(args[0], t)
+            return vector[0][1] if len(vector) == 1 else math.nan
+        if name in RANGE_FUNCTIONS:
+            series, window = self._range_series(args[-1] if name == "quantile_over_time" else args[0])
+            self.samples_read += len(series) * max(1, int(window // SAMPLE_INTERVAL))
+            out = []
+            for s in series:
+                labels = _without_name(s.labels)
+                if name in ("rate", "irate"):
+                    value = s.rate_at(t)
+                elif name == "increase":
+                    value = s.rate_at(t) * window
+                elif name in ("delta", "idelta"):
+                    value = s.rate_at(t) * (window if name == "delta" else 15)
+                elif name == "deriv":
+                    value = s.rate_at(t)
+                elif name == "predict_linear":
+                    value = s.value_at(t) + s.rate_at(t) * self._scalar(args[1], t)
+                elif name == "count_over_time":
+                    value = window / 15
+                elif name == "sum_over_time":
+                    value = s.value_at(t) * window / 15
+                else:
+                    value = s.value_at(t)
+                out.append((labels, value))
+            return out
+        vector = self.eval(args[0], t)
+        if name == "label_replace":
+            dst, replacement, src, regex = (arg[1] for arg in args[1:])
+            pattern = re.compile(regex)
+            template = re.sub(r"\$(\d+)", r"\\g<\1>", replacement)
+            out = []
+            for labels, value in vector:
+                match = pattern.fullmatch(labels.get(src, ""))
+                if match:
+                    labels = {**labels, dst: match.expand(template)}
+                out.append((labels, value))
+            return out
+        if name == "abs":
+            return [(_without_name(l), abs(v)) for l, v in vector]
+        if name in ("round", "ceil", "floor"):
+            fn = {"round": round, "ceil": math.ceil, "floor": math.floor}[name]
+            return [(_without_name(l), float(fn(v))) for l, v in vector]
+        bound = self._scalar(args[1], t)
+        if name == "clamp_min":
+            return [(_without_name(l), max(v, bound)) for l, v in vector]
+        return [(_without_name(l), min(v, bound)) for l, v in vector]
+
+    def _scalar(self, node, t: float) -> float:
+        value = self.eval(node, t)
+        if not isinstance(value, float):
+            raise PromQLError("expected scalar")
+        return value
+
+    def _binop(self, node, t: float):
+        _, op, left_node, right_node, modifiers = node
+        left, right = self.eval(left_node, t), self.eval(right_node, t)
+        match = modifiers.get("match")
+        if op in ("or", "and", "unless"):
+            right_keys = {_signature(l, match) for l, _ in right}
+            if op == "and":
+                return [(l, v) for l, v in left if _signature(l, match) in right_keys]
+            if op == "unless":
+                return [(l, v) for l, v in left if _signature(l, match) not in right_keys]
+            left_keys = {_signature(l, match) for l, _ in left}
+            return left + [(l, v) for l, v in right if _signature(l, match) not in left_keys]
+
+        compare = _COMPARISON.get(op)
+        fn = compare or _ARITHMETIC[op]
+        as_bool = modifiers.get("bool", False)
+
+        def apply(labels, a, b, keep):
+            if compare:
+                result = fn(a, b)
+                if as_bool:
+                    return (_without_name(labels), 1.0 if result else 0.0)
+                return (labels, keep) if result else None
+            return (_without_name(labels), fn(a, b))
+
+        if isinstance(left, float) and isinstance(right, float):
+            return float(fn(left, right)) if not compare else (1.0 if fn(left, right) else 0.0)
+        if isinstance(right, float):
+            return [r for r in (apply(l, v, right, v) for l, v in left) if r]
+        if isinstance(left, float):
+            return [r for r in (apply(l, left, v, v) for l, v in right) if r]
+        index = {_signature(l, match): v for l, v in right}
+        out = []
+        for labels, value in left:
+            other = index.get(_signature(labels, match))
+            if other is None:
+                continue
+            result = apply(labels, value, other, value)
+            if result:
+                out.append(result)
+        return out
+
+    def _aggregate(self, node, t: float):
+        _, op, args, grouping = node
+        param = self._scalar(args[0], t) if op in ("topk", "bottomk", "quantile") else None
+        vector = self.eval(args[-1], t)
+        if isinstance(vector, float):
+            raise PromQLError(f"{op} expects an instant vector")
+
+        def group_key(labels: Labels) -> Tuple:
+            if grouping is None:
+                return ()
+            mode, names = grouping
+            if mode == "by":
+                return tuple((n, labels[n]) for n in names if n in labels)
+            return tuple(sorted((k, v) for k, v in labels.items() if k != "__name__" and k not in names))
+
+        groups: Dict[Tuple, List[Tuple[Labels, float]]] = {}
+        for labels, value in vector:
+            groups.setdefault(group_key(labels), []).append((labels, value))
+
+        if op in ("topk", "bottomk"):
+            k = int(param)
+            out = []
+            for members in groups.values():
+                members.sort(key=lambda item: item[1], reverse=(op == "topk"))
+                out.extend(members[:k])
+            return out
+
+        out = []
+        for key, members in groups.items():
+            values = [v for _, v in members]
+            if op == "sum":
+                value = sum(values)
+            elif op == "avg":
+                value = sum(values) / len(values)
+            elif op == "min":
+                value = min(values)
+            elif op == "max":
+                value = max(values)
+            elif op == "count":
+                value = float(len(values))
+            elif op == "group":
+                value = 1.0
+            elif op == "stddev":
+                mean = sum(values) / len(values)
+                value = math.sqrt(sum((v - mean) ** 2 for v in values) / len(values))
+            else:
+                value = _quantile(param, values)
+            out.append((dict(key), value))
+        return out
+
+
+def _fmt(value: float) -> str:
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
@@ -0,0 +1,126 @@
+"""
+Recording rules cost check.
+
+Runs ``collect_all_metrics`` cycles against the in-process fake backends in two
+phases:
+
+- raw: Prometheus has no recording rules, every cycle evaluates the query
+  templates' raw expressions
+- recorded: the fake Prometheus loads the rule file rendered by
+  ``python -m app.recording_rules`` and evaluates it every rule interval, and
+  the collector reads the precomputed series
+
+For each phase it reports queries and samples read by the collector's queries
+per cycle, and the samples the rule evaluations themselves read per minute.
+Samples read is the fake's stand-in for Prometheus' query evaluation cost.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.recording_rules --hosts 20 --cycles 10
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict
+
+from .fakes import FakeBackends, FleetSpec
+from .report import build_meta, compare_files, percentiles, write_result
+
+
+async def run_phase(args, backends: FakeBackends) -> Dict[str, Any]:
+    from app.services.metrics_collector import metrics_collector
+
+    for _ in range(args.warmup):
+        await metrics_collector.collect_all_metrics()
+    latencies, queries, samples = [], [], []
+    for _ in range(args.cycles):
+        backends.reset_counters()
+        start = time.perf_counter()
+        await metrics_collector.collect_all_metrics()
+        latencies.append((time.perf_counter() - start) * 1000)
+        queries.append(backends.requests["prometheus.query"])
+        samples.append(backends.samples["query"])
+    return {
+        "latency_ms": percentiles(latencies),
+        "queries_per_cycle": percentiles(queries),
+        "query_samples_per_cycle": percentiles(samples),
+    }
+
+
+async def run(args, backends: FakeBackends) -> Dict[str, Any]:
+    # Settings are read at import time, so the app is imported only now
+    from app.recording_rules import render
+    from app.services.metrics_collector import metrics_collector
+    from app.services.prometheus_client import prometheus_client
+
+    await prometheus_client.refresh_recording_rules()
+    raw = await run_phase(args, backends)
+
+    with tempfile.NamedTemporaryFile("w", suffix=".yml", delete=False) as f:
+        f.write(render(f"{args.rule_interval}s"))
+    try:
+        backends.load_recording_rules(f.name)
+    finally:
+        os.unlink(f.name)
+    # One more evaluation, to measure what each one costs
+    backends.reset_counters()
+    backends.evaluate_rules(time.time())
+    rule_samples = backends.samples["rules"]
+    await prometheus_client.refresh_recording_rules()
+    recorded = await run_phase(args, backends)
+    recorded["recorded_templates"] = len(prometheus_client.recorded_series)
+    recorded["rule_samples_per_evaluation"] = rule_samples
+    recorded["rule_samples_per_minute"] = round(rule_samples * 60 / args.rule_interval, 1)
+
+    await metrics_collector.close()
+    await prometheus_client.close()
+    return {"raw": raw, "recorded": recorded}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Recording rules cost check")
+    parser.add_argument("--hosts", type=int, default=5)
+    parser.add_argument("--cpus", type=int, default=8, help="CPUs per host")
+    parser.add_argument("--interfaces", type=int, default=2, help="physical NICs per host")
+    parser.add_argument("--cycles", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--rule-interval", type=int, default=15, help="rule group evaluation interval in seconds")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--label", default="local")
+    parser.add_argument("--output")
+    parser.add_argument("--compare")
+    parser.add_argument("--threshold", type=float, default=10.0)
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+    spec = FleetSpec(hosts=args.hosts, cpus=args.cpus, interfaces=args.interfaces, seed=args.seed)
+    with FakeBackends(spec) as backends:
+        os.environ.update(backends.environment())
+        results = asyncio.run(run(args, backends))
+    for name, result in results.items():
+        print(f"{name:9} {result['queries_per_cycle']['p50']:.0f} queries/cycle, "
+              f"{result['query_samples_per_cycle']['p50']:.0f} samples read/cycle, "
+              f"collect p50 {result['latency_ms']['p50']:.0f} ms")
+    recorded = results["recorded"]
+    print(f"rules     {recorded['recorded_templates']} recorded templates, "
+          f"{recorded['rule_samples_per_minute']:.0f} samples read/min by rule evaluation")
+    parameters = {k: v for k, v in vars(args).items() if k not in ("output", "compare", "verbose", "label")}
+    result = {"meta": build_meta("recording_rules", args.label, parameters), **results}
+    path = write_result(result, args.output)
+    print(f"results written to {path}")
+    if args.compare:
+        return compare_files(args.compare, result, args.threshold)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,197 @@
+"""
+Remote-write freshness check for ``POST /api/v1/write``.
+
+Starts the fake backends in this process and the real backend under uvicorn in
+a child process. It then holds one ``/ws/metrics`` connection open for two
+phases:
+
+- polling: Prometheus is queried every cycle, as without remote write
+- push: every fake host's series are pushed as a snappy-compressed
+  WriteRequest every ``--push-interval`` seconds, like Prometheus remote write
+
+For each phase it reports Prometheus queries per overview frame and the delay
+from a push to the next overview frame.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.remote_write --duration 20 --push-interval 2
+"""
+
+import argparse
+import asyncio
+import logging
+import struct
+import sys
+import time
+from typing import Any, Dict, List
+
+import httpx
+import websockets
+
+from .fakes import FakeBackends, FleetSpec
+from .report import build_meta, compare_files, percentiles, write_result
+from .ws_load import _parse_head, free_port, start_backend, wait_ready
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _field(number: int, payload: bytes) -> bytes:
+    return _varint((number << 3) | 2) + _varint(len(payload)) + payload
+
+
+def encode_write_request(series: List[Dict[str, Any]]) -> bytes:
+    """Protobuf prometheus.WriteRequest from ``{"labels": {...}, "samples": [(ts_ms, value)]}``"""
+    out = bytearray()
+    for entry in series:
+        body = bytearray()
+        for name, value in sorted(entry["labels"].items()):
+            body += _field(1, _field(1, name.encode()) + _field(2, value.encode()))
+        for timestamp_ms, value in entry["samples"]:
+            sample = b"\x09" + struct.pack("<d", value) + b"\x10" + _varint(timestamp_ms)
+            body += _field(2, sample)
+        out += _field(1, bytes(body))
+    return bytes(out)
+
+
+def snappy_literal(data: bytes) -> bytes:
+    """Valid snappy block made of literals only (no compression, no dependency)"""
+    out = bytearray(_varint(len(data)))
+    for start in range(0, len(data), 65536):
+        chunk = data[start:start + 65536]
+        out += bytes([61 << 2]) + (len(chunk) - 1).to_bytes(2, "little") + chunk
+    return bytes(out)
+
+
+def build_push(backends: FakeBackends) -> bytes:
+    now = time.time()
+    series = [
+        {"labels": s.labels, "samples": [(int(now * 1000), s.value_at(now))]}
+        for host in backends.hosts
+        for s in host.node_series + host.gpu_series
+    ]
+    return snappy_literal(encode_write_request(series))
+
+
+async def watch_overviews(url: str, arrivals: List[float], stop: asyncio.Event):
+    async with websockets.connect(url, ping_interval=None, max_size=None) as ws:
+        while not stop.is_set():
+            try:
+                message = await asyncio.wait_for(ws.recv(), timeout=1)
+            except asyncio.TimeoutError:
+                continue
+            if _parse_head(message).get("server_type") == "overview":
+                arrivals.append(time.time())
+
+
+async def run_phase(base_url: str, backends: FakeBackends, args, push: bool) -> Dict[str, Any]:
+    arrivals: List[float] = []
+    pushes: List[float] = []
+    stop = asyncio.Event()
+    watcher = asyncio.create_task(
+        watch_overviews(base_url.replace("http://", "ws://") + "/ws/metrics", arrivals, stop)
+    )
+    async with httpx.AsyncClient(timeout=10) as client:
+        # Warm up: wait for the first frame, then start counting
+        while not arrivals:
+            if push:
+                await client.post(f"{base_url}/api/v1/write", content=build_push(backends),
+                                  headers={"Content-Encoding": "snappy"})
+            await asyncio.sleep(0.5)
+        arrivals.clear()
+        backends.reset_counters()
+
+        deadline = time.monotonic() + args.duration
+        while time.monotonic() < deadline:
+            if push:
+                body = build_push(backends)
+                pushes.append(time.time())
+                response = await client.post(
+                    f"{base_url}/api/v1/write", content=body,
+                    headers={"Content-Encoding": "snappy", "Content-Type": "application/x-protobuf"}
+                )
+                response.raise_for_status()
+            await asyncio.sleep(args.push_interval)
+    stop.set()
+    await watcher
+
+    delays = []
+    for pushed in pushes:
+        after = [a for a in arrivals if a >= pushed]
+        if after:
+            delays.append((after[0] - pushed) * 1000)
+    frames = len(arrivals)
+    return {
+        "overview_frames": frames,
+        "prometheus_queries": backends.requests["prometheus.query"],
+        "prometheus_queries_per_frame": round(backends.requests["prometheus.query"] / frames, 1) if frames else None,
+        "push_to_frame_ms": percentiles(delays),
+    }
+
+
+async def run(args, backends: FakeBackends) -> Dict[str, Any]:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = {
+        **backends.environment(),
+        "METRICS_UPDATE_INTERVAL": str(args.update_interval),
+        "REMOTE_WRITE_STALENESS": str(max(3, int(args.push_interval * 3))),
+    }
+    process = start_backend(env, port, args)
+    try:
+        await wait_ready(base_url)
+        polling = await run_phase(base_url, backends, args, push=False)
+        print(f"polling: {polling['prometheus_queries_per_frame']} queries/frame, "
+              f"{polling['overview_frames']} frames")
+        pushed = await run_phase(base_url, backends, args, push=True)
+        print(f"push:    {pushed['prometheus_queries_per_frame']} queries/frame, "
+              f"{pushed['overview_frames']} frames, "
+              f"push to frame p50 {pushed['push_to_frame_ms'].get('p50', float('nan')):.0f} ms")
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+    return {"polling": polling, "push": pushed}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Remote-write freshness check")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per phase")
+    parser.add_argument("--push-interval", type=float, default=2.0)
+    parser.add_argument("--update-interval", type=int, default=5, help="METRICS_UPDATE_INTERVAL for the backend")
+    parser.add_argument("--hosts", type=int, default=5)
+    parser.add_argument("--prometheus-latency-ms", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--label", default="local")
+    parser.add_argument("--output")
+    parser.add_argument("--compare")
+    parser.add_argument("--threshold", type=float, default=10.0)
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+    spec = FleetSpec(hosts=args.hosts, prometheus_latency_ms=args.prometheus_latency_ms, seed=args.seed)
+    with FakeBackends(spec) as backends:
+        results = asyncio.run(run(args, backends))
+    parameters = {k: v for k, v in vars(args).items() if k not in ("output", "compare", "verbose", "label")}
+    result = {"meta": build_meta("remote_write", args.label, parameters), **results}
+    path = write_result(result, args.output)
+    print(f"results written to {path}")
+    if args.compare:
+        return compare_files(args.compare, result, args.threshold)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
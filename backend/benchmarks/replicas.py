@@ -0,0 +1,125 @@
+"""
+Prometheus replica hedging and failover check.
+
+Runs ``collect_all_metrics`` cycles in this process against in-process fake
+backends with ``--replicas`` fake Prometheus replicas. Each replica stalls for
+``--pause-ms`` on a ``--pause-rate`` share of requests, like a GC pause. The
+check runs four phases:
+
+- single: only the first replica, as with one ``PROMETHEUS_URL``
+- routed: all replicas, health-weighted routing without hedging
+- hedged: all replicas with hedged requests
+- failover: all replicas with hedging while the first one answers 503
+
+For each phase it reports collection latency, Prometheus requests per
+collection, hedged requests and replica failures.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.replicas --replicas 2 --pause-rate 0.01 --pause-ms 200 --cycles 40
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+from .fakes import FakeBackends, FleetSpec
+from .report import build_meta, compare_files, percentiles, write_result
+
+
+async def run_phase(args, backends: FakeBackends, urls: List[str], hedge_budget: float) -> Dict[str, Any]:
+    from app.config import settings
+    from app.services.metrics_collector import metrics_collector
+    from app.services.prometheus_client import prometheus_client
+    from app.services.replicas import ReplicaSet
+
+    prometheus_client.replicas = replicas = ReplicaSet(
+        urls, settings.prometheus_replica_cooldown, hedge_budget, settings.prometheus_hedge_min_delay
+    )
+    # Warm the latency samples the hedge delay is taken from
+    await metrics_collector.collect_all_metrics()
+    backends.reset_counters()
+    requests_before = replicas.requests
+    latencies = []
+    for _ in range(args.cycles):
+        start = time.perf_counter()
+        await metrics_collector.collect_all_metrics()
+        latencies.append((time.perf_counter() - start) * 1000)
+    sent = sum(count for kind, count in backends.requests.items() if kind.startswith("prometheus.replica"))
+    requests = replicas.requests - requests_before
+    return {
+        "collect_ms": percentiles(latencies),
+        "prometheus_requests_per_collect": round(sent / args.cycles, 1),
+        "extra_requests_percent": round((sent - requests) / requests * 100, 1) if requests else 0,
+        "hedged": replicas.hedged,
+        "replica_failures": sum(replica.failures for replica in replicas.replicas),
+    }
+
+
+async def run(args, backends: FakeBackends) -> Dict[str, Any]:
+    # Settings are read at import time, so the app is imported only now
+    from app.services.metrics_collector import metrics_collector
+    from app.services.prometheus_client import prometheus_client
+
+    urls = [f"http://127.0.0.1:{port}" for port in backends.prometheus_ports]
+    results = {}
+    for name, phase_urls, budget, down in (
+        ("single", urls[:1], 0.0, set()),
+        ("routed", urls, 0.0, set()),
+        ("hedged", urls, args.hedge_budget, set()),
+        ("failover", urls, args.hedge_budget, {0}),
+    ):
+        backends.down_replicas = down
+        results[name] = result = await run_phase(args, backends, phase_urls, budget)
+        collect = result["collect_ms"]
+        print(f"{name:8} collect p50 {collect['p50']:6.0f} ms, p95 {collect['p95']:6.0f} ms, "
+              f"p99 {collect['p99']:6.0f} ms, {result['prometheus_requests_per_collect']:5.0f} requests/collect "
+              f"(+{result['extra_requests_percent']:.1f}%), {result['replica_failures']} replica failures")
+    await metrics_collector.close()
+    await prometheus_client.close()
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Prometheus replica hedging and failover check")
+    parser.add_argument("--replicas", type=int, default=2)
+    parser.add_argument("--pause-rate", type=float, default=0.01, help="share of requests that start a pause")
+    parser.add_argument("--pause-ms", type=float, default=200.0, help="length of a replica pause")
+    parser.add_argument("--hedge-budget", type=float, default=0.1, help="PROMETHEUS_HEDGE_BUDGET")
+    parser.add_argument("--cycles", type=int, default=40)
+    parser.add_argument("--hosts", type=int, default=3)
+    parser.add_argument("--prometheus-latency-ms", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--label", default="local")
+    parser.add_argument("--output")
+    parser.add_argument("--compare")
+    parser.add_argument("--threshold", type=float, default=10.0)
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+    spec = FleetSpec(
+        hosts=args.hosts, prometheus_latency_ms=args.prometheus_latency_ms, seed=args.seed,
+        prometheus_replicas=args.replicas, prometheus_pause_rate=args.pause_rate, prometheus_pause_ms=args.pause_ms
+    )
+    with FakeBackends(spec) as backends:
+        os.environ.update(backends.environment())
+        results = asyncio.run(run(args, backends))
+    parameters = {k: v for k, v in vars(args).items() if k not in ("output", "compare", "verbose", "label")}
+    result = {"meta": build_meta("replicas", args.label, parameters), **results}
+    path = write_result(result, args.output)
+    print(f"results written to {path}")
+    if args.compare:
+        return compare_files(args.compare, result, args.threshold)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
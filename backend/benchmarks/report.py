@@ -0,0 +1,128 @@
+"""
+Result files and run-to-run comparison for the benchmarks.
+
+Every benchmark writes one JSON document with a ``meta`` block and nested
+numeric results. ``compare`` flattens two documents into dotted keys and
+reports the relative change of every metric they share.
+"""
+
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# Metrics where a larger value is an improvement; everything else is a cost
+HIGHER_IS_BETTER = ("throughput", "frames_per_second", "delivered", "connections")
+
+
+def percentiles(values: Iterable[float], points=(50, 95, 99)) -> Dict[str, float]:
+    ordered = sorted(values)
+    if not ordered:
+        return {"count": 0}
+    summary = {"count": len(ordered), "min": ordered[0], "max": ordered[-1],
+               "mean": sum(ordered) / len(ordered)}
+    for p in points:
+        rank = (len(ordered) - 1) * p / 100
+        lower, upper = math.floor(rank), math.ceil(rank)
+        summary[f"p{p}"] = ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+    return {k: round(v, 4) if isinstance(v, float) else v for k, v in summary.items()}
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, timeout=5, cwd=RESULTS_DIR.parent).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def build_meta(benchmark: str, label: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "benchmark": benchmark,
+        "label": label,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "parameters": parameters,
+    }
+
+
+def write_result(result: Dict[str, Any], output: Optional[str] = None) -> Path:
+    meta = result["meta"]
+    if output:
+        path = Path(output)
+    else:
+        stamp = meta["timestamp"].replace(":", "").replace("-", "")
+        path = RESULTS_DIR / f"{meta['benchmark']}-{meta['label']}-{stamp}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(result, indent=2, sort_keys=True))
+    return path
+
+
+def flatten(data: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in data.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = float(value)
+    return flat
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any],
+            threshold: float = 10.0) -> Tuple[List[str], List[str]]:
+    """Return (report lines, regressed metric names) for two result documents."""
+    before = flatten({k: v for k, v in baseline.items() if k != "meta"})
+    after = flatten({k: v for k, v in current.items() if k != "meta"})
+    lines, regressions = [], []
+    for name in sorted(before.keys() & after.keys()):
+        old, new = before[name], after[name]
+        if old == new:
+            continue
+        change = ((new - old) / abs(old) * 100) if old else math.inf
+        worse = change < 0 if any(tag in name for tag in HIGHER_IS_BETTER) else change > 0
+        flag = ""
+        if worse and abs(change) >= threshold and name.split(".")[-1] != "count":
+            flag = "  REGRESSION"
+            regressions.append(name)
+        lines.append(f"{name:60s} {old:14.4f} -> {new:14.4f} ({change:+.1f}%){flag}")
+    return lines, regressions
+
+
+def compare_files(baseline_path: str, current: Dict[str, Any], threshold: float) -> int:
+    baseline = json.loads(Path(baseline_path).read_text())
+    lines, regressions = compare(baseline, current, threshold)
+    print(f"\nComparison against {baseline_path} ({baseline['meta'].get('label')}, "
+          f"{baseline['meta'].get('git_revision')}):")
+    for line in lines:
+        print("  " + line)
+    if regressions:
+        print(f"\n{len(regressions)} metric(s) regressed by more than {threshold:.0f}%")
+        return 1
+    print("\nNo regressions above threshold")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=10.0, help="regression threshold in percent")
+    args = parser.parse_args(argv)
+    current = json.loads(Path(args.current).read_text())
+    return compare_files(args.baseline, current, args.threshold)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""
+Scrape-aligned collection check.
+
+Starts the fake backends in this process and the real backend under uvicorn in
+a child process, once with ``SCRAPE_ALIGNED_COLLECTION=false`` (collect every
+``--update-interval`` seconds) and once with it enabled. The fake Prometheus
+reports a 10 s scrape interval for the AI server targets and 15 s for the
+others, like ``monitoring/prometheus/prometheus.yml``.
+
+For each phase it reports Prometheus queries per minute and, for every scrape
+of every server, the delay until an overview frame carried that server's
+metrics collected after the scrape.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.scrape_schedule --duration 60
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+import websockets
+
+from .fakes import FakeBackends, FleetSpec
+from .report import build_meta, compare_files, percentiles, write_result
+from .ws_load import _parse_head, free_port, start_backend, wait_ready
+
+# Scrape intervals the fake Prometheus reports, per overview section
+SCRAPE_INTERVALS = {"ai_server": 10, "storage_server": 15, "app_server": 15}
+
+
+async def watch_sections(url: str, frames: List[Tuple[float, Dict[str, float]]], stop: asyncio.Event):
+    """Record each overview frame's arrival time and per-section collection times"""
+    async with websockets.connect(url, ping_interval=None, max_size=None) as ws:
+        while not stop.is_set():
+            try:
+                message = await asyncio.wait_for(ws.recv(), timeout=1)
+            except asyncio.TimeoutError:
+                continue
+            if _parse_head(message).get("server_type") != "overview":
+                continue
+            data = json.loads(message)["data"]
+            collected = {
+                section: datetime.fromisoformat(data[section]["server_status"]["last_updated"]).timestamp()
+                for section in SCRAPE_INTERVALS
+            }
+            frames.append((time.time(), collected))
+
+
+def scrape_delays(frames: List[Tuple[float, Dict[str, float]]], start: float, end: float) -> List[float]:
+    """Delay from each scrape to the first frame with that section collected after it"""
+    delays = []
+    for section, interval in SCRAPE_INTERVALS.items():
+        scrape = (start // interval + 1) * interval
+        while scrape < end:
+            for arrived, collected in frames:
+                if collected[section] >= scrape:
+                    delays.append((arrived - scrape) * 1000)
+                    break
+            scrape += interval
+    return delays
+
+
+async def run_phase(backends: FakeBackends, args, aligned: bool) -> Dict[str, Any]:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = {
+        **backends.environment(),
+        "METRICS_UPDATE_INTERVAL": str(args.update_interval),
+        "SCRAPE_ALIGNED_COLLECTION": "true" if aligned else "false",
+    }
+    process = start_backend(env, port, args)
+    frames: List[Tuple[float, Dict[str, float]]] = []
+    stop = asyncio.Event()
+    try:
+        await wait_ready(base_url)
+        watcher = asyncio.create_task(
+            watch_sections(base_url.replace("http://", "ws://") + "/ws/metrics", frames, stop)
+        )
+        # Warm up: wait for the first frame, then start counting
+        while not frames:
+            await asyncio.sleep(0.2)
+        backends.reset_counters()
+        start = time.time()
+        await asyncio.sleep(args.duration)
+        end = time.time()
+        queries = backends.requests["prometheus.query"]
+        other = backends.requests["prometheus.other"]
+        exporter = backends.requests["node_exporter"]
+        # Leave time for frames carrying the last scrapes of the window
+        await asyncio.sleep(max(SCRAPE_INTERVALS.values()) / 2)
+        stop.set()
+        await watcher
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+    minutes = (end - start) / 60
+    # Only scrapes that a following frame could still have picked up
+    delays = scrape_delays(frames, start, end - args.update_interval)
+    return {
+        "overview_frames": len([f for f in frames if start <= f[0] <= end]),
+        "prometheus_queries_per_minute": round(queries / minutes, 1),
+        "targets_requests_per_minute": round(other / minutes, 1),
+        "exporter_requests_per_minute": round(exporter / minutes, 1),
+        "scrape_to_frame_ms": percentiles(delays),
+    }
+
+
+async def run(args, backends: FakeBackends) -> Dict[str, Any]:
+    results = {}
+    for name, aligned in (("interval", False), ("aligned", True)):
+        result = await run_phase(backends, args, aligned)
+        results[name] = result
+        delays = result["scrape_to_frame_ms"]
+        print(f"{name:9} {result['prometheus_queries_per_minute']:7.1f} queries/min, "
+              f"{result['overview_frames']} frames, scrape to frame "
+              f"p50 {delays.get('p50', float('nan')):.0f} ms, p95 {delays.get('p95', float('nan')):.0f} ms")
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape-aligned collection check")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds per phase")
+    parser.add_argument("--update-interval", type=int, default=5, help="METRICS_UPDATE_INTERVAL for the backend")
+    parser.add_argument("--hosts", type=int, default=5)
+    parser.add_argument("--prometheus-latency-ms", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--label", default="local")
+    parser.add_argument("--output")
+    parser.add_argument("--compare")
+    parser.add_argument("--threshold", type=float, default=10.0)
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+    spec = FleetSpec(hosts=args.hosts, prometheus_latency_ms=args.prometheus_latency_ms, seed=args.seed)
+    with FakeBackends(spec) as backends:
+        results = asyncio.run(run(args, backends))
+    parameters = {k: v for k, v in vars(args).items() if k not in ("output", "compare", "verbose", "label")}
+    result = {"meta": build_meta("scrape_schedule", args.label, parameters), **results}
+    path = write_result(result, args.output)
+    print(f"results written to {path}")
+    if args.compare:
+        return compare_files(args.compare, result, args.threshold)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
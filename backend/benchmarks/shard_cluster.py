@@ -0,0 +1,168 @@
+"""
+Sharded collection check with several local collector processes.
+
+Starts the fake backends in this process, the real backend in ``aggregator``
+mode, and ``--collectors`` shard collectors (``python -m app.collector
+--aggregator ...``) as child processes. It then measures:
+
+- time until every server section is pushed by its ring owner
+- rebalance time after one collector is killed with SIGKILL (no deregistration)
+- rebalance time after a replacement collector joins
+- Prometheus queries per cycle across all collectors, which matches a single
+  collector when the shards do not overlap
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.shard_cluster --collectors 3 --member-ttl 6
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+from .fakes import FakeBackends, FleetSpec
+from .report import build_meta, compare_files, write_result
+from .ws_load import BACKEND_DIR, free_port, start_backend, wait_ready
+
+
+def start_collector(env: Dict[str, str], base_url: str, node_id: str, args) -> subprocess.Popen:
+    command = [sys.executable, "-m", "app.collector", "--aggregator", base_url, "--node-id", node_id]
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env={**os.environ, **env},
+                            stdout=None if args.verbose else subprocess.DEVNULL,
+                            stderr=None if args.verbose else subprocess.DEVNULL)
+
+
+def converged(status: Dict[str, Any], expected_members: List[str], max_age: float) -> bool:
+    """Every section was pushed recently by the member the ring assigns it to"""
+    if sorted(status["members"]) != sorted(expected_members):
+        return False
+    owners = {key: node for node, keys in status["assignments"].items() for key in keys}
+    sections = status["sections"]
+    return bool(owners) and all(
+        key in sections and sections[key]["node_id"] == node and sections[key]["age_seconds"] <= max_age
+        for key, node in owners.items()
+    )
+
+
+async def wait_converged(client: httpx.AsyncClient, base_url: str, members: List[str],
+                         max_age: float, timeout: float) -> Dict[str, Any]:
+    started = time.monotonic()
+    while time.monotonic() - started < timeout:
+        status = (await client.get(f"{base_url}/api/cluster/members")).json()
+        if converged(status, members, max_age):
+            return {"seconds": round(time.monotonic() - started, 3), "status": status}
+        await asyncio.sleep(0.1)
+    raise RuntimeError(f"cluster did not converge on {members} within {timeout}s")
+
+
+def stop_process(process: subprocess.Popen):
+    if process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+async def run(args, backends: FakeBackends) -> Dict[str, Any]:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = {
+        **backends.environment(),
+        "COLLECTOR_MODE": "aggregator",
+        "METRICS_UPDATE_INTERVAL": str(args.update_interval),
+        "SHARD_MEMBER_TTL": str(args.member_ttl),
+    }
+    # Sections older than one push interval plus a collection are not converged yet
+    max_age = args.update_interval + 2
+    timeout = args.member_ttl + args.update_interval * 4 + 10
+    backend = start_backend(env, port, args)
+    collectors: Dict[str, subprocess.Popen] = {}
+    try:
+        await wait_ready(base_url)
+        async with httpx.AsyncClient(timeout=10) as client:
+            for i in range(args.collectors):
+                node_id = f"collector-{i + 1}"
+                collectors[node_id] = start_collector(env, base_url, node_id, args)
+            startup = await wait_converged(client, base_url, list(collectors), max_age, timeout)
+            print(f"{args.collectors} collectors converged in {startup['seconds']:.2f}s: "
+                  f"{startup['status']['assignments']}")
+
+            # Query volume over a few steady-state cycles
+            backends.reset_counters()
+            await asyncio.sleep(args.update_interval * 3)
+            queries = backends.requests["prometheus.query"]
+
+            victim = max(
+                collectors,
+                key=lambda node: len(startup["status"]["assignments"].get(node, []))
+            )
+            collectors[victim].send_signal(signal.SIGKILL)
+            collectors[victim].wait()
+            del collectors[victim]
+            leave = await wait_converged(client, base_url, list(collectors), max_age, timeout)
+            print(f"killed {victim}: rebalanced in {leave['seconds']:.2f}s: {leave['status']['assignments']}")
+
+            joiner = f"collector-{args.collectors + 1}"
+            collectors[joiner] = start_collector(env, base_url, joiner, args)
+            join = await wait_converged(client, base_url, list(collectors), max_age, timeout)
+            print(f"added {joiner}: rebalanced in {join['seconds']:.2f}s: {join['status']['assignments']}")
+
+            overview = (await client.get(f"{base_url}/api/servers/overview")).json()
+    finally:
+        for process in collectors.values():
+            stop_process(process)
+        stop_process(backend)
+
+    return {
+        "startup_converge_s": startup["seconds"],
+        "leave_rebalance_s": leave["seconds"],
+        "join_rebalance_s": join["seconds"],
+        "prometheus_queries_per_cycle": round(queries / 3, 1),
+        "online_servers": overview["online_servers"],
+        "total_servers": overview["total_servers"],
+        "assignments": join["status"]["assignments"],
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Sharded collection rebalance check")
+    parser.add_argument("--collectors", type=int, default=3)
+    parser.add_argument("--member-ttl", type=int, default=6, help="SHARD_MEMBER_TTL for the aggregator")
+    parser.add_argument("--update-interval", type=int, default=2, help="METRICS_UPDATE_INTERVAL for collectors")
+    parser.add_argument("--hosts", type=int, default=5)
+    parser.add_argument("--prometheus-latency-ms", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--label", default="local")
+    parser.add_argument("--output")
+    parser.add_argument("--compare")
+    parser.add_argument("--threshold", type=float, default=10.0)
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+    spec = FleetSpec(hosts=args.hosts, prometheus_latency_ms=args.prometheus_latency_ms, seed=args.seed)
+    with FakeBackends(spec) as backends:
+        results = asyncio.run(run(args, backends))
+    parameters = {k: v for k, v in vars(args).items() if k not in ("output", "compare", "verbose", "label")}
+    result = {"meta": build_meta("shard_cluster", args.label, parameters), **results}
+    path = write_result(result, args.output)
+    print(f"results written to {path}")
+    if args.compare:
+        return compare_files(args.compare, result, args.threshold)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
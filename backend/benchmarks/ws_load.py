@@ -0,0 +1,414 @@
+"""
+WebSocket fan-out load test for ``/ws/metrics``.
+
+Starts the fake backends in this process, runs the real backend under uvicorn
+in a child process pointed at them, then opens many WebSocket clients. Some of
+them are deliberately slow readers. The clients send ``ping`` and
+``request_update`` traffic. With ``--transport sse`` the clients read the
+read-only ``/api/stream`` Server-Sent Events endpoint instead and send nothing.
+The run reports:
+
+- delivered frame rate
+- broadcast tick drift against ``metrics_update_interval``
+- latency from each frame's snapshot timestamp to receipt
+- ping and request_update round trips
+- backend CPU and RSS per connection
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.ws_load --clients 1000 --slow-fraction 0.05 --duration 30
+    python -m benchmarks.ws_load --steps 250,500,1000,2000 --duration 20   # capacity search
+    python -m benchmarks.ws_load --clients 1000 --transport sse            # compare with SSE
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import re
+import resource
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+import psutil
+import websockets
+
+from .fakes import FakeBackends, FleetSpec
+from .report import build_meta, compare_files, percentiles, write_result
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Only the top-level keys are needed, so avoid parsing whole frames with json
+_PREFIX_RE = re.compile(r'^\{"(\w+)": "([^"]*)", "(\w+)": "([^"]*)"')
+
+
+def _parse_head(message: str) -> Dict[str, str]:
+    match = _PREFIX_RE.match(message[:200])
+    if not match:
+        return {}
+    return {match.group(1): match.group(2), match.group(3): match.group(4)}
+
+
+def _parse_timestamp(value: str) -> Optional[float]:
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        return None
+
+
+class ClientStats:
+    def __init__(self, slow: bool):
+        self.slow = slow
+        self.connected = False
+        self.error: Optional[str] = None
+        self.frames = 0
+        self.bytes = 0
+        self.snapshot_latencies: List[float] = []
+        self.overview_arrivals: List[float] = []
+        self.ping_rtts: List[float] = []
+        self.update_rtts: List[float] = []
+        self.pending_pings: List[float] = []
+        self.pending_updates: List[float] = []
+
+
+async def run_client(url: str, stats: ClientStats, args, stop: asyncio.Event):
+    try:
+        async with websockets.connect(url, ping_interval=None, max_queue=4 if stats.slow else 64,
+                                      open_timeout=60, close_timeout=1) as ws:
+            stats.connected = True
+            sender = asyncio.create_task(send_traffic(ws, stats, args, stop))
+            try:
+                while not stop.is_set():
+                    try:
+                        message = await asyncio.wait_for(ws.recv(), timeout=1)
+                    except asyncio.TimeoutError:
+                        continue
+                    record_frame(message, stats)
+                    if stats.slow:
+                        await asyncio.sleep(args.slow_delay)
+            finally:
+                sender.cancel()
+    except Exception as e:
+        stats.error = type(e).__name__
+
+
+async def run_sse_client(client: httpx.AsyncClient, url: str, stats: ClientStats, args, stop: asyncio.Event):
+    try:
+        async with client.stream("GET", url) as response:
+            response.raise_for_status()
+            stats.connected = True
+            # Cancelled by run_step at the end; a timeout here would close the stream
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                record_frame(line[6:], stats)
+                if stats.slow:
+                    await asyncio.sleep(args.slow_delay)
+    except asyncio.CancelledError:
+        pass
+    except Exception as e:
+        stats.error = type(e).__name__
+
+
+def record_frame(message: str, stats: ClientStats):
+    received = time.time()
+    stats.frames += 1
+    stats.bytes += len(message)
+    head = _parse_head(message)
+    if head.get("event_type") == "pong" and stats.pending_pings:
+        stats.ping_rtts.append(received - stats.pending_pings.pop(0))
+    elif head.get("event_type") == "metrics_update" and stats.pending_updates:
+        # request_update replies start with event_type, broadcasts with timestamp
+        stats.update_rtts.append(received - stats.pending_updates.pop(0))
+    elif head.get("server_type") == "overview" and "timestamp" in head:
+        stats.overview_arrivals.append(received)
+        snapshot = _parse_timestamp(head["timestamp"])
+        if snapshot:
+            stats.snapshot_latencies.append(received - snapshot)
+
+
+async def send_traffic(ws, stats: ClientStats, args, stop: asyncio.Event):
+    rng = random.Random()
+    next_ping = time.monotonic() + rng.uniform(0, args.ping_interval)
+    wants_updates = rng.random() < args.update_fraction
+    next_update = time.monotonic() + rng.uniform(0, args.update_interval)
+    while not stop.is_set():
+        now = time.monotonic()
+        if args.ping_interval and now >= next_ping:
+            stats.pending_pings.append(time.time())
+            await ws.send('{"type": "ping"}')
+            next_ping = now + args.ping_interval
+        if wants_updates and now >= next_update:
+            stats.pending_updates.append(time.time())
+            await ws.send('{"type": "request_update"}')
+            next_update = now + args.update_interval
+        await asyncio.sleep(0.25)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_backend(env: Dict[str, str], port: int, args, *options: str) -> subprocess.Popen:
+    command = [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+               "--port", str(port), "--log-level", "warning", "--backlog", "4096", *options]
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env={**os.environ, **env},
+                            stdout=None if args.verbose else subprocess.DEVNULL,
+                            stderr=None if args.verbose else subprocess.DEVNULL)
+
+
+async def wait_ready(base_url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(timeout=5) as client:
+        while time.monotonic() < deadline:
+            try:
+                response = await client.get(f"{base_url}/")
+                if response.status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("backend did not become ready")
+
+
+class ProcessSampler:
+    """Samples CPU and RSS of the backend process in the background."""
+
+    def __init__(self, pid: int, interval: float = 0.5):
+        self.process = psutil.Process(pid)
+        self.interval = interval
+        self.rss: List[int] = []
+        self._cpu_start = None
+        self._wall_start = None
+
+    def mark(self):
+        times = self.process.cpu_times()
+        self._cpu_start = times.user + times.system
+        self._wall_start = time.monotonic()
+
+    def cpu_percent(self) -> float:
+        times = self.process.cpu_times()
+        elapsed = time.monotonic() - self._wall_start
+        return (times.user + times.system - self._cpu_start) / elapsed * 100 if elapsed else 0.0
+
+    async def run(self, stop: asyncio.Event):
+        while not stop.is_set():
+            self.rss.append(self.process.memory_info().rss)
+            await asyncio.sleep(self.interval)
+
+
+async def run_step(base_url: str, clients: int, args, sampler: ProcessSampler,
+                   rss_idle: int) -> Dict[str, Any]:
+    stop = asyncio.Event()
+    rng = random.Random(args.seed)
+    stats = [ClientStats(slow=rng.random() < args.slow_fraction) for _ in range(clients)]
+
+    # One pooled HTTP client for all SSE connections; creating one each is slow
+    sse_client = httpx.AsyncClient(timeout=httpx.Timeout(60, read=None),
+                                   limits=httpx.Limits(max_connections=None, max_keepalive_connections=0))
+    tasks = []
+    batch = max(1, int(args.ramp_rate / 10))
+    ramp_start = time.monotonic()
+    for start in range(0, clients, batch):
+        for client in stats[start:start + batch]:
+            if args.transport == "sse":
+                coro = run_sse_client(sse_client, f"{base_url}/api/stream", client, args, stop)
+            else:
+                coro = run_client(base_url.replace("http://", "ws://") + "/ws/metrics", client, args, stop)
+            tasks.append(asyncio.create_task(coro))
+        await asyncio.sleep(0.1)
+    ramp_seconds = time.monotonic() - ramp_start
+
+    # Let connections settle before measuring
+    await asyncio.sleep(min(5, args.duration / 4))
+    for client in stats:
+        client.frames = client.bytes = 0
+        client.snapshot_latencies.clear()
+        client.overview_arrivals.clear()
+        client.ping_rtts.clear()
+        client.update_rtts.clear()
+
+    sampler_stop = asyncio.Event()
+    sampler.rss.clear()
+    sampler.mark()
+    sampler_task = asyncio.create_task(sampler.run(sampler_stop))
+    measure_start = time.monotonic()
+    await asyncio.sleep(args.duration)
+    elapsed = time.monotonic() - measure_start
+    cpu = sampler.cpu_percent()
+    sampler_stop.set()
+    await sampler_task
+    stop.set()
+    if args.transport == "sse":
+        for task in tasks:
+            task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await sse_client.aclose()
+
+    connected = [c for c in stats if c.connected]
+    fast = [c for c in connected if not c.slow]
+    slow = [c for c in connected if c.slow]
+    intervals = [b - a for c in fast for a, b in zip(c.overview_arrivals, c.overview_arrivals[1:])]
+    frames = sum(c.frames for c in connected)
+    rss_loaded = max(sampler.rss) if sampler.rss else rss_idle
+    errors: Dict[str, int] = {}
+    for client in stats:
+        if client.error:
+            errors[client.error] = errors.get(client.error, 0) + 1
+
+    return {
+        "transport": args.transport,
+        "clients": clients,
+        "connections": len(connected),
+        "slow_clients": len(slow),
+        "ramp_seconds": round(ramp_seconds, 2),
+        "errors": errors,
+        "delivered": {
+            "frames": frames,
+            "frames_per_second": round(frames / elapsed, 2),
+            "megabytes_per_second": round(sum(c.bytes for c in connected) / elapsed / 1e6, 3),
+            "overview_frames_per_fast_client": percentiles([len(c.overview_arrivals) for c in fast]),
+        },
+        "tick_interval_s": percentiles(intervals),
+        "tick_drift_s": percentiles([i - args.update_interval_setting for i in intervals]),
+        "snapshot_latency_ms": {
+            "fast": percentiles([l * 1000 for c in fast for l in c.snapshot_latencies]),
+            "slow": percentiles([l * 1000 for c in slow for l in c.snapshot_latencies]),
+        },
+        "ping_rtt_ms": percentiles([r * 1000 for c in connected for r in c.ping_rtts]),
+        "request_update_rtt_ms": percentiles([r * 1000 for c in connected for r in c.update_rtts]),
+        "backend": {
+            "cpu_percent": round(cpu, 2),
+            "cpu_percent_per_1k_connections": round(cpu / len(connected) * 1000, 3) if connected else 0,
+            "rss_mib": round(rss_loaded / 2**20, 2),
+            "rss_kib_per_connection": round((rss_loaded - rss_idle) / 1024 / len(connected), 2) if connected else 0,
+        },
+    }
+
+
+async def run(args, backends: FakeBackends) -> Dict[str, Any]:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = {
+        **backends.environment(),
+        "METRICS_UPDATE_INTERVAL": str(args.update_interval_setting),
+        # Broadcast on a fixed cadence so drift can be measured against it
+        "SCRAPE_ALIGNED_COLLECTION": "false",
+    }
+    process = start_backend(env, port, args)
+    try:
+        await wait_ready(base_url)
+        sampler = ProcessSampler(process.pid)
+        # One full collection first, so idle RSS includes the collector's steady state
+        async with httpx.AsyncClient(timeout=60) as client:
+            await client.get(f"{base_url}/api/servers/overview")
+        await asyncio.sleep(1)
+        rss_idle = sampler.process.memory_info().rss
+
+        steps = []
+        for clients in args.steps:
+            result = await run_step(base_url, clients, args, sampler, rss_idle)
+            steps.append(result)
+            print(f"{clients:6d} clients: {result['connections']} connected, "
+                  f"{result['delivered']['frames_per_second']:.0f} frames/s, "
+                  f"tick p95 {_fmt(result['tick_interval_s'], 'p95', 's')}, "
+                  f"latency p95 {_fmt(result['snapshot_latency_ms']['fast'], 'p95', ' ms')}, "
+                  f"backend cpu {result['backend']['cpu_percent']:.0f}%, "
+                  f"{result['backend']['rss_kib_per_connection']:.1f} KiB/conn")
+            await asyncio.sleep(2)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    limit = args.update_interval_setting * (1 + args.drift_tolerance)
+    sustained = [s["clients"] for s in steps
+                 if s["connections"] == s["clients"] and s["tick_interval_s"].get("p95", float("inf")) <= limit]
+    result = {
+        "capacity": {
+            "max_sustained_connections": max(sustained) if sustained else 0,
+            "tick_limit_s": limit,
+        },
+        "rss_idle_mib": round(rss_idle / 2**20, 2),
+    }
+    if len(steps) == 1:
+        result.update(steps[0])
+    else:
+        result["steps"] = {str(s["clients"]): s for s in steps}
+    return result
+
+
+def _fmt(stats: Dict[str, Any], key: str, unit: str) -> str:
+    return f"{stats[key]:.2f}{unit}" if key in stats else "n/a"
+
+
+def raise_fd_limit(needed: int):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    target = hard if hard == resource.RLIM_INFINITY else min(hard, max(soft, needed))
+    if target > soft:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+    if target < needed:
+        print(f"warning: open file limit {target} is below the {needed} descriptors this run needs")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="WebSocket fan-out load test for /ws/metrics")
+    parser.add_argument("--transport", choices=["ws", "sse"], default="ws",
+                        help="ws: /ws/metrics, sse: /api/stream (read-only)")
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--steps", help="comma-separated client counts for a capacity search")
+    parser.add_argument("--slow-fraction", type=float, default=0.05, help="share of deliberately slow readers")
+    parser.add_argument("--slow-delay", type=float, default=2.0, help="seconds a slow reader waits per frame")
+    parser.add_argument("--ping-interval", type=float, default=10.0, help="seconds between pings (0 disables)")
+    parser.add_argument("--update-fraction", type=float, default=0.02,
+                        help="share of clients that send request_update")
+    parser.add_argument("--update-interval", type=float, default=15.0, help="seconds between request_update")
+    parser.add_argument("--metrics-update-interval", dest="update_interval_setting", type=int, default=5,
+                        help="METRICS_UPDATE_INTERVAL for the backend")
+    parser.add_argument("--drift-tolerance", type=float, default=0.2,
+                        help="allowed tick stretch before a step counts as unsustained")
+    parser.add_argument("--duration", type=float, default=30.0, help="measurement seconds per step")
+    parser.add_argument("--ramp-rate", type=float, default=500.0, help="new connections per second")
+    parser.add_argument("--hosts", type=int, default=5)
+    parser.add_argument("--prometheus-latency-ms", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--label", default="local")
+    parser.add_argument("--output")
+    parser.add_argument("--compare")
+    parser.add_argument("--threshold", type=float, default=10.0)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+    args.steps = [int(n) for n in args.steps.split(",")] if args.steps else [args.clients]
+    return args
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+    raise_fd_limit(max(args.steps) * 2 + 256)
+    spec = FleetSpec(hosts=args.hosts, prometheus_latency_ms=args.prometheus_latency_ms, seed=args.seed)
+    with FakeBackends(spec) as backends:
+        results = asyncio.run(run(args, backends))
+    parameters = {k: v for k, v in vars(args).items() if k not in ("output", "compare", "verbose", "label")}
+    result = {"meta": build_meta("ws_load", args.label, parameters), **results}
+    path = write_result(result, args.output)
+    print(f"max sustained connections: {results['capacity']['max_sustained_connections']}")
+    print(f"results written to {path}")
+    if args.compare:
+        return compare_files(args.compare, result, args.threshold)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -371,6 +371,45 @@ const ServerDetailView = ({ serverId, serverData, chartData }) => {
         </Card>
       )}
 
+      {serverId === 'ai' && data.gpus && data.gpus.length > 1 && (
+        <Card className="border-gray-200">
+          <CardHeader>
+            <CardTitle className="text-xl text-black">GPUs</CardTitle>
+          </CardHeader>
+          <CardContent>
+            <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-4 gap-4">
+              {data.gpus.map((gpu, index) => (
+                <div key={gpu.uuid || index} className="p-4 border border-gray-200 rounded-lg bg-gray-50">
+                  <h4 className="font-semibold text-black mb-3">GPU {gpu.index ?? index}</h4>
+                  <div className="space-y-2 text-sm">
+                    <div className="flex justify-between">
+                      <span className="text-gray-600">Usage</span>
+                      <span className="font-medium text-black">{gpu.usage_percent?.toFixed(1)}%</span>
+                    </div>
+                    <div className="flex justify-between">
+                      <span className="text-gray-600">Memory</span>
+                      <span className="font-medium text-black">
+                        {(gpu.memory_used_mb / 1024 || 0).toFixed(1)}GB / {(gpu.memory_total_mb / 1024 || 0).toFixed(1)}GB
+                      </span>
+                    </div>
+                    <div className="flex justify-between">
+                      <span className="text-gray-600">Temperature</span>
+                      <span className="font-medium text-black">{gpu.temperature}°C</span>
+                    </div>
+                    {gpu.processes?.slice(0, 3).map((process) => (
+                      <div key={process.pid} className="flex justify-between">
+                        <span className="text-gray-600 truncate">{process.name} ({process.pid})</span>
+                        <span className="font-medium text-black">{(process.memory_used_mb / 1024).toFixed(1)}GB</span>
+                      </div>
+                    ))}
+                  </div>
+                </div>
+              ))}
+            </div>
+          </CardContent>
+        </Card>
+      )}
+
       {serverId === 'storage' && data.filesystems && data.filesystems.length > 0 && (
         <Card className="border-gray-200">
           <CardHeader>
@@ -3,6 +3,8 @@ const API_BASE_URL = ''
 class ApiService {
   constructor() {
     this.baseURL = API_BASE_URL
+    // GETs issued in the same tick, sent together as one /api/batch request
+    this.pending = []
   }
 
   async request(endpoint, options = {}) {
@@ -29,122 +31,164 @@ class ApiService {
     }
   }
 
+  // Resolve several GET paths from one snapshot in a single round trip
+  async batch(paths) {
+    const { results } = await this.request('/api/batch', {
+      method: 'POST',
+      body: JSON.stringify({ paths }),
+    })
+    return results
+  }
+
+  // Queue a GET; everything queued in the same tick shares one batch request
+  get(endpoint) {
+    return new Promise((resolve, reject) => {
+      this.pending.push({ endpoint, resolve, reject })
+      if (this.pending.length === 1) {
+        queueMicrotask(() => this.flush())
+      }
+    })
+  }
+
+  async flush() {
+    const queued = this.pending
+    this.pending = []
+    if (queued.length === 1) {
+      const { endpoint, resolve, reject } = queued[0]
+      return this.request(endpoint).then(resolve, reject)
+    }
+    try {
+      const results = await this.batch([...new Set(queued.map(({ endpoint }) => endpoint))])
+      for (const { endpoint, resolve, reject } of queued) {
+        const { status, body } = results[endpoint]
+        if (status >= 400) {
+          console.error(`API request failed: ${endpoint}`, body)
+          reject(new Error(`HTTP error! status: ${status}`))
+        } else {
+          resolve(body)
+        }
+      }
+    } catch (error) {
+      queued.forEach(({ reject }) => reject(error))
+    }
+  }
+
   // Health and overview endpoints
   async getHealth() {
-    return this.request('/api/health')
+    return this.get('/api/health')
   }
 
   async getServersOverview() {
-    return this.request('/api/servers/overview')
+    return this.get('/api/servers/overview')
   }
 
   async getServersSummary() {
-    return this.request('/api/servers/summary')
+    return this.get('/api/servers/summary')
   }
 
   // AI Server endpoints
   async getAIServerMetrics() {
-    return this.request('/api/ai-server/')
+    return this.get('/api/ai-server/')
   }
 
   async getAIServerGPU() {
-    return this.request('/api/ai-server/gpu')
+    return this.get('/api/ai-server/gpu')
   }
 
   async getAIServerCPU() {
-    return this.request('/api/ai-server/cpu')
+    return this.get('/api/ai-server/cpu')
   }
 
   async getAIServerMemory() {
-    return this.request('/api/ai-server/memory')
+    return this.get('/api/ai-server/memory')
   }
 
   async getAIServerStorage() {
-    return this.request('/api/ai-server/storage')
+    return this.get('/api/ai-server/storage')
   }
 
   async getAIServerNetwork() {
-    return this.request('/api/ai-server/network')
+    return this.get('/api/ai-server/network')
   }
 
   async getAIServerHealth() {
-    return this.request('/api/ai-server/health')
+    return this.get('/api/ai-server/health')
   }
 
   // App Server endpoints
   async getAppServerMetrics() {
-    return this.request('/api/app-server/')
+    return this.get('/api/app-server/')
   }
 
   async getProxmoxMetrics() {
-    return this.request('/api/app-server/proxmox')
+    return this.get('/api/app-server/proxmox')
   }
 
   async getVMMetrics() {
-    return this.request('/api/app-server/vms')
+    return this.get('/api/app-server/vms')
   }
 
   async getVMById(vmId) {
-    return this.request(`/api/app-server/vms/${vmId}`)
+    return this.get(`/api/app-server/vms/${vmId}`)
   }
 
   async getAppServerCPU() {
-    return this.request('/api/app-server/cpu')
+    return this.get('/api/app-server/cpu')
   }
 
   async getAppServerMemory() {
-    return this.request('/api/app-server/memory')
+    return this.get('/api/app-server/memory')
   }
 
   async getAppServerStorage() {
-    return this.request('/api/app-server/storage')
+    return this.get('/api/app-server/storage')
   }
 
   async getAppServerNetwork() {
-    return this.request('/api/app-server/network')
+    return this.get('/api/app-server/network')
   }
 
   async getAppServerHealth() {
-    return this.request('/api/app-server/health')
+    return this.get('/api/app-server/health')
   }
 
   // Storage Server endpoints
   async getStorageServerMetrics() {
-    return this.request('/api/storage-server/')
+    return this.get('/api/storage-server/')
   }
 
   async getFilesystemMetrics() {
-    return this.request('/api/storage-server/filesystems')
+    return this.get('/api/storage-server/filesystems')
   }
 
   async getFilesystemByMount(mountPoint) {
     // Encode the mount point to handle special characters
     const encodedMount = encodeURIComponent(mountPoint)
-    return this.request(`/api/storage-server/filesystems/${encodedMount}`)
+    return this.get(`/api/storage-server/filesystems/${encodedMount}`)
   }
 
   async getQdrantMetrics() {
-    return this.request('/api/storage-server/qdrant')
+    return this.get('/api/storage-server/qdrant')
   }
 
   async getStorageServerCPU() {
-    return this.request('/api/storage-server/cpu')
+    return this.get('/api/storage-server/cpu')
   }
 
   async getStorageServerMemory() {
-    return this.request('/api/storage-server/memory')
+    return this.get('/api/storage-server/memory')
   }
 
   async getStorageServerStorage() {
-    return this.request('/api/storage-server/storage')
+    return this.get('/api/storage-server/storage')
   }
 
   async getStorageServerNetwork() {
-    return this.request('/api/storage-server/network')
+    return this.get('/api/storage-server/network')
   }
 
   async getStorageServerHealth() {
-    return this.request('/api/storage-server/health')
+    return this.get('/api/storage-server/health')
   }
 
   // Prometheus metrics for Grafana compatibility
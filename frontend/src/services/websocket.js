@@ -92,6 +92,11 @@ class WebSocketService {
         break
       
       case 'heartbeat':
+        // The server closes connections it has not heard from in a while
+        this.send({ type: 'pong' })
+        this.emit('heartbeat', data)
+        break
+
       case 'pong':
         this.emit('heartbeat', data)
         break